@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import heapq
 import json
 import sys
 
@@ -14,48 +15,146 @@ class RectAndField:
     field: dict
 
 
+MAX_MESSAGES = 20  # Checks stop once this many messages have been collected
+
+
+# Yields the entries of the top-level "form_fields" array one at a time, reading
+# the stream in chunks, so very large files are never held in memory as a whole.
+def iter_form_fields(fields_json_stream, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fields_json_stream.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    # Returns the next non-whitespace character without consuming it.
+    def peek():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                raise ValueError("Unexpected end of fields JSON")
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected '{char}' in fields JSON, found '{buf[pos]}'")
+        pos += 1
+
+    def value():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A value that ends the buffer (e.g. a number) may continue in the next chunk.
+            if end == len(buf) and not eof:
+                fill()
+                continue
+            pos = end
+            return obj
+
+    expect("{")
+    while peek() != "}":
+        key = value()
+        expect(":")
+        if key == "form_fields":
+            expect("[")
+            while peek() != "]":
+                yield value()
+                if peek() == ",":
+                    pos += 1
+            pos += 1
+        else:
+            value()
+        if peek() == ",":
+            pos += 1
+
+
+def rects_intersect(r1, r2):
+    disjoint_horizontal = r1[0] >= r2[2] or r1[2] <= r2[0]
+    disjoint_vertical = r1[1] >= r2[3] or r1[3] <= r2[1]
+    return not (disjoint_horizontal or disjoint_vertical)
+
+
+# Yields every intersecting pair among one page's (index, RectAndField) entries as
+# (earlier entry, later entry). Sweeps downwards by the rects' top edges, comparing
+# each rect only with rects that are still open, i.e. extend below its top edge;
+# on forms that is roughly one row of fields rather than the whole page.
+def intersecting_pairs(page_rects):
+    open_rects = {}
+    open_ends = []  # Heap of (bottom edge, index) for the open rects
+    for index, raf in sorted(page_rects, key=lambda item: item[1].rect[1]):
+        while open_ends and open_ends[0][0] <= raf.rect[1]:
+            open_rects.pop(heapq.heappop(open_ends)[1], None)
+        for other_index, other in open_rects.items():
+            if rects_intersect(other.rect, raf.rect):
+                yield ((other_index, other), (index, raf)) if other_index < index else ((index, raf), (other_index, other))
+        open_rects[index] = raf
+        heapq.heappush(open_ends, (raf.rect[3], index))
+
+
 # Returns a list of messages that are printed to stdout for Claude to read.
+#
+# Rects are numbered in field order, label before entry, and bucketed by page. Each
+# problem is keyed by where the original pairwise scan over that numbering would have
+# reported it, so the messages, their order, and the point where checking is aborted
+# are the same as that scan's, without comparing rects on different pages.
 def get_bounding_box_messages(fields_json_stream) -> list[str]:
-    messages = []
-    fields = json.load(fields_json_stream)
-    messages.append(f"Read {len(fields['form_fields'])} fields")
-
-    def rects_intersect(r1, r2):
-        disjoint_horizontal = r1[0] >= r2[2] or r1[2] <= r2[0]
-        disjoint_vertical = r1[1] >= r2[3] or r1[3] <= r2[1]
-        return not (disjoint_horizontal or disjoint_vertical)
-
-    rects_and_fields = []
-    for f in fields["form_fields"]:
-        rects_and_fields.append(RectAndField(f["label_bounding_box"], "label", f))
-        rects_and_fields.append(RectAndField(f["entry_bounding_box"], "entry", f))
-
-    has_error = False
-    for i, ri in enumerate(rects_and_fields):
-        # This is O(N^2); we can optimize if it becomes a problem.
-        for j in range(i + 1, len(rects_and_fields)):
-            rj = rects_and_fields[j]
-            if ri.field["page_number"] == rj.field["page_number"] and rects_intersect(ri.rect, rj.rect):
-                has_error = True
-                if ri.field is rj.field:
-                    messages.append(f"FAILURE: intersection between label and entry bounding boxes for `{ri.field['description']}` ({ri.rect}, {rj.rect})")
-                else:
-                    messages.append(f"FAILURE: intersection between {ri.rect_type} bounding box for `{ri.field['description']}` ({ri.rect}) and {rj.rect_type} bounding box for `{rj.field['description']}` ({rj.rect})")
-                if len(messages) >= 20:
-                    messages.append("Aborting further checks; fix bounding boxes and try again")
-                    return messages
-        if ri.rect_type == "entry":
+    rects_by_page = {}
+    entry_rects = []
+    num_fields = 0
+    for f in iter_form_fields(fields_json_stream):
+        label = RectAndField(f["label_bounding_box"], "label", f)
+        entry = RectAndField(f["entry_bounding_box"], "entry", f)
+        page_rects = rects_by_page.setdefault(f["page_number"], [])
+        page_rects.append((2 * num_fields, label))
+        page_rects.append((2 * num_fields + 1, entry))
+        entry_rects.append((2 * num_fields + 1, entry))
+        num_fields += 1
+
+    messages = [f"Read {num_fields} fields"]
+
+    def problems():
+        for page_rects in rects_by_page.values():
+            for (i, ri), (j, rj) in intersecting_pairs(page_rects):
+                yield (i, 0, j), ri, rj
+        for i, ri in entry_rects:
             if "entry_text" in ri.field:
                 font_size = ri.field["entry_text"].get("font_size", 14)
-                entry_height = ri.rect[3] - ri.rect[1]
-                if entry_height < font_size:
-                    has_error = True
-                    messages.append(f"FAILURE: entry bounding box height ({entry_height}) for `{ri.field['description']}` is too short for the text content (font size: {font_size}). Increase the box height or decrease the font size.")
-                    if len(messages) >= 20:
-                        messages.append("Aborting further checks; fix bounding boxes and try again")
-                        return messages
-
-    if not has_error:
+                if ri.rect[3] - ri.rect[1] < font_size:
+                    yield (i, 1, 0), ri, None
+
+    # Only the first problems are reported, so keep just those.
+    first_problems = heapq.nsmallest(MAX_MESSAGES - len(messages), problems(), key=lambda p: p[0])
+    for _, ri, rj in first_problems:
+        if rj is None:
+            font_size = ri.field["entry_text"].get("font_size", 14)
+            entry_height = ri.rect[3] - ri.rect[1]
+            messages.append(f"FAILURE: entry bounding box height ({entry_height}) for `{ri.field['description']}` is too short for the text content (font size: {font_size}). Increase the box height or decrease the font size.")
+        elif ri.field is rj.field:
+            messages.append(f"FAILURE: intersection between label and entry bounding boxes for `{ri.field['description']}` ({ri.rect}, {rj.rect})")
+        else:
+            messages.append(f"FAILURE: intersection between {ri.rect_type} bounding box for `{ri.field['description']}` ({ri.rect}) and {rj.rect_type} bounding box for `{rj.field['description']}` ({rj.rect})")
+
+    if len(messages) >= MAX_MESSAGES:
+        messages.append("Aborting further checks; fix bounding boxes and try again")
+    elif not first_problems:
         messages.append("SUCCESS: All bounding boxes are valid")
     return messages
 
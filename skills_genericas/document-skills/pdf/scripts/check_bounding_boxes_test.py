@@ -221,6 +221,64 @@ class TestGetBoundingBoxMessages(unittest.TestCase):
         self.assertTrue(any("SUCCESS" in msg for msg in messages))
         self.assertFalse(any("FAILURE" in msg for msg in messages))
     
+    def test_messages_in_field_order_across_pages(self):
+        """Test that failures are reported in field order, whatever page they are on"""
+        data = {
+            "form_fields": [
+                {
+                    "description": "Page2Field",
+                    "page_number": 2,
+                    "label_bounding_box": [10, 10, 60, 30],
+                    "entry_bounding_box": [50, 10, 150, 30]  # Overlaps with label
+                },
+                {
+                    "description": "Page1Field",
+                    "page_number": 1,
+                    "label_bounding_box": [10, 10, 50, 30],
+                    "entry_bounding_box": [60, 10, 150, 20],  # Too short for its text
+                    "entry_text": {"font_size": 14}
+                },
+                {
+                    "description": "Page2Other",
+                    "page_number": 2,
+                    "label_bounding_box": [100, 20, 120, 40],  # Overlaps with Page2Field's entry
+                    "entry_bounding_box": [200, 10, 300, 30]
+                }
+            ]
+        }
+        
+        stream = self.create_json_stream(data)
+        messages = get_bounding_box_messages(stream)
+        failures = [msg for msg in messages if "FAILURE" in msg]
+        self.assertEqual(len(failures), 3)
+        self.assertIn("label and entry bounding boxes for `Page2Field`", failures[0])
+        self.assertIn("entry bounding box for `Page2Field`", failures[1])
+        self.assertIn("label bounding box for `Page2Other`", failures[1])
+        self.assertIn("height", failures[2])
+    
+    def test_fields_read_in_small_chunks(self):
+        """Test that fields split across stream reads are parsed correctly"""
+        data = {
+            "pages": [{"page_number": 1, "image_width": 1000, "image_height": 1300}],
+            "form_fields": [
+                {
+                    "description": f"Field{i}",
+                    "page_number": 1,
+                    "label_bounding_box": [10, 40 * i, 50, 40 * i + 30],
+                    "entry_bounding_box": [60, 40 * i, 150.5, 40 * i + 30]
+                }
+                for i in range(10)
+            ]
+        }
+
+        class ChunkedStream(io.StringIO):
+            def read(self, size=-1):
+                return super().read(3)
+
+        messages = get_bounding_box_messages(ChunkedStream(json.dumps(data, indent=2)))
+        self.assertEqual(messages[0], "Read 10 fields")
+        self.assertTrue(any("SUCCESS" in msg for msg in messages))
+    
 
 if __name__ == '__main__':
     unittest.main()
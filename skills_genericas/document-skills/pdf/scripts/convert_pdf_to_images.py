@@ -1,35 +1,40 @@
 import os
+import shutil
 import sys
 
-from pdf2image import convert_from_path
+from PIL import Image
+
+from page_cache import parse_pages
+from page_images import FORMS_MAX_DIM, render_pages
 
 
 # Converts each page of a PDF to a PNG image.
+# Pages are rendered directly at a size that fits within `max_dim`, in parallel
+# page ranges, and streamed to disk so memory use doesn't grow with page count.
+# Rendered pages are cached (see page_images.py), so converting the same PDF
+# again, or validating it with create_validation_image.py, doesn't re-render.
 
 
-def convert(pdf_path, output_dir, max_dim=1000):
-    images = convert_from_path(pdf_path, dpi=200)
+def convert(pdf_path, output_dir, max_dim=FORMS_MAX_DIM, pages=None):
+    image_paths = render_pages(pdf_path, pages, max_dim=max_dim)
 
-    for i, image in enumerate(images):
-        # Scale image if needed to keep width/height under `max_dim`
-        width, height = image.size
-        if width > max_dim or height > max_dim:
-            scale_factor = min(max_dim / width, max_dim / height)
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            image = image.resize((new_width, new_height))
-        
-        image_path = os.path.join(output_dir, f"page_{i+1}.png")
-        image.save(image_path)
-        print(f"Saved page {i+1} as {image_path} (size: {image.size})")
+    os.makedirs(output_dir, exist_ok=True)
+    for page, cached_path in image_paths.items():
+        image_path = os.path.join(output_dir, f"page_{page}.png")
+        shutil.copyfile(cached_path, image_path)
+        # Only reads the image header to report the size
+        with Image.open(image_path) as image:
+            size = image.size
+        print(f"Saved page {page} as {image_path} (size: {size})")
 
-    print(f"Converted {len(images)} pages to PNG images")
+    print(f"Converted {len(image_paths)} pages to PNG images")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: convert_pdf_to_images.py [input pdf] [output directory]")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: convert_pdf_to_images.py [input pdf] [output directory] [pages, e.g. 1,3-5]")
         sys.exit(1)
     pdf_path = sys.argv[1]
     output_directory = sys.argv[2]
-    convert(pdf_path, output_directory)
+    pages = parse_pages(sys.argv[3]) if len(sys.argv) == 4 else None
+    convert(pdf_path, output_directory, pages=pages)
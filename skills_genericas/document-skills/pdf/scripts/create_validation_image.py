@@ -1,38 +1,134 @@
 import json
+import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-from PIL import Image, ImageDraw
+from PIL import Image, ImageDraw, ImageFont
+
+from page_cache import parse_pages
+from page_images import FORMS_MAX_DIM, load_page_image, render_pages
+from rasterize import DEFAULT_WORKERS
 
 
 # Creates "validation" images with rectangles for the bounding box information that
 # Claude creates when determining where to add text annotations in PDFs. See forms.md.
+#
+# Batch mode creates the images for all pages (or selected pages) of a PDF at once,
+# plus a contact sheet with every page side by side:
+#   create_validation_image.py --batch [fields.json file] [input pdf] [output dir] [pages, e.g. 1,3-5]
+
+
+CONTACT_SHEET_COLS = 4
+CONTACT_SHEET_THUMB_WIDTH = 300
+CONTACT_SHEET_PADDING = 10
+
+
+def group_fields_by_page(fields_data):
+    fields_by_page = {}
+    for field in fields_data["form_fields"]:
+        fields_by_page.setdefault(field["page_number"], []).append(field)
+    return fields_by_page
 
 
+# Draws the boxes for one page's fields onto an in-memory image and returns the
+# number of boxes drawn.
+def draw_validation_boxes(img, page_fields):
+    draw = ImageDraw.Draw(img)
+    num_boxes = 0
+    for field in page_fields:
+        entry_box = field['entry_bounding_box']
+        label_box = field['label_bounding_box']
+        # Draw red rectangle over entry bounding box and blue rectangle over the label.
+        draw.rectangle(entry_box, outline='red', width=2)
+        draw.rectangle(label_box, outline='blue', width=2)
+        num_boxes += 2
+    return num_boxes
+
+
+# The input can be a page image, or the PDF itself: its page is then taken from the
+# page image cache, rendered the same way as by convert_pdf_to_images.py.
 def create_validation_image(page_number, fields_json_path, input_path, output_path):
     # Input file should be in the `fields.json` format described in forms.md.
     with open(fields_json_path, 'r') as f:
         data = json.load(f)
 
+    if input_path.lower().endswith(".pdf"):
+        img = load_page_image(input_path, page_number, max_dim=FORMS_MAX_DIM)
+    else:
         img = Image.open(input_path)
-        draw = ImageDraw.Draw(img)
-        num_boxes = 0
-        
-        for field in data["form_fields"]:
-            if field["page_number"] == page_number:
-                entry_box = field['entry_bounding_box']
-                label_box = field['label_bounding_box']
-                # Draw red rectangle over entry bounding box and blue rectangle over the label.
-                draw.rectangle(entry_box, outline='red', width=2)
-                draw.rectangle(label_box, outline='blue', width=2)
-                num_boxes += 2
-        
+    num_boxes = draw_validation_boxes(img, group_fields_by_page(data).get(page_number, []))
+
+    img.save(output_path)
+    print(f"Created validation image at {output_path} with {num_boxes} bounding boxes")
+
+
+# Lays out (page number, image) thumbnails in a labeled grid.
+def create_contact_sheet(thumbnails, output_path):
+    font = ImageFont.load_default()
+    label_height = 20
+    cell_width = max(img.width for _, img in thumbnails)
+    cell_height = max(img.height for _, img in thumbnails) + label_height
+    cols = min(CONTACT_SHEET_COLS, len(thumbnails))
+    rows = (len(thumbnails) + cols - 1) // cols
+
+    sheet = Image.new("RGB", (
+        cols * cell_width + (cols + 1) * CONTACT_SHEET_PADDING,
+        rows * cell_height + (rows + 1) * CONTACT_SHEET_PADDING,
+    ), "white")
+    draw = ImageDraw.Draw(sheet)
+    for i, (page_number, img) in enumerate(thumbnails):
+        row, col = divmod(i, cols)
+        x = col * cell_width + (col + 1) * CONTACT_SHEET_PADDING
+        y = row * cell_height + (row + 1) * CONTACT_SHEET_PADDING
+        draw.text((x, y), f"Page {page_number}", fill="black", font=font)
+        sheet.paste(img, (x, y + label_height))
+        draw.rectangle([x - 1, y + label_height - 1, x + img.width, y + label_height + img.height], outline="gray")
+    sheet.save(output_path)
+
+
+def create_validation_images(fields_json_path, pdf_path, output_dir, pages=None):
+    with open(fields_json_path, 'r') as f:
+        data = json.load(f)
+    fields_by_page = group_fields_by_page(data)
+    if pages is None:
+        pages = [page["page_number"] for page in data["pages"]]
+
+    # Renders any pages that aren't cached yet, in parallel page ranges.
+    page_images = render_pages(pdf_path, pages, max_dim=FORMS_MAX_DIM)
+    os.makedirs(output_dir, exist_ok=True)
+
+    def create(page_number):
+        with Image.open(page_images[page_number]) as page_image:
+            img = page_image.copy()
+        num_boxes = draw_validation_boxes(img, fields_by_page.get(page_number, []))
+        output_path = os.path.join(output_dir, f"page_{page_number}_validation.png")
         img.save(output_path)
+        img.thumbnail((CONTACT_SHEET_THUMB_WIDTH, CONTACT_SHEET_THUMB_WIDTH * 2))
+        return page_number, output_path, num_boxes, img
+
+    with ThreadPoolExecutor(max_workers=DEFAULT_WORKERS) as executor:
+        results = list(executor.map(create, page_images))
+
+    for _, output_path, num_boxes, _ in results:
         print(f"Created validation image at {output_path} with {num_boxes} bounding boxes")
+    if not results:
+        print("No pages to validate, skipping the contact sheet")
+        return
+    contact_sheet_path = os.path.join(output_dir, "contact_sheet.png")
+    create_contact_sheet([(page_number, img) for page_number, _, _, img in results], contact_sheet_path)
+    print(f"Created contact sheet of {len(results)} pages at {contact_sheet_path}")
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        if len(sys.argv) not in (5, 6):
+            print("Usage: create_validation_image.py --batch [fields.json file] [input pdf] [output dir] [pages, e.g. 1,3-5]")
+            sys.exit(1)
+        pages = parse_pages(sys.argv[5]) if len(sys.argv) == 6 else None
+        create_validation_images(sys.argv[2], sys.argv[3], sys.argv[4], pages)
+        sys.exit(0)
     if len(sys.argv) != 5:
-        print("Usage: create_validation_image.py [page number] [fields.json file] [input image path] [output image path]")
+        print("Usage: create_validation_image.py [page number] [fields.json file] [input image or pdf path] [output image path]")
         sys.exit(1)
     page_number = int(sys.argv[1])
     fields_json_path = sys.argv[2]
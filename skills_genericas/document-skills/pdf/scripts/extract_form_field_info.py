@@ -2,6 +2,7 @@ import json
 import sys
 
 from pypdf import PdfReader
+from pypdf.generic import DictionaryObject, IndirectObject
 
 
 # Extracts data for the fillable form fields in a PDF and outputs JSON that
@@ -50,6 +51,114 @@ def make_field_dict(field, field_id):
     return field_dict
 
 
+# Resolves widget annotations to 0-based page indexes. Widgets normally point at
+# their page with /P, so pages' /Annots arrays are only read for widgets that
+# don't, and for ordering radio options the way they appear on the page.
+class WidgetPages:
+    def __init__(self, reader: PdfReader):
+        self.reader = reader
+        self._page_by_ref = None
+        self._page_by_annotation = None
+        self._annotation_positions = {}
+
+    def page_index(self, widget):
+        page_ref = widget.get('/P')
+        if isinstance(page_ref, IndirectObject):
+            if self._page_by_ref is None:
+                self._page_by_ref = {
+                    page.indirect_reference.idnum: i
+                    for i, page in enumerate(self.reader.pages)
+                    if page.indirect_reference is not None
+                }
+            page_index = self._page_by_ref.get(page_ref.idnum)
+            if page_index is not None:
+                return page_index
+        if self._page_by_annotation is None:
+            self._page_by_annotation = {}
+            for i in range(len(self.reader.pages)):
+                for idnum in self.annotation_positions(i):
+                    self._page_by_annotation.setdefault(idnum, i)
+        return self._page_by_annotation.get(_object_number(widget))
+
+    # Returns {annotation object number: index in the page's /Annots}.
+    def annotation_positions(self, page_index):
+        positions = self._annotation_positions.get(page_index)
+        if positions is None:
+            annotations = _resolved(self.reader.pages[page_index], '/Annots') or []
+            positions = {}
+            for i, ref in enumerate(annotations):
+                if isinstance(ref, IndirectObject):
+                    positions.setdefault(ref.idnum, i)
+            self._annotation_positions[page_index] = positions
+        return positions
+
+
+def _resolved(obj, key):
+    value = obj.get(key)
+    return value.get_object() if value is not None else None
+
+
+def _object_number(obj):
+    ref = getattr(obj, 'indirect_reference', None)
+    return ref.idnum if ref is not None else None
+
+
+# Walks /AcroForm /Fields once, depth first. Returns named fields in the same
+# order and with the same keys as PdfReader `get_fields` ({qualified name: field}),
+# plus every widget as (widget, field id from get_full_annotation_field_id).
+# Both names are built from the parent's, so no /Parent chain is climbed twice.
+def walk_fields(reader: PdfReader):
+    acroform = _resolved(reader.trailer['/Root'], '/AcroForm')
+    roots = _resolved(acroform, '/Fields') if acroform else None
+    fields = {}
+    widgets = []
+    visited = set()
+    stack = [(ref, None, None) for ref in reversed(roots or [])]
+    while stack:
+        ref, parent_name, parent_id = stack.pop()
+        node = ref.get_object()
+        if id(node) in visited or ('/T' not in node and '/TM' not in node):
+            continue
+        visited.add(id(node))
+        field_name = node.get('/T')
+        if '/TM' in node:
+            qualified_name = node['/TM']
+        elif parent_name is not None:
+            qualified_name = f"{parent_name}.{field_name or ''}"
+        else:
+            qualified_name = field_name or ''
+        field_id = f"{parent_id}.{field_name}" if parent_id and field_name else (field_name or parent_id)
+        fields[qualified_name] = (node, field_id)
+
+        kids = _resolved(node, '/Kids')
+        if not kids:
+            widgets.append((node, field_id))
+            continue
+        for kid_ref in reversed(kids):
+            kid = kid_ref.get_object()
+            if '/T' in kid or '/TM' in kid:
+                stack.append((kid, qualified_name, field_id))
+            else:
+                # Widget annotation of this field, e.g. one option of a radio group
+                widgets.append((kid, field_id))
+    return fields, widgets
+
+
+# The "/_States_" that PdfReader `get_fields` computes for a field without kids.
+def field_states(field):
+    ft = _resolved(field, '/FT')
+    if ft == "/Ch" and _resolved(field, '/Opt'):
+        return _resolved(field, '/Opt')
+    if ft == "/Btn" and '/AP' in field:
+        normal = _resolved(field['/AP'], '/N')
+        if isinstance(normal, DictionaryObject):
+            states = list(normal.keys())
+            if "/Off" not in states:
+                states.append("/Off")
+            return states
+    return []
+
+
 # Returns a list of fillable PDF fields:
 # [
 #   {
@@ -60,58 +169,67 @@ def make_field_dict(field, field_id):
 #   },
 # ]
 def get_field_info(reader: PdfReader):
-    fields = reader.get_fields()
+    fields, widgets = walk_fields(reader)
 
     field_info_by_id = {}
     possible_radio_names = set()
 
-    for field_id, field in fields.items():
+    for field_id, (field, _) in fields.items():
         # Skip if this is a container field with children, except that it might be
         # a parent group for radio button options.
-        if field.get("/Kids"):
-            if field.get("/FT") == "/Btn":
+        if _resolved(field, '/Kids'):
+            if _resolved(field, '/FT') == "/Btn":
                 possible_radio_names.add(field_id)
             continue
-        field_info_by_id[field_id] = make_field_dict(field, field_id)
+        field_info_by_id[field_id] = make_field_dict(
+            {'/FT': _resolved(field, '/FT'), '/_States_': field_states(field)}, field_id)
 
-    # Bounding rects are stored in annotations in page objects.
+    # Bounding rects are stored in the widget annotations.
 
     # Radio button options have a separate annotation for each choice;
     # all choices have the same field name.
     # See https://westhealth.github.io/exploring-fillable-forms-with-pdfrw.html
-    radio_fields_by_id = {}
+    pages = WidgetPages(reader)
+    radio_options = []
 
-    for page_index, page in enumerate(reader.pages):
-        annotations = page.get('/Annots', [])
-        for ann in annotations:
-            field_id = get_full_annotation_field_id(ann)
-            if field_id in field_info_by_id:
+    for ann, field_id in widgets:
+        if field_id in field_info_by_id:
+            page_index = pages.page_index(ann)
+            if page_index is not None:
                 field_info_by_id[field_id]["page"] = page_index + 1
                 field_info_by_id[field_id]["rect"] = ann.get('/Rect')
-            elif field_id in possible_radio_names:
-                try:
-                    # ann['/AP']['/N'] should have two items. One of them is '/Off',
-                    # the other is the active value.
-                    on_values = [v for v in ann["/AP"]["/N"] if v != "/Off"]
-                except KeyError:
-                    continue
-                if len(on_values) == 1:
-                    rect = ann.get("/Rect")
-                    if field_id not in radio_fields_by_id:
-                        radio_fields_by_id[field_id] = {
-                            "field_id": field_id,
-                            "type": "radio_group",
-                            "page": page_index + 1,
-                            "radio_options": [],
-                        }
-                    # Note: at least on macOS 15.7, Preview.app doesn't show selected
-                    # radio buttons correctly. (It does if you remove the leading slash
-                    # from the value, but that causes them not to appear correctly in
-                    # Chrome/Firefox/Acrobat/etc).
-                    radio_fields_by_id[field_id]["radio_options"].append({
-                        "value": on_values[0],
-                        "rect": rect,
-                    })
+        elif field_id in possible_radio_names:
+            try:
+                # ann['/AP']['/N'] should have two items. One of them is '/Off',
+                # the other is the active value.
+                on_values = [v for v in ann["/AP"]["/N"] if v != "/Off"]
+            except KeyError:
+                continue
+            if len(on_values) == 1:
+                page_index = pages.page_index(ann)
+                if page_index is not None:
+                    position = pages.annotation_positions(page_index).get(_object_number(ann), float('inf'))
+                    radio_options.append(((page_index, position), field_id, on_values[0], ann.get("/Rect")))
+
+    # Options are listed in page order, as they appear in each page's /Annots.
+    radio_fields_by_id = {}
+    radio_options.sort(key=lambda option: option[0])
+    for (page_index, _), field_id, value, rect in radio_options:
+        if field_id not in radio_fields_by_id:
+            radio_fields_by_id[field_id] = {
+                "field_id": field_id,
+                "type": "radio_group",
+                "page": page_index + 1,
+                "radio_options": [],
+            }
+        # Note: at least on macOS 15.7, Preview.app doesn't show selected
+        # radio buttons correctly. (It does if you remove the leading slash
+        # from the value, but that causes them not to appear correctly in
+        # Chrome/Firefox/Acrobat/etc).
+        radio_fields_by_id[field_id]["radio_options"].append({
+            "value": value,
+            "rect": rect,
+        })
 
     # Some PDFs have form field definitions without corresponding annotations,
     # so we can't tell where they are. Ignore these fields for now.
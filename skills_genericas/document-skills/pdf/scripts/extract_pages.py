@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Extract text, words with bounding boxes, and tables from PDF pages as JSON Lines.
+
+Usage:
+    python extract_pages.py <input.pdf> [output.jsonl] [--pages 1,3-5]
+                            [--workers N] [--chunk-size N] [--no-words] [--no-tables]
+
+One JSON object is written per page, in page order, to the output file or to
+stdout:
+    {"page": 1, "width": 612.0, "height": 792.0, "text": "...",
+     "words": [{"text": "Total", "x0": 72.0, "top": 90.5, "x1": 98.2, "bottom": 101.3}],
+     "tables": [[["Header", "Value"], ["a", "1"]]]}
+Coordinates are in PDF points with the origin at the top-left, as in pdfplumber.
+
+Pages are split into chunks that worker processes extract with pdfplumber,
+each opening only its chunk's pages and releasing every page's parsed layout
+once it is extracted, so memory stays flat for very long documents. Records are
+cached by (PDF content hash, page, options), so asking again about the same
+document, or about pages of it that were already extracted, doesn't re-parse
+those pages. The cache is in $PDF_EXTRACT_CACHE or a per-user temp directory,
+bounded in size with least-recently-used eviction.
+
+Main Functions:
+    extract_page: Extract one pdfplumber page to a record
+    extract_pages: Yield page records in order, through the cache
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pdfplumber
+from pypdf import PdfReader
+
+from page_cache import DiskCache, parse_pages, pdf_digest, user_cache_dir
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # Extraction worker processes
+DEFAULT_CHUNK_SIZE = 16  # Pages per worker task
+DEFAULT_CACHE_SIZE_MB = 256  # Default cache size limit in megabytes
+CACHE_VERSION = "1"  # Bump to invalidate all existing cache entries
+
+
+def default_cache_dir() -> Path:
+    """Return $PDF_EXTRACT_CACHE, or a per-user directory under the system temp directory."""
+    return user_cache_dir("PDF_EXTRACT_CACHE", "pdf-extract")
+
+
+class PageRecordCache(DiskCache):
+    """Size-bounded LRU cache of extracted page records stored on disk."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_size_mb: int = DEFAULT_CACHE_SIZE_MB,
+    ):
+        """Initialize the cache, creating the directory if needed.
+
+        Args:
+            cache_dir: Directory holding cached records; defaults to
+                default_cache_dir()
+            max_size_mb: Maximum total size of cached records in megabytes
+        """
+        super().__init__(cache_dir or default_cache_dir(), max_size_mb, ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached record for a key, marking it as recently used."""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key: str, record: Dict[str, Any]):
+        """Store a record, atomically so concurrent readers never see a partial file."""
+        self.put_bytes(key, json.dumps(record).encode())
+
+
+def record_cache_key(digest: str, page: int, words: bool, tables: bool) -> str:
+    """Return the cache key for one page extracted with the given options."""
+    key = f"v{CACHE_VERSION}:{digest}:{page}:{int(words)}:{int(tables)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def extract_page(page: Any, words: bool = True, tables: bool = True) -> Dict[str, Any]:
+    """Extract one pdfplumber page to a JSON-serializable record."""
+    record = {
+        "page": page.page_number,
+        "width": float(page.width),
+        "height": float(page.height),
+        "text": page.extract_text() or "",
+    }
+    if words:
+        record["words"] = [
+            {
+                "text": word["text"],
+                "x0": round(word["x0"], 2),
+                "top": round(word["top"], 2),
+                "x1": round(word["x1"], 2),
+                "bottom": round(word["bottom"], 2),
+            }
+            for word in page.extract_words()
+        ]
+    if tables:
+        record["tables"] = page.extract_tables()
+    return record
+
+
+def extract_chunk(
+    pdf_path: str, pages: List[int], words: bool, tables: bool
+) -> List[Dict[str, Any]]:
+    """Extract a chunk of pages in one pdfplumber session (runs in a worker)."""
+    records = []
+    with pdfplumber.open(pdf_path, pages=pages) as pdf:
+        for page in pdf.pages:
+            records.append(extract_page(page, words, tables))
+            # Drop the page's parsed objects before moving on
+            page.close()
+    return records
+
+
+def extract_pages(
+    pdf_path: Path,
+    pages: Optional[Iterable[int]] = None,
+    words: bool = True,
+    tables: bool = True,
+    workers: int = DEFAULT_WORKERS,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    cache: Optional[PageRecordCache] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield page records in page order, extracting only pages that aren't cached.
+
+    Args:
+        pdf_path: Path to the PDF
+        pages: 1-based page numbers; defaults to every page
+        words: Include words with bounding boxes
+        tables: Include tables
+        workers: Worker processes; 1 extracts in this process
+        chunk_size: Pages per worker task
+        cache: Record cache; defaults to one in default_cache_dir()
+        stats: If given, "cached" and "extracted" page counts are added to it
+
+    Yields:
+        Page records as described in the module docstring
+    """
+    pdf_path = Path(pdf_path)
+    cache = cache or PageRecordCache()
+    page_count = len(PdfReader(pdf_path).pages)
+    # Repeated or overlapping page numbers (e.g. 2,1-3) are extracted once, in first-seen order
+    pages = list(dict.fromkeys(range(1, page_count + 1) if pages is None else pages))
+    invalid = [page for page in pages if not 1 <= page <= page_count]
+    if invalid:
+        raise ValueError(f"Pages out of range (PDF has {page_count} pages): {invalid}")
+
+    digest = pdf_digest(pdf_path)
+    keys = {page: record_cache_key(digest, page, words, tables) for page in pages}
+    cached = {}
+    for page in pages:
+        record = cache.get(keys[page])
+        if record is not None:
+            cached[page] = record
+
+    missing = sorted(set(pages) - set(cached))
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    if stats is not None:
+        stats["cached"] = stats.get("cached", 0) + len(pages) - len(missing)
+        stats["extracted"] = stats.get("extracted", 0) + len(missing)
+
+    def extracted_records(submit):
+        # Keep a bounded number of chunks in flight and yield their records in order
+        pending = deque()
+        remaining = iter(chunks)
+        for chunk in remaining:
+            pending.append(submit(chunk))
+            if len(pending) >= max(1, workers) * 2:
+                break
+        while pending:
+            for record in pending.popleft()():
+                cache.put(keys[record["page"]], record)
+                yield record
+            for chunk in remaining:
+                pending.append(submit(chunk))
+                break
+
+    def merged(fresh):
+        # Interleave fresh records with cached ones, in the requested page order
+        fresh = iter(fresh)
+        extracted = {}
+        for page in pages:
+            if page in cached:
+                yield cached[page]
+                continue
+            while page not in extracted:
+                record = next(fresh)
+                extracted[record["page"]] = record
+            yield extracted.pop(page)
+
+    if workers <= 1 or len(chunks) <= 1:
+        def submit(chunk):
+            return lambda: extract_chunk(str(pdf_path), chunk, words, tables)
+        yield from merged(extracted_records(submit))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            def submit(chunk):
+                return executor.submit(extract_chunk, str(pdf_path), chunk, words, tables).result
+            yield from merged(extracted_records(submit))
+
+    if missing:
+        cache.prune()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Extract text, words and tables from PDF pages as JSON Lines"
+    )
+    parser.add_argument("input", help="Input PDF")
+    parser.add_argument("output", nargs="?", help="Output JSON Lines file (default: stdout)")
+    parser.add_argument("--pages", help="Pages to extract, e.g. 1,3-5 (default: all)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Worker processes (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Pages per worker task (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--no-words", action="store_true", help="Omit words and their boxes")
+    parser.add_argument("--no-tables", action="store_true", help="Omit tables (faster)")
+    args = parser.parse_args()
+
+    pages = parse_pages(args.pages) if args.pages else None
+    stats: Dict[str, int] = {}
+    records = extract_pages(
+        args.input, pages, words=not args.no_words, tables=not args.no_tables,
+        workers=args.workers, chunk_size=max(1, args.chunk_size), stats=stats,
+    )
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    print(f"Extracted {stats['cached'] + stats['extracted']} pages "
+          f"({stats['cached']} from cache)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from pypdf import PdfWriter
+from pypdf.generic import DictionaryObject, IndirectObject, NameObject, TextStringObject
+
+from extract_form_field_info import get_full_annotation_field_id
+
+try:
+    # pypdf 6 builds text and choice appearance streams with these classes.
+    from pypdf.generic._appearance_stream import TextStreamAppearance
+    from pypdf.generic._font import Font
+except ImportError:
+    TextStreamAppearance = None
+
+
+# Sets form field values and builds their appearance streams (/AP) so the filled
+# PDF renders as is, without the viewer regenerating appearances (NeedAppearances).
+#
+# Text and choice appearances are generated with pypdf's TextStreamAppearance, but
+# the fonts are parsed once per form instead of once per field: each /DR font
+# resource, with its glyph widths and character maps, is cached by object number,
+# and each distinct /DA string (font name, size and color) is parsed once. Fonts are
+# referenced from /DR, never re-embedded per field. Values the /DR font can't encode
+# fall back to pypdf's own lookup, which can re-encode or substitute the font; if
+# that can't encode them either, the caller should let the viewer regenerate them.
+#
+# This relies on pypdf internals (private modules and attributes); fill_fillable_fields
+# falls back to pypdf's update_page_form_field_values and NeedAppearances if they're
+# missing (ImportError) or have changed (AttributeError or TypeError).
+#
+# Object numbers are only meaningful within one template, so use one
+# FieldAppearances per template; it can be reused for every record filled from it.
+
+
+def appearances_supported():
+    return TextStreamAppearance is not None
+
+
+class FieldAppearances:
+    def __init__(self):
+        # (font name, font resource object number) -> Font with cached glyph maps
+        self._fonts = {}
+        # /DA bytes -> (font name, font size, font color)
+        self._default_appearances = {}
+        cache = self
+
+        class CachedTextStreamAppearance(TextStreamAppearance):
+            @staticmethod
+            def _parse_default_appearance(default_appearance):
+                return cache._default_appearance(default_appearance)
+
+            @staticmethod
+            def _find_annotation_font_resource(font_name, annotation, acro_form, text):
+                return cache._annotation_font(font_name, annotation, acro_form, text)
+
+        self._appearance_class = CachedTextStreamAppearance
+
+    def _default_appearance(self, default_appearance):
+        key = bytes(default_appearance.original_bytes)
+        if key not in self._default_appearances:
+            self._default_appearances[key] = TextStreamAppearance._parse_default_appearance(default_appearance)
+        return self._default_appearances[key]
+
+    def _annotation_font(self, font_name, annotation, acro_form, text):
+        resources = annotation.get_inherited("/DR", acro_form.get("/DR", DictionaryObject()))
+        font_resource = resources.get_object().get("/Font", DictionaryObject()).get_object().get(font_name)
+        if isinstance(font_resource, IndirectObject):
+            key = (font_name, font_resource.idnum)
+            font = self._fonts.get(key)
+            if font is None:
+                font = Font.from_font_resource(font_resource.get_object())
+                # The maps from unicode to glyphs to bytes only depend on the font.
+                maps = font._get_typographic_maps()
+                font._get_typographic_maps = lambda: maps
+                self._fonts[key] = font
+            if font.can_encode(text):
+                return font_name, font
+        font_name, font = TextStreamAppearance._find_annotation_font_resource(font_name, annotation, acro_form, text)
+        if not font.can_encode(text):
+            self._unencodable = True
+        return font_name, font
+
+    # Sets values for the page's widgets from {field_id: value}, where field IDs are
+    # qualified names as reported by get_field_info. Returns False if some values
+    # can't be encoded with the form's fonts, so their appearances may be wrong.
+    def fill_page(self, writer: PdfWriter, page, field_values):
+        acro_form = writer.root_object["/AcroForm"]
+        self._unencodable = False
+        for annotation in page.get("/Annots", []):
+            annotation = annotation.get_object()
+            if annotation.get("/Subtype") != "/Widget":
+                continue
+            if "/FT" in annotation and "/T" in annotation:
+                field = annotation
+            else:
+                field = annotation.get("/Parent", DictionaryObject()).get_object()
+            field_id = get_full_annotation_field_id(field)
+            if field_id not in field_values:
+                continue
+            value = field_values[field_id]
+
+            field_type = field.get("/FT")
+            if field_type == "/Btn":
+                # Checkboxes and radio buttons already have an appearance per state.
+                state = NameObject(value)
+                if state not in annotation.get("/AP", {}).get("/N", {}):
+                    state = NameObject("/Off")
+                annotation[NameObject("/AS")] = state
+                field[NameObject("/V")] = NameObject(value)
+            elif field_type in ("/Tx", "/Ch"):
+                if field_type == "/Ch" and "/I" in field:
+                    del field["/I"]
+                field[NameObject("/V")] = TextStringObject(value)
+                stream = self._appearance_class.from_text_annotation(
+                    writer, page, False, acro_form, field, annotation
+                )
+                set_normal_appearance(writer, annotation, stream)
+        return not self._unencodable
+
+
+def set_normal_appearance(writer: PdfWriter, annotation, stream):
+    appearance = annotation.get("/AP")
+    normal = appearance.get_object().raw_get("/N") if appearance is not None and "/N" in appearance else None
+    if isinstance(normal, IndirectObject) and normal.pdf is writer:
+        # Replace the existing stream in place rather than leaving it orphaned.
+        writer._objects[normal.idnum - 1] = stream
+        stream.indirect_reference = IndirectObject(normal.idnum, 0, writer)
+    elif appearance is None:
+        annotation[NameObject("/AP")] = DictionaryObject({NameObject("/N"): writer._add_object(stream)})
+    else:
+        appearance.get_object()[NameObject("/N")] = writer._add_object(stream)
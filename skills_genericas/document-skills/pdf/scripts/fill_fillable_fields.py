@@ -1,77 +1,254 @@
+import contextlib
+import csv
+import io
 import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 from pypdf import PdfReader, PdfWriter
 
-from extract_form_field_info import get_field_info
+from field_appearances import FieldAppearances, appearances_supported
+from form_schema import load_form_schema
 
 
 # Fills fillable form fields in a PDF. See forms.md.
+#
+# With --incremental (in either mode), each output is the input PDF followed by an
+# incremental update holding only the changed fields and their appearance streams.
+# The original bytes are kept as they are instead of being re-serialized.
+#
+# With --schema [schema json] (in either mode), the form's fields are read from a
+# schema file compiled from this exact PDF instead of from the PDF, and the schema
+# is written there first if it's missing or stale. See form_schema.py.
+#
+# Batch mode fills one template with many records:
+#   fill_fillable_fields.py --batch [input pdf] [records.jsonl or records.csv] [output dir] [workers]
+# Each JSON Lines record is {"output": "1.pdf", "values": {"field_id": "value", ...}}.
+# A CSV has an "output" column and one column per field ID; empty cells are left
+# unfilled. Output paths are relative to the output directory. One JSON result
+# line is printed per record.
+
 
+DEFAULT_BATCH_WORKERS = os.cpu_count() or 1
 
-def fill_pdf_fields(input_pdf_path: str, fields_json_path: str, output_pdf_path: str):
+
+def fill_pdf_fields(input_pdf_path: str, fields_json_path: str, output_pdf_path: str,
+                    incremental: bool = False, schema_path: str = None):
     with open(fields_json_path) as f:
         fields = json.load(f)
-    # Group by page number.
-    fields_by_page = {}
-    for field in fields:
-        if "value" in field:
-            field_id = field["field_id"]
-            page = field["page"]
-            if page not in fields_by_page:
-                fields_by_page[page] = {}
-            fields_by_page[page][field_id] = field["value"]
     
-    reader = PdfReader(input_pdf_path)
+    pdf_bytes = Path(input_pdf_path).read_bytes()
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+
+    fields_by_ids = load_form_schema(pdf_bytes, schema_path, reader)
+    errors = validation_errors(fields_by_ids, fields)
+    for err in errors:
+        print(err)
+    if errors:
+        sys.exit(1)
 
-    has_error = False
-    field_info = get_field_info(reader)
-    fields_by_ids = {f["field_id"]: f for f in field_info}
+    writer = PdfWriter(reader, incremental=True) if incremental else PdfWriter(clone_from=reader)
+    fill_writer(writer, fields)
+    
+    with open(output_pdf_path, "wb") as f:
+        writer.write(f)
+
+
+def validation_errors(fields_by_ids, fields):
+    errors = []
     for field in fields:
         existing_field = fields_by_ids.get(field["field_id"])
         if not existing_field:
-            has_error = True
-            print(f"ERROR: `{field['field_id']}` is not a valid field ID")
+            errors.append(f"ERROR: `{field['field_id']}` is not a valid field ID")
         elif field["page"] != existing_field["page"]:
-            has_error = True
-            print(f"ERROR: Incorrect page number for `{field['field_id']}` (got {field['page']}, expected {existing_field['page']})")
+            errors.append(f"ERROR: Incorrect page number for `{field['field_id']}` (got {field['page']}, expected {existing_field['page']})")
+        elif "value" in field:
+            err = validation_error_for_field_value(existing_field, field["value"])
+            if err:
+                errors.append(err)
+    return errors
+
+
+# `appearances` caches fonts across fills of the same template; see field_appearances.py.
+def fill_writer(writer: PdfWriter, fields, appearances=None):
+    # Group by page number.
+    fields_by_page = {}
+    for field in fields:
+        if "value" in field:
+            fields_by_page.setdefault(field["page"], {})[field["field_id"]] = field["value"]
+
+    if appearances_supported():
+        # Appearance streams are built here, so viewers don't need to regenerate them.
+        try:
+            appearances = appearances or FieldAppearances()
+            encoded = [appearances.fill_page(writer, writer.pages[page - 1], field_values)
+                       for page, field_values in fields_by_page.items()]
+        except (AttributeError, TypeError) as e:
+            # field_appearances.py relies on pypdf internals; if they changed, fill
+            # the values below (again) and let the viewer draw the appearances.
+            print(f"Warning: could not build appearance streams ({e}), falling back to NeedAppearances", file=sys.stderr)
         else:
-            if "value" in field:
-                err = validation_error_for_field_value(existing_field, field["value"])
-                if err:
-                    print(err)
-                    has_error = True
-    if has_error:
-        sys.exit(1)
+            if not all(encoded):
+                # Some values aren't encodable in the form's fonts; let the viewer redraw them.
+                writer.set_need_appearances_writer(True)
+            return
 
-    writer = PdfWriter(clone_from=reader)
     for page, field_values in fields_by_page.items():
         writer.update_page_form_field_values(writer.pages[page - 1], field_values, auto_regenerate=False)
 
     # This seems to be necessary for many PDF viewers to format the form values correctly.
     # It may cause the viewer to show a "save changes" dialog even if the user doesn't make any changes.
     writer.set_need_appearances_writer(True)
-    
-    with open(output_pdf_path, "wb") as f:
+
+
+# Yields (line number, output path, {field_id: value}, error) for each record;
+# error is None unless the line couldn't be parsed.
+def read_batch_records(records_path: str):
+    with open(records_path, newline="") as f:
+        if records_path.lower().endswith(".csv"):
+            for line_num, row in enumerate(csv.DictReader(f), 2):
+                output = row.pop("output", None)
+                values = {k: v for k, v in row.items() if k and v}
+                yield line_num, output, values, None
+        else:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield line_num, None, None, f"Line {line_num}: {e}"
+                    continue
+                if not isinstance(record, dict) or not isinstance(record.get("values", {}), dict):
+                    yield line_num, None, None, f"Line {line_num}: expected {{\"output\": ..., \"values\": {{...}}}}"
+                    continue
+                yield line_num, record.get("output"), record.get("values", {}), None
+
+
+# Per-process state for batch workers, set once by init_batch_worker.
+_batch_state = {}
+
+
+def init_batch_worker(template_bytes: bytes, incremental: bool):
+    monkeypatch_pydpf_method()
+    # Parsed once per worker; each record is filled into a clone of it.
+    _batch_state["reader"] = PdfReader(io.BytesIO(template_bytes))
+    _batch_state["incremental"] = incremental
+    _batch_state["appearances"] = FieldAppearances() if appearances_supported() else None
+
+
+# Exceptions are reported as an error result so that one bad record doesn't stop the batch.
+def fill_batch_record(output_path: str, fields):
+    try:
+        return fill_record(output_path, fields)
+    except Exception as e:
+        return batch_error(output_path, e)
+
+
+def batch_error(output_path, error):
+    return {"output": output_path, "status": "error", "errors": [f"{type(error).__name__}: {error}"]}
+
+
+def fill_record(output_path: str, fields):
+    reader = _batch_state["reader"]
+    incremental = _batch_state["incremental"]
+    writer = PdfWriter(reader, incremental=True) if incremental else PdfWriter(clone_from=reader)
+    fill_writer(writer, fields, _batch_state["appearances"])
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "wb") as f:
         writer.write(f)
+    return {"output": output_path, "status": "ok", "fields_filled": len(fields)}
+
+
+def fill_pdf_fields_batch(input_pdf_path: str, records_path: str, output_dir: str,
+                          workers: int = DEFAULT_BATCH_WORKERS, incremental: bool = False,
+                          schema_path: str = None):
+    template_bytes = Path(input_pdf_path).read_bytes()
+    # The schema is loaded once; its location warnings go to stderr so that
+    # stdout only has result lines.
+    with contextlib.redirect_stdout(sys.stderr):
+        fields_by_ids = load_form_schema(template_bytes, schema_path)
+
+    failures = 0
+
+    def report(result):
+        nonlocal failures
+        if result["status"] != "ok":
+            failures += 1
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    def valid_records():
+        # Validate in the parent against the schema, so workers only fill.
+        for line_num, output, values, error in read_batch_records(records_path):
+            if error:
+                report({"output": None, "status": "error", "errors": [error]})
+                continue
+            if not output:
+                report({"output": None, "status": "error", "errors": [f"Line {line_num}: missing 'output' path"]})
+                continue
+            output_path = os.path.join(output_dir, output)
+            fields = [{
+                "field_id": field_id,
+                "page": fields_by_ids[field_id]["page"] if field_id in fields_by_ids else None,
+                "value": value,
+            } for field_id, value in values.items()]
+            errors = validation_errors(fields_by_ids, fields)
+            if errors:
+                report({"output": output_path, "status": "error", "errors": errors})
+            else:
+                yield output_path, fields
+
+    if workers <= 1:
+        init_batch_worker(template_bytes, incremental)
+        for output_path, fields in valid_records():
+            report(fill_batch_record(output_path, fields))
+        return failures
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                             initargs=(template_bytes, incremental)) as executor:
+        # Bound the number of queued records so huge inputs are streamed.
+        pending = deque()
+
+        def report_next():
+            output_path, future = pending.popleft()
+            try:
+                report(future.result())
+            except Exception as e:  # e.g. a worker process died
+                report(batch_error(output_path, e))
+
+        for output_path, fields in valid_records():
+            pending.append((output_path, executor.submit(fill_batch_record, output_path, fields)))
+            if len(pending) >= workers * 4:
+                report_next()
+        while pending:
+            report_next()
+
+    return failures
 
 
-def validation_error_for_field_value(field_info, field_value):
-    field_type = field_info["type"]
-    field_id = field_info["field_id"]
+# `field_schema` is a schema entry from form_schema.load_form_schema.
+def validation_error_for_field_value(field_schema, field_value):
+    value_set = field_schema.get("value_set")
+    if value_set is None:
+        return None
+    try:
+        if field_value in value_set:
+            return None
+    except TypeError:
+        pass  # Unhashable values such as lists are never valid options.
+    field_type = field_schema["type"]
+    field_id = field_schema["field_id"]
+    values = field_schema["values"]
     if field_type == "checkbox":
-        checked_val = field_info["checked_value"]
-        unchecked_val = field_info["unchecked_value"]
-        if field_value != checked_val and field_value != unchecked_val:
-            return f'ERROR: Invalid value "{field_value}" for checkbox field "{field_id}". The checked value is "{checked_val}" and the unchecked value is "{unchecked_val}"'
+        checked_val, unchecked_val = values
+        return f'ERROR: Invalid value "{field_value}" for checkbox field "{field_id}". The checked value is "{checked_val}" and the unchecked value is "{unchecked_val}"'
     elif field_type == "radio_group":
-        option_values = [opt["value"] for opt in field_info["radio_options"]]
-        if field_value not in option_values:
-            return f'ERROR: Invalid value "{field_value}" for radio group field "{field_id}". Valid values are: {option_values}' 
+        return f'ERROR: Invalid value "{field_value}" for radio group field "{field_id}". Valid values are: {values}' 
     elif field_type == "choice":
-        choice_values = [opt["value"] for opt in field_info["choice_options"]]
-        if field_value not in choice_values:
-            return f'ERROR: Invalid value "{field_value}" for choice field "{field_id}". Valid values are: {choice_values}'
+        return f'ERROR: Invalid value "{field_value}" for choice field "{field_id}". Valid values are: {values}'
     return None
 
 
@@ -104,11 +281,25 @@ def monkeypatch_pydpf_method():
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: fill_fillable_fields.py [input pdf] [field_values.json] [output pdf]")
+    incremental = "--incremental" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--incremental"]
+    schema_path = None
+    if "--schema" in args:
+        schema_index = args.index("--schema")
+        schema_path = args[schema_index + 1] if schema_index + 1 < len(args) else ""
+        del args[schema_index:schema_index + 2]
+    if args and args[0] == "--batch":
+        if len(args) not in (4, 5) or schema_path == "":
+            print("Usage: fill_fillable_fields.py --batch [--incremental] [--schema schema.json] [input pdf] [records.jsonl or records.csv] [output dir] [workers]")
+            sys.exit(1)
+        workers = int(args[4]) if len(args) == 5 else DEFAULT_BATCH_WORKERS
+        failures = fill_pdf_fields_batch(args[1], args[2], args[3], workers, incremental, schema_path)
+        sys.exit(1 if failures else 0)
+    if len(args) != 3 or schema_path == "":
+        print("Usage: fill_fillable_fields.py [--incremental] [--schema schema.json] [input pdf] [field_values.json] [output pdf]")
         sys.exit(1)
     monkeypatch_pydpf_method()
-    input_pdf = sys.argv[1]
-    fields_json = sys.argv[2]
-    output_pdf = sys.argv[3]
-    fill_pdf_fields(input_pdf, fields_json, output_pdf)
+    input_pdf = args[0]
+    fields_json = args[1]
+    output_pdf = args[2]
+    fill_pdf_fields(input_pdf, fields_json, output_pdf, incremental, schema_path)
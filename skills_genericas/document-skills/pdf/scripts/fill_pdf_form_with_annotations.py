@@ -1,108 +1,112 @@
 import json
 import sys
 
+import numpy as np
 from pypdf import PdfReader, PdfWriter
 from pypdf.annotations import FreeText
+from pypdf.generic import ArrayObject, NameObject
 
 
 # Fills a PDF by adding text annotations defined in `fields.json`. See forms.md.
+# With --incremental, the output is the input PDF followed by an incremental update
+# holding only the new annotations and the pages that reference them.
 
 
-def transform_coordinates(bbox, image_width, image_height, pdf_width, pdf_height):
-    """Transform bounding box from image coordinates to PDF coordinates"""
-    # Image coordinates: origin at top-left, y increases downward
-    # PDF coordinates: origin at bottom-left, y increases upward
+def transform_boxes(boxes, image_width, image_height, pdf_width, pdf_height):
+    """Transform an (n, 4) array of bounding boxes from image to PDF coordinates, in one operation"""
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
     x_scale = pdf_width / image_width
     y_scale = pdf_height / image_height
-    
-    left = bbox[0] * x_scale
-    right = bbox[2] * x_scale
-    
-    # Flip Y coordinates for PDF
-    top = pdf_height - (bbox[1] * y_scale)
-    bottom = pdf_height - (bbox[3] * y_scale)
-    
-    return left, bottom, right, top
+
+    # Image coordinates: origin at top-left, y increases downward
+    # PDF coordinates: origin at bottom-left, y increases upward
+    # [left, top, right, bottom] image boxes become [left, bottom, right, top]
+    transformed = boxes[:, [0, 3, 2, 1]] * [x_scale, y_scale, x_scale, y_scale]
+    transformed[:, 1::2] = pdf_height - transformed[:, 1::2]
+    return transformed
+
+
+def add_page_annotations(writer, page, annotations):
+    """Add new annotations to a writer page, extending its /Annots array once"""
+    refs = []
+    for annotation in annotations:
+        annotation[NameObject("/P")] = page.indirect_reference
+        refs.append(writer._add_object(annotation))
+    if page.annotations is None:
+        page[NameObject("/Annots")] = ArrayObject(refs)
+    else:
+        page.annotations.extend(refs)
 
 
-def fill_pdf_form(input_pdf_path, fields_json_path, output_pdf_path):
+def fill_pdf_form(input_pdf_path, fields_json_path, output_pdf_path, incremental=False):
     """Fill the PDF form with data from fields.json"""
     
     # `fields.json` format described in forms.md.
     with open(fields_json_path, "r") as f:
         fields_data = json.load(f)
     
-    # Open the PDF
+    # Open the PDF and copy it to the writer
     reader = PdfReader(input_pdf_path)
-    writer = PdfWriter()
+    writer = PdfWriter(reader, incremental=True) if incremental else PdfWriter(clone_from=reader)
     
-    # Copy all pages to writer
-    writer.append(reader)
+    page_info_by_number = {p["page_number"]: p for p in fields_data["pages"]}
+
+    # Group fields with text to add by page, skipping empty fields
+    fields_by_page = {}
+    for field in fields_data["form_fields"]:
+        entry_text = field.get("entry_text") or {}
+        if entry_text.get("text"):
+            fields_by_page.setdefault(field["page_number"], []).append(field)
     
-    # Get PDF dimensions for each page
-    pdf_dimensions = {}
-    for i, page in enumerate(reader.pages):
+    annotation_count = 0
+    for page_num, fields in fields_by_page.items():
+        # page_number is 1-based in fields.json, 0-based for pypdf
+        page = writer.pages[page_num - 1]
+        page_info = page_info_by_number[page_num]
         mediabox = page.mediabox
-        pdf_dimensions[i + 1] = [mediabox.width, mediabox.height]
-    
-    # Process each form field
-    annotations = []
-    for field in fields_data["form_fields"]:
-        page_num = field["page_number"]
-        
-        # Get page dimensions and transform coordinates.
-        page_info = next(p for p in fields_data["pages"] if p["page_number"] == page_num)
-        image_width = page_info["image_width"]
-        image_height = page_info["image_height"]
-        pdf_width, pdf_height = pdf_dimensions[page_num]
-        
-        transformed_entry_box = transform_coordinates(
-            field["entry_bounding_box"],
-            image_width, image_height,
-            pdf_width, pdf_height
-        )
-        
-        # Skip empty fields
-        if "entry_text" not in field or "text" not in field["entry_text"]:
-            continue
-        entry_text = field["entry_text"]
-        text = entry_text["text"]
-        if not text:
-            continue
-        
-        font_name = entry_text.get("font", "Arial")
-        font_size = str(entry_text.get("font_size", 14)) + "pt"
-        font_color = entry_text.get("font_color", "000000")
+        entry_boxes = transform_boxes(
+            [field["entry_bounding_box"] for field in fields],
+            page_info["image_width"], page_info["image_height"],
+            mediabox.width, mediabox.height
+        ).tolist()
+
+        annotations = []
+        for field, entry_box in zip(fields, entry_boxes):
+            entry_text = field["entry_text"]
+            font_name = entry_text.get("font", "Arial")
+            font_size = str(entry_text.get("font_size", 14)) + "pt"
+            font_color = entry_text.get("font_color", "000000")
 
-        # Font size/color seems to not work reliably across viewers:
-        # https://github.com/py-pdf/pypdf/issues/2084
-        annotation = FreeText(
-            text=text,
-            rect=transformed_entry_box,
-            font=font_name,
-            font_size=font_size,
-            font_color=font_color,
-            border_color=None,
-            background_color=None,
-        )
-        annotations.append(annotation)
-        # page_number is 0-based for pypdf
-        writer.add_annotation(page_number=page_num - 1, annotation=annotation)
+            # Font size/color seems to not work reliably across viewers:
+            # https://github.com/py-pdf/pypdf/issues/2084
+            annotations.append(FreeText(
+                text=entry_text["text"],
+                rect=entry_box,
+                font=font_name,
+                font_size=font_size,
+                font_color=font_color,
+                border_color=None,
+                background_color=None,
+            ))
+        add_page_annotations(writer, page, annotations)
+        annotation_count += len(annotations)
         
     # Save the filled PDF
     with open(output_pdf_path, "wb") as output:
         writer.write(output)
     
     print(f"Successfully filled PDF form and saved to {output_pdf_path}")
-    print(f"Added {len(annotations)} text annotations")
+    print(f"Added {annotation_count} text annotations")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Usage: fill_pdf_form_with_annotations.py [input pdf] [fields.json] [output pdf]")
+    incremental = "--incremental" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--incremental"]
+    if len(args) != 3:
+        print("Usage: fill_pdf_form_with_annotations.py [--incremental] [input pdf] [fields.json] [output pdf]")
         sys.exit(1)
-    input_pdf = sys.argv[1]
-    fields_json = sys.argv[2]
-    output_pdf = sys.argv[3]
+    input_pdf = args[0]
+    fields_json = args[1]
+    output_pdf = args[2]
     
-    fill_pdf_form(input_pdf, fields_json, output_pdf)
\ No newline at end of file
+    fill_pdf_form(input_pdf, fields_json, output_pdf, incremental)
@@ -0,0 +1,112 @@
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+from pypdf import PdfReader
+
+from extract_form_field_info import get_field_info
+
+
+# Compiles the fillable fields of a PDF into a schema used to validate field values,
+# and saves it so that repeated fills of the same form skip reading its fields. See
+# forms.md.
+#
+# A schema file is JSON:
+#   {"version": 1, "pdf_sha256": "...", "fields": [
+#     {"field_id": "last_name", "type": "text", "page": 1},
+#     {"field_id": "Checkbox12", "type": "checkbox", "page": 1, "values": ["/On", "/Off"]},
+#     {"field_id": "Radio1", "type": "radio_group", "page": 2, "values": ["/A", "/B"]},
+#     {"field_id": "State", "type": "choice", "page": 2, "values": ["CA", "NY"]}]}
+# For checkboxes, "values" is [checked value, unchecked value]. For choice fields
+# the values are the options' export values, which is also what
+# fill_fillable_fields.monkeypatch_pydpf_method makes pypdf use for list fields.
+# The schema is tied to the PDF's SHA-256, so it's only used for the exact same file.
+#
+# Loaded schemas map field IDs to their entries, with "value_set" holding the
+# allowed values as a frozenset so each value is checked in constant time.
+
+
+SCHEMA_VERSION = 1
+
+
+def pdf_sha256(pdf_bytes: bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def compile_field(field_info):
+    entry = {"field_id": field_info["field_id"], "type": field_info["type"], "page": field_info["page"]}
+    if field_info["type"] == "checkbox" and "checked_value" in field_info:
+        entry["values"] = [field_info["checked_value"], field_info["unchecked_value"]]
+    elif field_info["type"] == "radio_group":
+        entry["values"] = [opt["value"] for opt in field_info["radio_options"]]
+    elif field_info["type"] == "choice":
+        entry["values"] = [opt["value"] for opt in field_info["choice_options"]]
+    return entry
+
+
+def compile_form_schema(pdf_bytes: bytes, reader: PdfReader = None):
+    reader = reader or PdfReader(io.BytesIO(pdf_bytes))
+    return {
+        "version": SCHEMA_VERSION,
+        "pdf_sha256": pdf_sha256(pdf_bytes),
+        "fields": [compile_field(f) for f in get_field_info(reader)],
+    }
+
+
+# Returns {field_id: entry} for a schema, ready for validation.
+def fields_by_ids(schema):
+    fields = {}
+    for entry in schema["fields"]:
+        entry = dict(entry)
+        if "values" in entry:
+            entry["value_set"] = frozenset(entry["values"])
+        fields[entry["field_id"]] = entry
+    return fields
+
+
+# Returns {field_id: entry} for the PDF. If schema_path names a schema compiled
+# from this exact PDF it is used as is; otherwise the PDF's fields are read and,
+# if schema_path is given, the compiled schema is written there for next time.
+def load_form_schema(pdf_bytes: bytes, schema_path: str = None, reader: PdfReader = None):
+    if not schema_path:
+        reader = reader or PdfReader(io.BytesIO(pdf_bytes))
+        return fields_by_ids({"fields": [compile_field(f) for f in get_field_info(reader)]})
+    if os.path.exists(schema_path):
+        with open(schema_path) as f:
+            schema = json.load(f)
+        if schema.get("version") == SCHEMA_VERSION and schema.get("pdf_sha256") == pdf_sha256(pdf_bytes):
+            return fields_by_ids(schema)
+    schema = compile_form_schema(pdf_bytes, reader)
+    write_form_schema(schema, schema_path)
+    return fields_by_ids(schema)
+
+
+def write_form_schema(schema, schema_path: str):
+    # Written to a unique temp file and moved into place, so concurrent fills
+    # never read a partial schema or clobber each other's temp file.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(schema_path)), suffix=".tmp")
+    try:
+        # mkstemp creates the file as 0600; give it the mode open() would have.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        with os.fdopen(fd, "w") as f:
+            json.dump(schema, f, indent=2)
+        os.replace(tmp_path, schema_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: form_schema.py [input pdf] [output schema json]")
+        sys.exit(1)
+    with open(sys.argv[1], "rb") as f:
+        schema = compile_form_schema(f.read())
+    write_form_schema(schema, sys.argv[2])
+    print(f"Wrote schema for {len(schema['fields'])} fields to {sys.argv[2]}")
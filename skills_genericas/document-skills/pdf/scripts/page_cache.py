@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the per-page disk caches of the PDF scripts.
+
+page_images.py caches rendered page images and extract_pages.py caches
+extracted page records. Both are flat directories of files named by key:
+reads refresh a file's modification time, which is used for least-recently-
+used eviction once the directory grows past its size limit, and writes are
+atomic so concurrent readers never see a partially written file.
+
+Classes:
+    DiskCache: Directory-backed, size-bounded LRU cache of files
+
+Main Functions:
+    user_cache_dir: Return a configurable per-user cache directory
+    pdf_digest: Hash a PDF's contents
+    parse_pages: Parse a page list like "1,3-5"
+"""
+
+import getpass
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (real path, size, mtime) -> content digest, so unchanged files are hashed once
+_digests: Dict[Tuple[str, int, int], str] = {}
+
+
+def user_cache_dir(env_var: str, name: str) -> Path:
+    """Return $env_var if set, otherwise a per-user directory under the system temp directory."""
+    configured = os.environ.get(env_var)
+    if configured:
+        return Path(configured).expanduser()
+    try:
+        user = getpass.getuser()
+    except Exception:  # No login name or environment variables to go by
+        user = "user"
+    return Path(tempfile.gettempdir()) / f"{name}-{user}"
+
+
+def pdf_digest(pdf_path: Path) -> str:
+    """Hash a PDF's contents, reusing the digest while the file is unchanged."""
+    stat = os.stat(pdf_path)
+    memo_key = (os.path.realpath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    if memo_key not in _digests:
+        hasher = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        _digests[memo_key] = hasher.hexdigest()
+    return _digests[memo_key]
+
+
+def parse_pages(spec: str) -> List[int]:
+    """Parse a page list like "1,3-5" into page numbers."""
+    pages = []
+    for part in spec.split(","):
+        first, _, last = part.partition("-")
+        pages.extend(range(int(first), int(last or first) + 1))
+    return pages
+
+
+class DiskCache:
+    """Size-bounded LRU cache of files stored in one directory."""
+
+    def __init__(self, cache_dir: Path, max_size_mb: int, suffix: str):
+        """Initialize the cache, creating the directory if needed.
+
+        Args:
+            cache_dir: Directory holding cached files
+            max_size_mb: Maximum total size of cached files in megabytes
+            suffix: File name suffix of cached files, e.g. ".png"
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_size_mb * 1024 * 1024
+        self.suffix = suffix
+
+    def path(self, key: str) -> Path:
+        """Return the file path for a key, whether or not it is cached."""
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def get_path(self, key: str) -> Optional[Path]:
+        """Return the cached file for a key, marking it as recently used."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put_file(self, key: str, file_path: Path) -> Path:
+        """Move a file into the cache and return its cached path.
+
+        The file must be on the same filesystem as the cache, so the move is
+        atomic.
+        """
+        path = self.path(key)
+        os.replace(file_path, path)
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> Path:
+        """Write data to the cache atomically and return its cached path."""
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return self.put_file(key, Path(tmp_name))
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def prune(self, keep: Iterable[str] = ()) -> int:
+        """Evict least recently used files until the cache fits its limit.
+
+        Args:
+            keep: Keys that must not be evicted (e.g. files in use by this run)
+
+        Returns:
+            Number of evicted files
+        """
+        protected = set(keep)
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if path.name[:-len(self.suffix)] not in protected:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
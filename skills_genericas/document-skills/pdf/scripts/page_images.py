@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Cached page rasterization for the forms workflow.
+
+Rendered pages are stored in a disk cache keyed by (PDF content hash, page,
+dpi, max_dim), so the check/annotate/validate loop renders each page once:
+convert_pdf_to_images.py fills the cache, and create_validation_image.py
+draws on pages loaded from it instead of re-rendering the PDF or re-reading
+images it wrote earlier. Only pages missing from the cache are rendered, in
+contiguous runs with rasterize_pdf.
+
+The cache is a flat directory of PNG files named by key, with least-recently-
+used eviction (see page_cache.py). Decoded images are also kept in memory for
+the life of the process.
+
+Classes:
+    PageImageCache: Directory-backed, size-bounded LRU cache of page images
+
+Main Functions:
+    render_pages: Render pages through the cache and return their image paths
+    load_page_image: Return a page image in memory
+"""
+
+import hashlib
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+from page_cache import DiskCache, pdf_digest, user_cache_dir
+from rasterize import get_page_count, rasterize_pdf
+
+FORMS_MAX_DIM = 1000  # Page image size used throughout the forms workflow
+DEFAULT_CACHE_SIZE_MB = 512  # Default cache size limit in megabytes
+CACHE_VERSION = "1"  # Bump to invalidate all existing cache entries
+MEMORY_CACHE_PAGES = 16  # Decoded page images kept in memory per process
+
+# Cache key -> decoded image, least recently used first
+_images: "OrderedDict[str, Image.Image]" = OrderedDict()
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory shared by the forms scripts.
+
+    $PDF_PAGE_CACHE if set, otherwise a per-user directory under the system
+    temp directory.
+    """
+    return user_cache_dir("PDF_PAGE_CACHE", "pdf-page-images")
+
+
+def page_cache_key(
+    digest: str, page: int, dpi: Optional[int], max_dim: Optional[int]
+) -> str:
+    """Return the cache key for one page rendered at a given size."""
+    key = f"v{CACHE_VERSION}:{digest}:{page}:{dpi}:{max_dim}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+class PageImageCache(DiskCache):
+    """Size-bounded LRU cache of rendered page images stored on disk."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_size_mb: int = DEFAULT_CACHE_SIZE_MB,
+    ):
+        """Initialize the cache, creating the directory if needed.
+
+        Args:
+            cache_dir: Directory holding cached images; defaults to
+                default_cache_dir()
+            max_size_mb: Maximum total size of cached images in megabytes
+        """
+        super().__init__(cache_dir or default_cache_dir(), max_size_mb, ".png")
+
+
+def page_runs(pages: Iterable[int]) -> List[Tuple[int, int]]:
+    """Group page numbers into sorted, inclusive (first, last) runs of consecutive pages."""
+    runs: List[Tuple[int, int]] = []
+    for page in sorted(set(pages)):
+        if runs and page == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
+
+
+def render_pages(
+    pdf_path: Path,
+    pages: Optional[Iterable[int]] = None,
+    dpi: Optional[int] = None,
+    max_dim: Optional[int] = None,
+    cache: Optional[PageImageCache] = None,
+) -> Dict[int, Path]:
+    """Render PDF pages through the cache.
+
+    Args:
+        pdf_path: Path to the PDF
+        pages: 1-based page numbers to render; defaults to every page
+        dpi: Render resolution, as for rasterize_pdf
+        max_dim: Longer side in pixels, as for rasterize_pdf; takes
+            precedence over dpi
+        cache: Cache to use; defaults to one in default_cache_dir()
+
+    Returns:
+        Dict of page number -> cached PNG path, in page order. The files
+        belong to the cache, so copy them rather than modifying them.
+    """
+    pdf_path = Path(pdf_path)
+    cache = cache or PageImageCache()
+    if pages is None:
+        pages = range(1, get_page_count(pdf_path) + 1)
+
+    digest = pdf_digest(pdf_path)
+    keys = {page: page_cache_key(digest, page, dpi, max_dim) for page in pages}
+    paths = {}
+    for page, key in keys.items():
+        path = cache.get_path(key)
+        if path:
+            paths[page] = path
+
+    missing = [page for page in keys if page not in paths]
+    if missing:
+        page_count = get_page_count(pdf_path)
+        invalid = [page for page in missing if not 1 <= page <= page_count]
+        if invalid:
+            raise ValueError(f"Pages out of range (PDF has {page_count} pages): {invalid}")
+
+        # Render inside the cache directory so images can be moved into place
+        with tempfile.TemporaryDirectory(dir=cache.cache_dir) as render_dir:
+            for first, last in page_runs(missing):
+                rendered = rasterize_pdf(
+                    pdf_path,
+                    Path(render_dir),
+                    fmt="png",
+                    dpi=dpi,
+                    max_dim=max_dim,
+                    first_page=first,
+                    last_page=last,
+                    name="page-{page}",
+                )
+                for image_path in rendered:
+                    page = int(image_path.stem.split("-")[1])
+                    paths[page] = cache.put_file(keys[page], image_path)
+        cache.prune(keep=keys.values())
+
+    return dict(sorted(paths.items()))
+
+
+def load_page_image(
+    pdf_path: Path,
+    page: int,
+    dpi: Optional[int] = None,
+    max_dim: Optional[int] = None,
+    cache: Optional[PageImageCache] = None,
+) -> Image.Image:
+    """Return a page image in memory, rendering it only if it isn't cached.
+
+    Args:
+        pdf_path: Path to the PDF
+        page: 1-based page number
+        dpi: Render resolution, as for rasterize_pdf
+        max_dim: Longer side in pixels; takes precedence over dpi
+        cache: Disk cache to use; defaults to one in default_cache_dir()
+
+    Returns:
+        A copy of the page image that callers may draw on
+    """
+    key = page_cache_key(pdf_digest(pdf_path), page, dpi, max_dim)
+    image = _images.get(key)
+    if image is None:
+        path = render_pages(pdf_path, [page], dpi, max_dim, cache)[page]
+        with Image.open(path) as f:
+            image = f.copy()
+        _images[key] = image
+        if len(_images) > MEMORY_CACHE_PAGES:
+            _images.popitem(last=False)
+    else:
+        _images.move_to_end(key)
+    return image.copy()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory retained by inventory.py on a large generated deck.
+
+Builds a deck with a title and a three-paragraph body on every slide, then
+measures how much memory the extracted inventory keeps alive once
+extraction has finished. tracemalloc covers Python objects; the process
+resident set size (Linux only) also covers the lxml trees of any slides the
+inventory still references.
+
+Usage:
+    python benchmark_inventory.py [--slides N] [--keep-shapes]
+
+Examples:
+    python benchmark_inventory.py
+    # Extracts the inventory of a 500-slide deck
+"""
+
+import argparse
+import ctypes
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from pptx import Presentation
+from pptx.util import Pt
+from inventory import extract_text_inventory
+
+
+def resident_mb() -> float:
+    """Return the resident set size in MB after releasing freed heap memory.
+
+    Returns 0 where /proc is unavailable.
+    """
+    gc.collect()
+    try:
+        # Hand freed malloc arenas back to the OS so RSS reflects live memory
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return 0.0
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def build_deck(path: Path, slide_count: int) -> None:
+    """Write a deck with a title and a formatted bulleted body on every slide."""
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(slide_count):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i}"
+        text_frame = slide.placeholders[1].text_frame
+        for j in range(3):
+            paragraph = text_frame.paragraphs[0] if j == 0 else text_frame.add_paragraph()
+            run = paragraph.add_run()
+            run.text = f"Point {j} on slide {i}"
+            run.font.size = Pt(18)
+            run.font.name = "Arial"
+    prs.save(str(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark inventory.py memory.")
+    parser.add_argument("--slides", type=int, default=500)
+    parser.add_argument(
+        "--keep-shapes",
+        action="store_true",
+        help="Keep shape references in the inventory, as replace.py does",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        deck_path = Path(temp_dir) / "deck.pptx"
+        print(f"Building {args.slides}-slide deck...")
+        build_deck(deck_path, args.slides)
+
+        # Extract a small deck first so imports and caches are not counted
+        warmup_path = Path(temp_dir) / "warmup.pptx"
+        build_deck(warmup_path, 2)
+        extract_text_inventory(warmup_path)
+
+        rss_before = resident_mb()
+        tracemalloc.start()
+        start = time.perf_counter()
+        if args.keep_shapes:
+            inventory = extract_text_inventory(deck_path, keep_shapes=True)
+        else:
+            inventory = extract_text_inventory(deck_path)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        rss_growth = resident_mb() - rss_before
+
+        shapes = sum(len(slide) for slide in inventory.values())
+        print(f"Shapes: {shapes}")
+        print(f"Extraction time: {elapsed:.2f}s")
+        print(f"Python objects retained: {retained / 1024 / 1024:.1f} MB")
+        print(f"Python objects peak: {peak / 1024 / 1024:.1f} MB")
+        print(f"Resident set growth: {rss_growth:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
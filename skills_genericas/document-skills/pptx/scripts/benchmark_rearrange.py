@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark rearrange.py on a large generated template.
+
+Builds a template with one picture and two text placeholders per slide, then
+times rearrange_presentation producing an output deck that repeats and
+reorders template slides.
+
+Usage:
+    python benchmark_rearrange.py [--template-slides N] [--output-slides N]
+
+Examples:
+    python benchmark_rearrange.py
+    # Rearranges a 300-slide template into 1,000 output slides
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+from rearrange import rearrange_presentation
+
+
+def build_template(path: Path, slide_count: int) -> None:
+    """Write a template with a title, body text and a picture on every slide."""
+    image_path = path.parent / "benchmark.png"
+    Image.new("RGB", (400, 300), "#3366AA").save(image_path)
+
+    prs = Presentation()
+    layout = prs.slide_layouts[1]
+    for i in range(slide_count):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Template slide {i}"
+        slide.placeholders[1].text = f"Body text for slide {i}"
+        slide.shapes.add_picture(str(image_path), Inches(6), Inches(4), Inches(2))
+    prs.save(str(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rearrange.py.")
+    parser.add_argument("--template-slides", type=int, default=300)
+    parser.add_argument("--output-slides", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        template_path = Path(temp_dir) / "template.pptx"
+        output_path = Path(temp_dir) / "output.pptx"
+
+        print(f"Building {args.template_slides}-slide template...")
+        build_template(template_path, args.template_slides)
+
+        # Use every template slide at least once plus random repeats, shuffled
+        rng = random.Random(args.seed)
+        sequence = list(range(args.template_slides))
+        sequence += [
+            rng.randrange(args.template_slides)
+            for _ in range(args.output_slides - len(sequence))
+        ]
+        rng.shuffle(sequence)
+
+        print(f"Rearranging into {len(sequence)} slides...")
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            rearrange_presentation(template_path, output_path, sequence)
+        elapsed = time.perf_counter() - start
+
+        output_slides = len(Presentation(str(output_path)).slides)
+        print(f"Output slides: {output_slides}")
+        print(f"Rearrange time: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,12 @@ This module provides functionality to:
 - Sort shapes by visual position on slides
 - Filter out slide numbers and non-content placeholders
 - Export to JSON with clean, structured data
+- Stream to JSON Lines, one slide per line, with an offset index so a
+  single slide can be read back without parsing the whole file
+
+Extraction is read-only: it never touches python-pptx properties that add
+elements as a side effect, so it can run on a Presentation that is about to
+be saved.
 
 Classes:
     ParagraphData: Represents a text paragraph with formatting
@@ -16,10 +22,15 @@ Classes:
 
 Main Functions:
     extract_text_inventory: Extract all text from a presentation
+    iter_text_inventory: Extract text one slide at a time
     save_inventory: Save extracted data to JSON
+    save_inventory_jsonl: Stream extracted data to JSON Lines with an index
+    read_inventory_slide: Read one slide from a JSON Lines inventory
 
 Usage:
     python inventory.py input.pptx output.json
+    python inventory.py input.pptx output.jsonl [--compact]
+    python inventory.py output.jsonl --slide slide-N
 """
 
 import argparse
@@ -28,12 +39,15 @@ import platform
 import sys
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
+from pptx.dml.color import ColorFormat
 from pptx.enum.text import PP_ALIGN
+from pptx.oxml.ns import qn
 from pptx.shapes.base import BaseShape
+from pptx.text.text import Font
 
 # Type aliases for cleaner signatures
 JsonValue = Union[str, int, float, bool, None]
@@ -45,6 +59,9 @@ InventoryData = Dict[
     str, Dict[str, "ShapeData"]
 ]  # Dict of slide_id -> {shape_id -> ShapeData}
 InventoryDict = Dict[str, Dict[str, ShapeDict]]  # JSON-serializable inventory
+SlideInventory = Tuple[str, Dict[str, "ShapeData"]]  # (slide_id, {shape_id -> ShapeData})
+
+INDEX_SUFFIX = ".idx"  # Offset index written next to JSON Lines inventories
 
 
 def main():
@@ -60,6 +77,14 @@ Examples:
   python inventory.py presentation.pptx inventory.json --issues-only
     Extracts only text shapes that have overflow or overlap issues
 
+  python inventory.py presentation.pptx inventory.jsonl --compact
+    Streams the inventory one slide per line, writing inventory.jsonl.idx
+    with the byte offset of every slide. --compact hoists paragraph
+    properties shared by all paragraphs of a shape into "paragraph_defaults"
+
+  python inventory.py inventory.jsonl --slide slide-3
+    Prints one slide of a JSON Lines inventory using its offset index
+
 The output JSON includes:
   - All text content organized by slide and shape
   - Correct absolute positions for shapes in groups
@@ -69,13 +94,29 @@ The output JSON includes:
         """,
     )
 
-    parser.add_argument("input", help="Input PowerPoint file (.pptx)")
-    parser.add_argument("output", help="Output JSON file for inventory")
+    parser.add_argument(
+        "input", help="Input PowerPoint file (.pptx), or .jsonl inventory with --slide"
+    )
+    parser.add_argument(
+        "output",
+        nargs="?",
+        help="Output inventory file (.json, or .jsonl to stream one slide per line)",
+    )
     parser.add_argument(
         "--issues-only",
         action="store_true",
         help="Include only text shapes that have overflow or overlap issues",
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="JSON Lines only: hoist paragraph properties shared within a shape",
+    )
+    parser.add_argument(
+        "--slide",
+        metavar="SLIDE_ID",
+        help="Print one slide (e.g. slide-3) from a .jsonl inventory",
+    )
 
     args = parser.parse_args()
 
@@ -84,27 +125,54 @@ The output JSON includes:
         print(f"Error: Input file not found: {args.input}")
         sys.exit(1)
 
+    if args.slide:
+        if input_path.suffix.lower() != ".jsonl":
+            print("Error: --slide requires a .jsonl inventory as input")
+            sys.exit(1)
+        shapes = read_inventory_slide(input_path, args.slide)
+        if shapes is None:
+            print(f"Error: {args.slide} not found in inventory")
+            sys.exit(1)
+        print(json.dumps({args.slide: shapes}, indent=2, ensure_ascii=False))
+        return
+
     if not input_path.suffix.lower() == ".pptx":
         print("Error: Input must be a PowerPoint file (.pptx)")
         sys.exit(1)
 
+    if not args.output:
+        parser.error("output is required when extracting an inventory")
+    output_path = Path(args.output)
+    streaming = output_path.suffix.lower() == ".jsonl"
+    if args.compact and not streaming:
+        parser.error("--compact requires a .jsonl output file")
+
     try:
         print(f"Extracting text inventory from: {args.input}")
         if args.issues_only:
             print(
                 "Filtering to include only text shapes with issues (overflow/overlap)"
             )
-        inventory = extract_text_inventory(input_path, issues_only=args.issues_only)
-
-        output_path = Path(args.output)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        save_inventory(inventory, output_path)
+        if streaming:
+            index = save_inventory_jsonl(
+                iter_text_inventory(input_path, issues_only=args.issues_only),
+                output_path,
+                compact=args.compact,
+            )
+            total_slides = len(index)
+            total_shapes = sum(count for _, count in index.values())
+        else:
+            inventory = extract_text_inventory(
+                input_path, issues_only=args.issues_only
+            )
+            save_inventory(inventory, output_path)
+            total_slides = len(inventory)
+            total_shapes = sum(len(shapes) for shapes in inventory.values())
 
         print(f"Output saved to: {args.output}")
 
         # Report statistics
-        total_slides = len(inventory)
-        total_shapes = sum(len(shapes) for shapes in inventory.values())
         if args.issues_only:
             if total_shapes > 0:
                 print(
@@ -137,6 +205,23 @@ class ShapeWithPosition:
 class ParagraphData:
     """Data structure for paragraph properties extracted from a PowerPoint paragraph."""
 
+    __slots__ = (
+        "text",
+        "bullet",
+        "level",
+        "alignment",
+        "space_before",
+        "space_after",
+        "font_name",
+        "font_size",
+        "bold",
+        "italic",
+        "underline",
+        "color",
+        "theme_color",
+        "line_spacing",
+    )
+
     def __init__(self, paragraph: Any):
         """Initialize from a PowerPoint paragraph object.
 
@@ -171,18 +256,19 @@ class ParagraphData:
                 or pPr.find(f"{ns}buAutoNum") is not None
             ):
                 self.bullet = True
-                if hasattr(paragraph, "level"):
-                    self.level = paragraph.level
+                # Read from pPr; paragraph.level/alignment add an empty <a:pPr>
+                self.level = pPr.lvl
 
         # Add alignment if not LEFT (default)
-        if hasattr(paragraph, "alignment") and paragraph.alignment is not None:
+        pPr = paragraph._p.pPr
+        if pPr is not None and pPr.algn is not None:
             alignment_map = {
                 PP_ALIGN.CENTER: "CENTER",
                 PP_ALIGN.RIGHT: "RIGHT",
                 PP_ALIGN.JUSTIFY: "JUSTIFY",
             }
-            if paragraph.alignment in alignment_map:
-                self.alignment = alignment_map[paragraph.alignment]
+            if pPr.algn in alignment_map:
+                self.alignment = alignment_map[pPr.algn]
 
         # Add spacing properties if set
         if hasattr(paragraph, "space_before") and paragraph.space_before:
@@ -190,11 +276,13 @@ class ParagraphData:
         if hasattr(paragraph, "space_after") and paragraph.space_after:
             self.space_after = paragraph.space_after.pt
 
-        # Extract font properties from first run
+        # Extract font properties from first run. Read the existing <a:rPr>
+        # directly: run.font adds an <a:rPr> and font.color adds an
+        # <a:solidFill/>, which would modify the presentation being inventoried.
         if paragraph.runs:
-            first_run = paragraph.runs[0]
-            if hasattr(first_run, "font"):
-                font = first_run.font
+            rPr = paragraph.runs[0]._r.rPr
+            if rPr is not None:
+                font = Font(rPr)
                 if font.name:
                     self.font_name = font.name
                 if font.size:
@@ -207,17 +295,20 @@ class ParagraphData:
                     self.underline = font.underline
 
                 # Handle color - both RGB and theme colors
-                try:
-                    # Try RGB color first
-                    if font.color.rgb:
-                        self.color = str(font.color.rgb)
-                except (AttributeError, TypeError):
-                    # Fall back to theme color
+                solid_fill = rPr.find(qn("a:solidFill"))
+                if solid_fill is not None:
+                    color = ColorFormat.from_colorchoice_parent(solid_fill)
                     try:
-                        if font.color.theme_color:
-                            self.theme_color = font.color.theme_color.name
+                        # Try RGB color first
+                        if color.rgb:
+                            self.color = str(color.rgb)
                     except (AttributeError, TypeError):
-                        pass
+                        # Fall back to theme color
+                        try:
+                            if color.theme_color:
+                                self.theme_color = color.theme_color.name
+                        except (AttributeError, TypeError):
+                            pass
 
         # Add line spacing if set
         if hasattr(paragraph, "line_spacing") and paragraph.line_spacing is not None:
@@ -264,7 +355,35 @@ class ParagraphData:
 
 
 class ShapeData:
-    """Data structure for shape properties extracted from a PowerPoint shape."""
+    """Data structure for shape properties extracted from a PowerPoint shape.
+
+    Only the measured fields are kept. The python-pptx shape is used during
+    construction and then dropped unless keep_shape is set, so an inventory
+    does not keep the slide XML trees of the whole presentation alive.
+    """
+
+    __slots__ = (
+        "shape",
+        "shape_id",
+        "slide_width_emu",
+        "slide_height_emu",
+        "placeholder_type",
+        "default_font_size",
+        "left",
+        "top",
+        "width",
+        "height",
+        "left_emu",
+        "top_emu",
+        "width_emu",
+        "height_emu",
+        "paragraphs",
+        "frame_overflow_bottom",
+        "slide_overflow_right",
+        "slide_overflow_bottom",
+        "overlapping_shapes",
+        "warnings",
+    )
 
     @staticmethod
     def emu_to_inches(emu: int) -> float:
@@ -391,6 +510,7 @@ class ShapeData:
         absolute_left: Optional[int] = None,
         absolute_top: Optional[int] = None,
         slide: Optional[Any] = None,
+        keep_shape: bool = False,
     ):
         """Initialize from a PowerPoint shape object.
 
@@ -399,8 +519,9 @@ class ShapeData:
             absolute_left: Absolute left position in EMUs (for shapes in groups)
             absolute_top: Absolute top position in EMUs (for shapes in groups)
             slide: Optional slide object to get dimensions and layout information
+            keep_shape: Keep a reference to the shape after measuring it
         """
-        self.shape = shape  # Store reference to original shape
+        self.shape: Optional[BaseShape] = shape
         self.shape_id: str = ""  # Will be set after sorting
 
         # Get slide dimensions from slide object
@@ -447,11 +568,21 @@ class ShapeData:
             2,  # type: ignore
         )
 
-        # Store EMU positions for overflow calculations
-        self.left_emu = left_emu
-        self.top_emu = top_emu
-        self.width_emu = shape.width if hasattr(shape, "width") else 0
-        self.height_emu = shape.height if hasattr(shape, "height") else 0
+        # Store EMU positions for overflow calculations as plain ints rather
+        # than python-pptx Length objects
+        self.left_emu = int(left_emu)
+        self.top_emu = int(top_emu)
+        self.width_emu = int(shape.width) if hasattr(shape, "width") else 0
+        self.height_emu = int(shape.height) if hasattr(shape, "height") else 0
+
+        # Extract non-empty paragraphs once; overflow estimation reuses them
+        # as (index in text frame, paragraph, ParagraphData)
+        measured = []
+        if hasattr(shape, "text_frame"):
+            for para_idx, paragraph in enumerate(shape.text_frame.paragraphs):  # type: ignore
+                if paragraph.text.strip():
+                    measured.append((para_idx, paragraph, ParagraphData(paragraph)))
+        self.paragraphs: List[ParagraphData] = [para_data for _, _, para_data in measured]
 
         # Calculate overflow status
         self.frame_overflow_bottom: Optional[float] = None
@@ -461,21 +592,12 @@ class ShapeData:
             str, float
         ] = {}  # Dict of shape_id -> overlap area in sq inches
         self.warnings: List[str] = []
-        self._estimate_frame_overflow()
+        self._estimate_frame_overflow(measured)
         self._calculate_slide_overflow()
         self._detect_bullet_issues()
 
-    @property
-    def paragraphs(self) -> List[ParagraphData]:
-        """Calculate paragraphs from the shape's text frame."""
-        if not self.shape or not hasattr(self.shape, "text_frame"):
-            return []
-
-        paragraphs = []
-        for paragraph in self.shape.text_frame.paragraphs:  # type: ignore
-            if paragraph.text.strip():
-                paragraphs.append(ParagraphData(paragraph))
-        return paragraphs
+        if not keep_shape:
+            self.shape = None
 
     def _get_default_font_size(self) -> int:
         """Get default font size from theme text styles or use conservative default."""
@@ -559,8 +681,15 @@ class ShapeData:
 
         return wrapped
 
-    def _estimate_frame_overflow(self) -> None:
-        """Estimate if text overflows the shape bounds using PIL text measurement."""
+    def _estimate_frame_overflow(
+        self, measured: List[Tuple[int, Any, ParagraphData]]
+    ) -> None:
+        """Estimate if text overflows the shape bounds using PIL text measurement.
+
+        Args:
+            measured: (index in text frame, paragraph, ParagraphData) for each
+                non-empty paragraph
+        """
         if not self.shape or not hasattr(self.shape, "text_frame"):
             return
 
@@ -583,12 +712,7 @@ class ShapeData:
         # Calculate total height of all paragraphs
         total_height_px = 0
 
-        for para_idx, paragraph in enumerate(text_frame.paragraphs):
-            if not paragraph.text.strip():
-                continue
-
-            para_data = ParagraphData(paragraph)
-
+        for para_idx, paragraph, para_data in measured:
             # Load font for this paragraph
             font_name = para_data.font_name or "Arial"
             font_size = int(para_data.font_size or default_font_size)
@@ -741,8 +865,9 @@ class ShapeData:
 
 def is_valid_shape(shape: BaseShape) -> bool:
     """Check if a shape contains meaningful text content."""
-    # Must have a text frame with content
-    if not hasattr(shape, "text_frame") or not shape.text_frame:  # type: ignore
+    # Must have a text frame with content. Check has_text_frame first, since
+    # accessing text_frame adds an empty <p:txBody> to shapes without one.
+    if not getattr(shape, "has_text_frame", False) or not shape.text_frame:  # type: ignore
         return False
 
     text = shape.text_frame.text.strip()  # type: ignore
@@ -912,7 +1037,10 @@ def detect_overlaps(shapes: List[ShapeData]) -> None:
 
 
 def extract_text_inventory(
-    pptx_path: Path, prs: Optional[Any] = None, issues_only: bool = False
+    pptx_path: Path,
+    prs: Optional[Any] = None,
+    issues_only: bool = False,
+    keep_shapes: bool = False,
 ) -> InventoryData:
     """Extract text content from all slides in a PowerPoint presentation.
 
@@ -920,15 +1048,37 @@ def extract_text_inventory(
         pptx_path: Path to the PowerPoint file
         prs: Optional Presentation object to use. If not provided, will load from pptx_path.
         issues_only: If True, only include shapes that have overflow or overlap issues
+        keep_shapes: Keep each ShapeData's python-pptx shape in ShapeData.shape
+            (needed to edit shapes afterwards; keeps the slide XML alive)
 
     Returns a nested dictionary: {slide-N: {shape-N: ShapeData}}
     Shapes are sorted by visual position (top-to-bottom, left-to-right).
-    The ShapeData objects contain the full shape information and can be
+    The ShapeData objects contain the measured shape information and can be
     converted to dictionaries for JSON serialization using to_dict().
     """
+    return dict(iter_text_inventory(pptx_path, prs, issues_only, keep_shapes))
+
+
+def iter_text_inventory(
+    pptx_path: Path,
+    prs: Optional[Any] = None,
+    issues_only: bool = False,
+    keep_shapes: bool = False,
+) -> Iterator[SlideInventory]:
+    """Extract text content one slide at a time.
+
+    Yields the same (slide-N, {shape-N: ShapeData}) entries as
+    extract_text_inventory, in slide order, so callers can serialize and
+    discard each slide before the next one is measured.
+
+    Args:
+        pptx_path: Path to the PowerPoint file
+        prs: Optional Presentation object to use. If not provided, will load from pptx_path.
+        issues_only: If True, only include shapes that have overflow or overlap issues
+        keep_shapes: Keep each ShapeData's python-pptx shape in ShapeData.shape
+    """
     if prs is None:
         prs = Presentation(str(pptx_path))
-    inventory: InventoryData = {}
 
     for slide_idx, slide in enumerate(prs.slides):
         # Collect all valid shapes from this slide with absolute positions
@@ -946,6 +1096,7 @@ def extract_text_inventory(
                 swp.absolute_left,
                 swp.absolute_top,
                 slide,
+                keep_shape=keep_shapes,
             )
             for swp in shapes_with_positions
         ]
@@ -967,12 +1118,10 @@ def extract_text_inventory(
             continue
 
         # Create slide inventory using the stable shape IDs
-        inventory[f"slide-{slide_idx}"] = {
+        yield f"slide-{slide_idx}", {
             shape_data.shape_id: shape_data for shape_data in sorted_shapes
         }
 
-    return inventory
-
 
 def get_inventory_as_dict(pptx_path: Path, issues_only: bool = False) -> InventoryDict:
     """Extract text inventory and return as JSON-serializable dictionaries.
@@ -1016,5 +1165,161 @@ def save_inventory(inventory: InventoryData, output_path: Path) -> None:
         json.dump(json_inventory, f, indent=2, ensure_ascii=False)
 
 
+def compact_shape_dict(shape_dict: ShapeDict) -> ShapeDict:
+    """Hoist paragraph properties shared by every paragraph into the shape.
+
+    Properties that have the same value in all paragraphs of the shape move
+    to a "paragraph_defaults" dict and are omitted from each paragraph.
+    expand_shape_dict reverses this exactly.
+    """
+    paragraphs: List[ParagraphDict] = shape_dict.get("paragraphs") or []  # type: ignore
+    if len(paragraphs) < 2:
+        return shape_dict
+
+    first, rest = paragraphs[0], paragraphs[1:]
+    shared = {
+        key: value
+        for key, value in first.items()
+        if key != "text" and all(key in p and p[key] == value for p in rest)
+    }
+    if not shared:
+        return shape_dict
+
+    result = dict(shape_dict)
+    result["paragraph_defaults"] = shared
+    result["paragraphs"] = [
+        {key: value for key, value in p.items() if key not in shared}
+        for p in paragraphs
+    ]
+    return result
+
+
+def expand_shape_dict(shape_dict: ShapeDict) -> ShapeDict:
+    """Restore paragraph properties hoisted by compact_shape_dict."""
+    defaults: Optional[ParagraphDict] = shape_dict.get("paragraph_defaults")  # type: ignore
+    if not defaults:
+        return shape_dict
+
+    result = {k: v for k, v in shape_dict.items() if k != "paragraph_defaults"}
+    result["paragraphs"] = [
+        {"text": p["text"], **defaults, **p}
+        for p in shape_dict["paragraphs"]  # type: ignore
+    ]
+    return result
+
+
+def inventory_index_path(jsonl_path: Path) -> Path:
+    """Return the path of the offset index for a JSON Lines inventory."""
+    jsonl_path = Path(jsonl_path)
+    return jsonl_path.with_name(jsonl_path.name + INDEX_SUFFIX)
+
+
+def save_inventory_jsonl(
+    slides: Iterable[SlideInventory], output_path: Path, compact: bool = False
+) -> Dict[str, Tuple[int, int]]:
+    """Stream an inventory to JSON Lines, one slide per line.
+
+    Each line is {"slide": "slide-N", "shapes": {shape-N: {...}}}. Slides are
+    written as they are produced, so only one slide is held in memory when
+    given iter_text_inventory. An index mapping each slide ID to its byte
+    offset and shape count is written next to the file (see
+    inventory_index_path).
+
+    Args:
+        slides: (slide_id, {shape_id: ShapeData}) pairs in slide order
+        output_path: Path of the .jsonl file to write
+        compact: Hoist paragraph properties shared within each shape
+
+    Returns:
+        The index: slide_id -> (byte offset, shape count)
+    """
+    index: Dict[str, Tuple[int, int]] = {}
+    with open(output_path, "wb") as f:
+        for slide_key, shapes in slides:
+            shape_dicts = {}
+            for shape_key, shape_data in shapes.items():
+                shape_dict = shape_data.to_dict()
+                shape_dicts[shape_key] = (
+                    compact_shape_dict(shape_dict) if compact else shape_dict
+                )
+            record = {"slide": slide_key, "shapes": shape_dicts}
+            index[slide_key] = (f.tell(), len(shape_dicts))
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+            f.write(line.encode("utf-8") + b"\n")
+
+    with open(inventory_index_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    return index
+
+
+def load_inventory_index(jsonl_path: Path) -> Dict[str, Tuple[int, int]]:
+    """Load the offset index of a JSON Lines inventory.
+
+    Falls back to scanning the file when the index is missing or older than
+    the inventory itself.
+    """
+    jsonl_path = Path(jsonl_path)
+    index_path = inventory_index_path(jsonl_path)
+    if (
+        index_path.exists()
+        and index_path.stat().st_mtime >= jsonl_path.stat().st_mtime
+    ):
+        with open(index_path, encoding="utf-8") as f:
+            return {key: tuple(value) for key, value in json.load(f).items()}  # type: ignore
+
+    index: Dict[str, Tuple[int, int]] = {}
+    with open(jsonl_path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                index[record["slide"]] = (offset, len(record["shapes"]))
+            offset += len(line)
+    return index
+
+
+def read_inventory_slide(
+    jsonl_path: Path, slide_key: str, expand: bool = True
+) -> Optional[Dict[str, ShapeDict]]:
+    """Read one slide from a JSON Lines inventory by seeking to its offset.
+
+    Args:
+        jsonl_path: Path to the .jsonl inventory
+        slide_key: Slide ID such as "slide-3"
+        expand: Restore paragraph properties hoisted by compact output
+
+    Returns:
+        The slide's {shape_id: shape dict}, or None if the slide is not present
+    """
+    entry = load_inventory_index(jsonl_path).get(slide_key)
+    if entry is None:
+        return None
+
+    with open(jsonl_path, "rb") as f:
+        f.seek(entry[0])
+        record = json.loads(f.readline())
+    shapes = record["shapes"]
+    if expand:
+        shapes = {key: expand_shape_dict(value) for key, value in shapes.items()}
+    return shapes
+
+
+def iter_inventory_jsonl(
+    jsonl_path: Path, expand: bool = True
+) -> Iterator[Tuple[str, Dict[str, ShapeDict]]]:
+    """Iterate over (slide_id, {shape_id: shape dict}) in a JSON Lines inventory."""
+    with open(jsonl_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            shapes = record["shapes"]
+            if expand:
+                shapes = {
+                    key: expand_shape_dict(value) for key, value in shapes.items()
+                }
+            yield record["slide"], shapes
+
+
 if __name__ == "__main__":
     main()
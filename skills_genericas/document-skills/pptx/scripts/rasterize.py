@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Rasterize PDF pages to image files with poppler's pdftoppm.
+
+Pages are split into contiguous ranges that are rendered concurrently by
+separate pdftoppm processes (one per range, using -f/-l). Each process writes
+its pages straight to disk one at a time, so memory use stays flat regardless
+of page count, and pages can be rendered directly at their target size
+(-scale-to) instead of being rendered large and resized afterwards.
+
+Main Functions:
+    get_page_count: Read the number of pages in a PDF with pdfinfo
+    split_page_ranges: Split a page range into contiguous chunks
+    rasterize_pdf: Render PDF pages to image files in parallel
+"""
+
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # Concurrent pdftoppm processes
+MIN_PAGES_PER_WORKER = 4  # Avoid spawning processes for tiny ranges
+
+# Output format -> (pdftoppm flag, file extension written by pdftoppm)
+FORMATS = {
+    "png": ("-png", "png"),
+    "jpeg": ("-jpeg", "jpg"),
+}
+
+
+def get_page_count(pdf_path: Path) -> int:
+    """Read the number of pages in a PDF with pdfinfo."""
+    result = subprocess.run(
+        ["pdfinfo", str(pdf_path)], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not read PDF info: {result.stderr.strip()}")
+    match = re.search(r"^Pages:\s+(\d+)", result.stdout, re.MULTILINE)
+    if not match:
+        raise RuntimeError("Could not determine PDF page count")
+    return int(match.group(1))
+
+
+def split_page_ranges(
+    first_page: int, last_page: int, workers: int
+) -> List[Tuple[int, int]]:
+    """Split an inclusive page range into at most `workers` contiguous chunks.
+
+    Args:
+        first_page: First page of the range (1-based)
+        last_page: Last page of the range (inclusive)
+        workers: Maximum number of chunks
+
+    Returns:
+        List of (first, last) tuples covering the range in order
+    """
+    total = last_page - first_page + 1
+    if total <= 0:
+        return []
+    chunks = max(1, min(workers, total // MIN_PAGES_PER_WORKER))
+    size, extra = divmod(total, chunks)
+
+    ranges = []
+    start = first_page
+    for i in range(chunks):
+        end = start + size - 1 + (1 if i < extra else 0)
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def _render_range(
+    pdf_path: Path,
+    output_dir: Path,
+    page_range: Tuple[int, int],
+    chunk_prefix: str,
+    fmt: str,
+    dpi: Optional[int],
+    max_dim: Optional[int],
+) -> List[Tuple[int, Path]]:
+    """Render one page range with pdftoppm and return (page, path) pairs."""
+    flag, ext = FORMATS[fmt]
+    cmd = ["pdftoppm", flag, "-f", str(page_range[0]), "-l", str(page_range[1])]
+    if max_dim:
+        # Scales the longer side to max_dim; takes precedence over -r
+        cmd += ["-scale-to", str(max_dim)]
+    elif dpi:
+        cmd += ["-r", str(dpi)]
+    cmd += [str(pdf_path), str(output_dir / chunk_prefix)]
+
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Image conversion failed for pages {page_range[0]}-{page_range[1]}: "
+            f"{result.stderr.strip()}"
+        )
+
+    # pdftoppm names files <prefix>-<page>.<ext>, zero-padded by page count
+    pattern = re.compile(rf"^{re.escape(chunk_prefix)}-(\d+)\.{ext}$")
+    pages = []
+    for path in output_dir.glob(f"{chunk_prefix}-*.{ext}"):
+        match = pattern.match(path.name)
+        if match:
+            pages.append((int(match.group(1)), path))
+    return pages
+
+
+def rasterize_pdf(
+    pdf_path: Path,
+    output_dir: Path,
+    fmt: str = "png",
+    dpi: Optional[int] = None,
+    max_dim: Optional[int] = None,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    workers: int = DEFAULT_WORKERS,
+    name: str = "page-{page}",
+) -> List[Path]:
+    """Render PDF pages to image files using parallel pdftoppm processes.
+
+    Args:
+        pdf_path: Path to the PDF
+        output_dir: Directory to write images to
+        fmt: Output format, "png" or "jpeg"
+        dpi: Render resolution (pdftoppm defaults to 150 if neither is set)
+        max_dim: Render so the longer side is exactly max_dim pixels;
+            takes precedence over dpi
+        first_page: First page to render (1-based)
+        last_page: Last page to render (inclusive); defaults to the last page
+        workers: Maximum number of concurrent pdftoppm processes
+        name: Output file stem, formatted with the 1-based page number
+
+    Returns:
+        List of image paths in page order
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    pdf_path = Path(pdf_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if last_page is None:
+        last_page = get_page_count(pdf_path)
+    ranges = split_page_ranges(first_page, last_page, workers)
+    if not ranges:
+        return []
+
+    # Unique per-call prefix so concurrent calls can share an output directory
+    prefix = f".rasterize-{os.getpid()}-{id(ranges)}"
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(
+                _render_range,
+                pdf_path,
+                output_dir,
+                page_range,
+                f"{prefix}-{i}",
+                fmt,
+                dpi,
+                max_dim,
+            )
+            for i, page_range in enumerate(ranges)
+        ]
+        try:
+            rendered = [page for future in futures for page in future.result()]
+        except Exception:
+            # Wait for the remaining ranges, then drop their partial output
+            executor.shutdown(wait=True)
+            for path in output_dir.glob(f"{prefix}-*"):
+                path.unlink(missing_ok=True)
+            raise
+
+    ext = FORMATS[fmt][1]
+    image_paths = []
+    for page, path in sorted(rendered):
+        final_path = output_dir / f"{name.format(page=page)}.{ext}"
+        os.replace(path, final_path)
+        image_paths.append(final_path)
+    return image_paths
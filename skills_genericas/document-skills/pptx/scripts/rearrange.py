@@ -13,10 +13,15 @@ import argparse
 import shutil
 import sys
 from copy import deepcopy
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, List, Tuple
 
-import six
 from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.oxml.xmlchemy import OxmlElement
+from pptx.parts.slide import SlidePart
 
 
 def main():
@@ -72,84 +77,107 @@ Note: Slide indices are 0-based (first slide is 0, second is 1, etc.)
         sys.exit(1)
 
 
-def duplicate_slide(pres, index):
-    """Duplicate a slide in the presentation."""
-    source = pres.slides[index]
+# Attributes in the relationships namespace hold rId references (r:embed, r:link, r:id)
+R_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
 
-    # Use source's layout to preserve formatting
-    new_slide = pres.slides.add_slide(source.slide_layout)
+@dataclass
+class SlideCopy:
+    """Everything needed to stamp out duplicates of one source slide.
+
+    Computed once per source slide: the media relationships to share, and the
+    source shapes with their rId references already rewritten for the
+    duplicate. Every duplicate is a fresh slide part whose only relationship is
+    rId1 to its layout, so the shared media relationships always receive the
+    same rIds (rId2, rId3, ...) and the prepared shapes can be copied as-is.
+    """
 
+    layout_part: Any
+    media_rels: List[Tuple[str, Any]]  # (reltype, target_part) in rId order
+    shape_elements: List[Any]
+
+
+def prepare_slide_copy(source) -> SlideCopy:
+    """Build the relationship map and rewritten shape tree for a source slide."""
     # Collect all image and media relationships from the source slide
-    image_rels = {}
-    for rel_id, rel in six.iteritems(source.part.rels):
+    media_rels = []
+    rId_map = {}
+    for rId, rel in sorted(source.part.rels.items(), key=lambda item: item[0]):
+        if rel.is_external:
+            continue
         if "image" in rel.reltype or "media" in rel.reltype:
-            image_rels[rel_id] = rel
-
-    # CRITICAL: Clear placeholder shapes to avoid duplicates
-    for shape in new_slide.shapes:
-        sp = shape.element
-        sp.getparent().remove(sp)
+            media_rels.append((rel.reltype, rel.target_part))
+            rId_map[rId] = f"rId{len(media_rels) + 1}"  # rId1 is the layout
 
-    # Copy all shapes from source
-    for shape in source.shapes:
-        el = shape.element
+    # Copy all shapes from source, pointing media references at the new rIds
+    shape_elements = []
+    for el in source.shapes._spTree.iter_shape_elms():
         new_el = deepcopy(el)
-        new_slide.shapes._spTree.insert_element_before(new_el, "p:extLst")
-
-        # Handle picture shapes - need to update the blip reference
-        # Look for all blip elements (they can be in pic or other contexts)
-        # Using the element's own xpath method without namespaces argument
-        blips = new_el.xpath(".//a:blip[@r:embed]")
-        for blip in blips:
-            old_rId = blip.get(
-                "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed"
-            )
-            if old_rId in image_rels:
-                # Create a new relationship in the destination slide for this image
-                old_rel = image_rels[old_rId]
-                # get_or_add returns the rId directly, or adds and returns new rId
-                new_rId = new_slide.part.rels.get_or_add(
-                    old_rel.reltype, old_rel._target
-                )
-                # Update the blip's embed reference to use the new relationship ID
-                blip.set(
-                    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed",
-                    new_rId,
-                )
-
-    # Copy any additional image/media relationships that might be referenced elsewhere
-    for rel_id, rel in image_rels.items():
-        try:
-            new_slide.part.rels.get_or_add(rel.reltype, rel._target)
-        except Exception:
-            pass  # Relationship might already exist
-
-    return new_slide
-
-
-def delete_slide(pres, index):
-    """Delete a slide from the presentation."""
-    rId = pres.slides._sldIdLst[index].rId
-    pres.part.drop_rel(rId)
-    del pres.slides._sldIdLst[index]
-
-
-def reorder_slides(pres, slide_index, target_index):
-    """Move a slide from one position to another."""
-    slides = pres.slides._sldIdLst
-
-    # Remove slide element from current position
-    slide_element = slides[slide_index]
-    slides.remove(slide_element)
-
-    # Insert at target position
-    slides.insert(target_index, slide_element)
+        for node in new_el.iter():
+            for attr, value in node.attrib.items():
+                if attr.startswith(R_NS) and value in rId_map:
+                    node.set(attr, rId_map[value])
+        shape_elements.append(new_el)
+
+    return SlideCopy(source.slide_layout.part, media_rels, shape_elements)
+
+
+def add_slide_copy(pres, slide_copy: SlideCopy, partname: str) -> str:
+    """Add a duplicate slide part to the presentation and return its rId.
+
+    The slide is related to the presentation part but not added to the slide
+    list; the caller places it in `sldIdLst`.
+    """
+    slide_part = SlidePart.new(
+        PackURI(partname), pres.part.package, slide_copy.layout_part
+    )
+
+    # Media parts are shared with the source slide, not copied
+    for reltype, target_part in slide_copy.media_rels:
+        slide_part.rels._add_relationship(reltype, target_part)
+
+    spTree = slide_part.slide.shapes._spTree
+    for el in slide_copy.shape_elements:
+        spTree.insert_element_before(deepcopy(el), "p:extLst")
+
+    # A new part can't match an existing relationship, so skip get_or_add's
+    # linear search over all slide relationships
+    return pres.part.rels._add_relationship(RT.SLIDE, slide_part)
+
+
+def duplicate_slide(pres, index):
+    """Duplicate a slide in the presentation, appending it to the end."""
+    slides = pres.slides
+    source = slides[index]
+    partname = f"/ppt/slides/slide{len(slides) + 1}.xml"
+    rId = add_slide_copy(pres, prepare_slide_copy(source), partname)
+    slides._sldIdLst.add_sldId(rId)
+    return pres.slides[len(slides)]
+
+
+def plan_slide_sequence(slide_sequence):
+    """Mark which positions reuse an original slide and which need a duplicate.
+
+    The first occurrence of each template index uses the original slide;
+    later occurrences are duplicates. Returns a list of
+    (template_index, is_duplicate) tuples in output order.
+    """
+    seen = set()
+    plan = []
+    for template_idx in slide_sequence:
+        plan.append((template_idx, template_idx in seen))
+        seen.add(template_idx)
+    return plan
 
 
 def rearrange_presentation(template_path, output_path, slide_sequence):
     """
     Create a new presentation with slides from template in specified order.
 
+    The final slide order is computed up front. Duplicates are created
+    directly from a per-source-slide copy template, unused slides are
+    dropped, and `sldIdLst` is rebuilt once in the final order.
+
     Args:
         template_path: Path to template PPTX file
         output_path: Path for output PPTX file
@@ -162,70 +190,69 @@ def rearrange_presentation(template_path, output_path, slide_sequence):
     else:
         prs = Presentation(template_path)
 
-    total_slides = len(prs.slides)
+    # Accessing prs.slides renames slide parts, so only do it once
+    slides_collection = prs.slides
+    slides = list(slides_collection)
+    sldIdLst = slides_collection._sldIdLst
+    original_sldIds = list(sldIdLst)
+    total_slides = len(slides)
 
     # Validate indices
     for idx in slide_sequence:
         if idx < 0 or idx >= total_slides:
             raise ValueError(f"Slide index {idx} out of range (0-{total_slides - 1})")
 
-    # Track original slides and their duplicates
-    slide_map = []  # List of actual slide indices for final presentation
-    duplicated = {}  # Track duplicates: original_idx -> [duplicate_indices]
+    plan = plan_slide_sequence(slide_sequence)
 
-    # Step 1: DUPLICATE repeated slides
+    # Step 1: DUPLICATE repeated slides and build the final sequence
     print(f"Processing {len(slide_sequence)} slides from template...")
-    for i, template_idx in enumerate(slide_sequence):
-        if template_idx in duplicated and duplicated[template_idx]:
-            # Already duplicated this slide, use the duplicate
-            slide_map.append(duplicated[template_idx].pop(0))
-            print(f"  [{i}] Using duplicate of slide {template_idx}")
-        elif slide_sequence.count(template_idx) > 1 and template_idx not in duplicated:
-            # First occurrence of a repeated slide - create duplicates
-            slide_map.append(template_idx)
-            duplicates = []
-            count = slide_sequence.count(template_idx) - 1
-            print(
-                f"  [{i}] Using original slide {template_idx}, creating {count} duplicate(s)"
-            )
-            for _ in range(count):
-                duplicate_slide(prs, template_idx)
-                duplicates.append(len(prs.slides) - 1)
-            duplicated[template_idx] = duplicates
-        else:
-            # Unique slide or first occurrence already handled, use original
-            slide_map.append(template_idx)
+    slide_copies = {}  # template_idx -> SlideCopy
+    next_slide_id = max([255] + [int(sldId.get("id")) for sldId in original_sldIds])
+    next_partname = total_slides
+    final_sldIds = []
+    for i, (template_idx, is_duplicate) in enumerate(plan):
+        if not is_duplicate:
+            final_sldIds.append(original_sldIds[template_idx])
             print(f"  [{i}] Using original slide {template_idx}")
+            continue
+
+        if template_idx not in slide_copies:
+            slide_copies[template_idx] = prepare_slide_copy(slides[template_idx])
+        next_partname += 1
+        rId = add_slide_copy(
+            prs,
+            slide_copies[template_idx],
+            f"/ppt/slides/slide{next_partname}.xml",
+        )
 
-    # Step 2: DELETE unwanted slides (work backwards)
-    slides_to_keep = set(slide_map)
-    print(f"\nDeleting {len(prs.slides) - len(slides_to_keep)} unused slides...")
-    for i in range(len(prs.slides) - 1, -1, -1):
-        if i not in slides_to_keep:
-            delete_slide(prs, i)
-            # Update slide_map indices after deletion
-            slide_map = [idx - 1 if idx > i else idx for idx in slide_map]
-
-    # Step 3: REORDER to final sequence
-    print(f"Reordering {len(slide_map)} slides to final sequence...")
-    for target_pos in range(len(slide_map)):
-        # Find which slide should be at target_pos
-        current_pos = slide_map[target_pos]
-        if current_pos != target_pos:
-            reorder_slides(prs, current_pos, target_pos)
-            # Update slide_map: the move shifts other slides
-            for i in range(len(slide_map)):
-                if slide_map[i] > current_pos and slide_map[i] <= target_pos:
-                    slide_map[i] -= 1
-                elif slide_map[i] < current_pos and slide_map[i] >= target_pos:
-                    slide_map[i] += 1
-            slide_map[target_pos] = target_pos
+        next_slide_id += 1
+        sldId = OxmlElement("p:sldId")
+        sldId.set("id", str(next_slide_id))
+        sldId.set(f"{R_NS}id", rId)
+        final_sldIds.append(sldId)
+        print(f"  [{i}] Using duplicate of slide {template_idx}")
+
+    # Step 2: DELETE unwanted slides
+    used_originals = {template_idx for template_idx, _ in plan}
+    unused = [
+        sldId
+        for idx, sldId in enumerate(original_sldIds)
+        if idx not in used_originals
+    ]
+    print(f"\nDeleting {len(unused)} unused slides...")
+    for sldId in unused:
+        prs.part.rels.pop(sldId.rId)
+
+    # Step 3: REBUILD the slide list in final order in a single pass
+    print(f"Reordering {len(final_sldIds)} slides to final sequence...")
+    for sldId in original_sldIds:
+        sldIdLst.remove(sldId)
+    sldIdLst.extend(final_sldIds)
 
     # Save the presentation
     prs.save(output_path)
     print(f"\nSaved rearranged presentation to: {output_path}")
-    print(f"Final presentation has {len(prs.slides)} slides")
-
+    print(f"Final presentation has {len(final_sldIds)} slides")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Disk cache for rendered slide images.
+
+Each slide is keyed by a content hash of everything that affects how it
+renders: the slide XML, its slide layout and slide master, and the parts
+those reference (theme, images, media, charts). A slide only needs to be
+re-rendered when one of those parts changes, so repeated thumbnail runs on a
+deck where a single slide was edited only render that slide.
+
+The cache is a flat directory of JPEG files named by key. Reads refresh the
+file's modification time, which is used for least-recently-used eviction
+once the directory grows past its size limit.
+
+Classes:
+    SlideRenderCache: Directory-backed, size-bounded LRU image cache
+
+Main Functions:
+    slide_cache_keys: Compute a render cache key for every slide in a deck
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+DEFAULT_CACHE_SIZE_MB = 512  # Default cache size limit in megabytes
+CACHE_VERSION = "1"  # Bump to invalidate all existing cache entries
+
+# Relationships that point at other slides/layouts rather than at content the
+# slide renders (hyperlinks between slides, notes, the master's layout list).
+IGNORED_RELTYPES = {
+    RT.SLIDE,
+    RT.SLIDE_LAYOUT,
+    RT.SLIDE_MASTER,
+    RT.NOTES_SLIDE,
+    RT.NOTES_MASTER,
+}
+
+
+def _part_digest(part: Any, digests: Dict[str, str]) -> str:
+    """Hash a part's blob together with the content parts it references.
+
+    Args:
+        part: The python-pptx part to hash
+        digests: Memo of partname -> digest shared across all slides
+
+    Returns:
+        Hex digest for the part
+    """
+    partname = str(part.partname)
+    if partname in digests:
+        return digests[partname]
+
+    hasher = hashlib.sha256()
+    hasher.update(part.blob)
+    for rId, rel in sorted(part.rels.items()):
+        if rel.is_external:
+            hasher.update(f"{rId}:{rel.target_ref}".encode())
+            continue
+        if rel.reltype in IGNORED_RELTYPES:
+            continue
+        target = rel.target_part
+        target_name = str(target.partname)
+        if target_name not in digests:
+            digests[target_name] = hashlib.sha256(target.blob).hexdigest()
+        hasher.update(f"{rId}:{digests[target_name]}".encode())
+
+    digests[partname] = hasher.hexdigest()
+    return digests[partname]
+
+
+def slide_cache_keys(prs: Any, dpi: int) -> List[str]:
+    """Compute a render cache key for every slide in a presentation.
+
+    Args:
+        prs: Presentation object
+        dpi: Resolution the slides are rendered at
+
+    Returns:
+        List of hex keys, one per slide in presentation order
+    """
+    digests: Dict[str, str] = {}
+    prefix = f"v{CACHE_VERSION}:{dpi}:{prs.slide_width}x{prs.slide_height}"
+
+    keys = []
+    for slide in prs.slides:
+        layout = slide.slide_layout
+        hasher = hashlib.sha256(prefix.encode())
+        hasher.update(_part_digest(slide.part, digests).encode())
+        hasher.update(_part_digest(layout.part, digests).encode())
+        hasher.update(_part_digest(layout.slide_master.part, digests).encode())
+        keys.append(hasher.hexdigest())
+    return keys
+
+
+class SlideRenderCache:
+    """Size-bounded LRU cache of rendered slide images stored on disk."""
+
+    def __init__(self, cache_dir: Path, max_size_mb: int = DEFAULT_CACHE_SIZE_MB):
+        """Initialize the cache, creating the directory if needed.
+
+        Args:
+            cache_dir: Directory holding cached images
+            max_size_mb: Maximum total size of cached images in megabytes
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_size_mb * 1024 * 1024
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.jpg"
+
+    def get(self, key: str) -> Optional[Path]:
+        """Return the cached image for a key, marking it as recently used."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, image_path: Path) -> Path:
+        """Copy a rendered image into the cache and return its cached path."""
+        path = self._path(key)
+        # Write to a temporary name first so concurrent readers never see a
+        # partially copied file
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(image_path, tmp_name)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        return path
+
+    def prune(self, keep: Iterable[str] = ()) -> int:
+        """Evict least recently used images until the cache fits its limit.
+
+        Args:
+            keep: Keys that must not be evicted (e.g. images in use by this run)
+
+        Returns:
+            Number of evicted images
+        """
+        protected = set(keep)
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob("*.jpg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            if path.stem not in protected:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
@@ -3,18 +3,34 @@
 
 Usage:
     python replace.py <input.pptx> <replacements.json> <output.pptx>
+    python replace.py --batch <input.pptx> <replacement_sets.jsonl> [workers]
 
 The replacements JSON should have the structure output by inventory.py.
 ALL text shapes identified by inventory.py will have their text cleared
 unless "paragraphs" is specified in the replacements for that shape.
+
+Batch mode writes many presentations from one template. Each line of the
+JSON Lines file is an object with an "output" path and a "replacements"
+object in the format above, e.g.:
+    {"output": "out/deck-1.pptx", "replacements": {"slide-0": {...}}}
+One JSON result line is printed per output.
 """
 
+import io
 import json
+import os
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
-
-from inventory import InventoryData, extract_text_inventory
+from typing import Any, Dict, List, Tuple
+
+from inventory import (
+    InventoryData,
+    ShapeData,
+    collect_shapes_with_absolute_positions,
+    extract_text_inventory,
+)
 from pptx import Presentation
 from pptx.dml.color import RGBColor
 from pptx.enum.dml import MSO_THEME_COLOR
@@ -22,6 +38,8 @@ from pptx.enum.text import PP_ALIGN
 from pptx.oxml.xmlchemy import OxmlElement
 from pptx.util import Pt
 
+DEFAULT_BATCH_WORKERS = os.cpu_count() or 1  # Worker processes for --batch
+
 
 def clear_paragraph_bullets(paragraph):
     """Clear bullet formatting from a paragraph."""
@@ -211,6 +229,90 @@ def check_duplicate_keys(pairs):
     return result
 
 
+def load_replacements(json_file: str) -> Dict:
+    """Load replacement JSON with duplicate key detection."""
+    with open(json_file, "r") as f:
+        return json.load(f, object_pairs_hook=check_duplicate_keys)
+
+
+def replace_shape_text(text_frame, replacement_shape_data: Dict[str, Any]) -> bool:
+    """Clear a text frame and add the replacement paragraphs, if any.
+
+    Returns True if replacement paragraphs were applied.
+    """
+    text_frame.clear()
+
+    if "paragraphs" not in replacement_shape_data:
+        return False
+
+    # Add replacement paragraphs
+    for i, para_data in enumerate(replacement_shape_data["paragraphs"]):
+        if i == 0:
+            p = text_frame.paragraphs[0]
+        else:
+            p = text_frame.add_paragraph()
+
+        apply_paragraph_properties(p, para_data)
+
+    return True
+
+
+def measure_replaced_shapes(
+    replaced: Dict[str, Dict[str, Tuple[Any, int, int, Any]]],
+) -> InventoryData:
+    """Re-measure shapes that received replacement text.
+
+    Takes slide_key -> shape_key -> (shape, absolute_left, absolute_top, slide)
+    and returns an inventory of just those shapes, keyed like the original
+    inventory. Cleared shapes have no text left and every other shape is
+    unchanged, so only replaced shapes can gain overflow or warnings.
+    Inventory extraction is read-only, so this runs on the in-memory
+    presentation.
+    """
+    return {
+        slide_key: {
+            shape_key: ShapeData(shape, left, top, slide)
+            for shape_key, (shape, left, top, slide) in shapes.items()
+        }
+        for slide_key, shapes in replaced.items()
+    }
+
+
+def find_replacement_issues(
+    original_overflow: Dict[str, Dict[str, float]], updated_inventory: InventoryData
+) -> Tuple[List[str], List[str]]:
+    """Compare an updated inventory against the original overflow baseline.
+
+    Returns a tuple of (overflow_errors, warnings).
+    """
+    updated_overflow = detect_frame_overflow(updated_inventory)
+
+    # Check if any text overflow got worse
+    overflow_errors = []
+    for slide_key, shape_overflows in updated_overflow.items():
+        for shape_key, new_overflow in shape_overflows.items():
+            # Get original overflow (0 if there was no overflow before)
+            original = original_overflow.get(slide_key, {}).get(shape_key, 0.0)
+
+            # Error if overflow increased
+            if new_overflow > original + 0.01:  # Small tolerance for rounding
+                increase = new_overflow - original
+                overflow_errors.append(
+                    f'{slide_key}/{shape_key}: overflow worsened by {increase:.2f}" '
+                    f'(was {original:.2f}", now {new_overflow:.2f}")'
+                )
+
+    # Collect warnings from updated shapes
+    warnings = []
+    for slide_key, shapes_dict in updated_inventory.items():
+        for shape_key, shape_data in shapes_dict.items():
+            if shape_data.warnings:
+                for warning in shape_data.warnings:
+                    warnings.append(f"{slide_key}/{shape_key}: {warning}")
+
+    return overflow_errors, warnings
+
+
 def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     """Apply text replacements from JSON to PowerPoint presentation."""
 
@@ -219,14 +321,13 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
 
     # Get inventory of all text shapes (returns ShapeData objects)
     # Pass prs to use same Presentation instance
-    inventory = extract_text_inventory(Path(pptx_file), prs)
+    inventory = extract_text_inventory(Path(pptx_file), prs, keep_shapes=True)
 
     # Detect text overflow in original presentation
     original_overflow = detect_frame_overflow(inventory)
 
     # Load replacement data with duplicate key detection
-    with open(json_file, "r") as f:
-        replacements = json.load(f, object_pairs_hook=check_duplicate_keys)
+    replacements = load_replacements(json_file)
 
     # Validate replacements
     errors = validate_replacements(inventory, replacements)
@@ -244,6 +345,7 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     shapes_processed = 0
     shapes_cleared = 0
     shapes_replaced = 0
+    replaced = {}  # slide_key -> shape_key -> (shape, left, top, slide)
 
     # Process each slide from inventory
     for slide_key, shapes_dict in inventory.items():
@@ -255,6 +357,7 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
         if slide_index >= len(prs.slides):
             print(f"Warning: Slide {slide_index} not found")
             continue
+        slide = prs.slides[slide_index]
 
         # Process each shape from inventory
         for shape_key, shape_data in shapes_dict.items():
@@ -267,64 +370,22 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
                 continue
 
             # ShapeData already validates text_frame in __init__
-            text_frame = shape.text_frame  # type: ignore
-
-            text_frame.clear()  # type: ignore
-            shapes_cleared += 1
-
-            # Check for replacement paragraphs
             replacement_shape_data = replacements.get(slide_key, {}).get(shape_key, {})
-            if "paragraphs" not in replacement_shape_data:
-                continue
-
-            shapes_replaced += 1
-
-            # Add replacement paragraphs
-            for i, para_data in enumerate(replacement_shape_data["paragraphs"]):
-                if i == 0:
-                    p = text_frame.paragraphs[0]  # type: ignore
-                else:
-                    p = text_frame.add_paragraph()  # type: ignore
-
-                apply_paragraph_properties(p, para_data)
-
-    # Check for issues after replacements
-    # Save to a temporary file and reload to avoid modifying the presentation during inventory
-    # (extract_text_inventory accesses font.color which adds empty <a:solidFill/> elements)
-    import tempfile
-
-    with tempfile.NamedTemporaryFile(suffix=".pptx", delete=False) as tmp:
-        tmp_path = Path(tmp.name)
-        prs.save(str(tmp_path))
-
-    try:
-        updated_inventory = extract_text_inventory(tmp_path)
-        updated_overflow = detect_frame_overflow(updated_inventory)
-    finally:
-        tmp_path.unlink()  # Clean up temp file
-
-    # Check if any text overflow got worse
-    overflow_errors = []
-    for slide_key, shape_overflows in updated_overflow.items():
-        for shape_key, new_overflow in shape_overflows.items():
-            # Get original overflow (0 if there was no overflow before)
-            original = original_overflow.get(slide_key, {}).get(shape_key, 0.0)
-
-            # Error if overflow increased
-            if new_overflow > original + 0.01:  # Small tolerance for rounding
-                increase = new_overflow - original
-                overflow_errors.append(
-                    f'{slide_key}/{shape_key}: overflow worsened by {increase:.2f}" '
-                    f'(was {original:.2f}", now {new_overflow:.2f}")'
+            shapes_cleared += 1
+            if replace_shape_text(shape.text_frame, replacement_shape_data):  # type: ignore
+                shapes_replaced += 1
+                replaced.setdefault(slide_key, {})[shape_key] = (
+                    shape,
+                    shape_data.left_emu,
+                    shape_data.top_emu,
+                    slide,
                 )
 
-    # Collect warnings from updated shapes
-    warnings = []
-    for slide_key, shapes_dict in updated_inventory.items():
-        for shape_key, shape_data in shapes_dict.items():
-            if shape_data.warnings:
-                for warning in shape_data.warnings:
-                    warnings.append(f"{slide_key}/{shape_key}: {warning}")
+    # Check for issues after replacements
+    updated_inventory = measure_replaced_shapes(replaced)
+    overflow_errors, warnings = find_replacement_issues(
+        original_overflow, updated_inventory
+    )
 
     # Fail if there are any issues
     if overflow_errors or warnings:
@@ -353,8 +414,211 @@ def apply_replacements(pptx_file: str, json_file: str, output_file: str):
     print(f"  - Shapes replaced: {shapes_replaced}")
 
 
+def element_path(element) -> Tuple[int, ...]:
+    """Return the child-index path from the document root to an XML element."""
+    path = []
+    parent = element.getparent()
+    while parent is not None:
+        path.append(parent.index(element))
+        element, parent = parent, parent.getparent()
+    return tuple(reversed(path))
+
+
+def shape_locators(inventory: InventoryData) -> Dict[str, Dict[str, Tuple[int, ...]]]:
+    """Map each inventory shape to its element path within its slide XML.
+
+    Element paths are stable across copies of the same package, so they can be
+    used to find the same shapes in a freshly loaded copy of the template
+    without recomputing the inventory.
+    """
+    return {
+        slide_key: {
+            shape_key: element_path(shape_data.shape.element)  # type: ignore
+            for shape_key, shape_data in shapes_dict.items()
+        }
+        for slide_key, shapes_dict in inventory.items()
+    }
+
+
+# Per-process state for batch workers, set once by init_batch_worker
+_batch_state: Dict[str, Any] = {}
+
+
+def init_batch_worker(
+    template_bytes: bytes,
+    locators: Dict[str, Dict[str, Tuple[int, ...]]],
+    original_overflow: Dict[str, Dict[str, float]],
+):
+    """Store the template package and its precomputed inventory data."""
+    _batch_state["template_bytes"] = template_bytes
+    _batch_state["locators"] = locators
+    _batch_state["original_overflow"] = original_overflow
+
+
+def batch_error(output: Any, error: Exception) -> Dict[str, Any]:
+    """Return the result line for a record that failed with an exception."""
+    return {"output": output, "status": "error", "errors": [f"{type(error).__name__}: {error}"]}
+
+
+def render_batch_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply one replacement set to a fresh copy of the template and save it.
+
+    Returns a JSON-serializable result for the record. Exceptions are reported
+    as an error result so that one bad record doesn't stop the batch.
+    """
+    try:
+        return render_record(record)
+    except Exception as e:
+        return batch_error(record["output"], e)
+
+
+def render_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Render one record; see render_batch_record."""
+    output_file = record["output"]
+    replacements = record.get("replacements", {})
+    locators = _batch_state["locators"]
+
+    # Clone the template from the in-memory package bytes
+    prs = Presentation(io.BytesIO(_batch_state["template_bytes"]))
+
+    slides = list(prs.slides)
+    replaced = {}  # slide_key -> shape_key -> (shape, left, top, slide)
+    for slide_key, shape_paths in locators.items():
+        slide = slides[int(slide_key.split("-")[1])]
+
+        # Locate inventory shapes on this slide by element path
+        shapes_by_path = {}
+        for shape in slide.shapes:
+            for swp in collect_shapes_with_absolute_positions(shape):
+                shapes_by_path[element_path(swp.shape.element)] = swp
+
+        for shape_key, path in shape_paths.items():
+            replacement_shape_data = replacements.get(slide_key, {}).get(shape_key, {})
+            swp = shapes_by_path[path]
+            if replace_shape_text(swp.shape.text_frame, replacement_shape_data):  # type: ignore
+                replaced.setdefault(slide_key, {})[shape_key] = (
+                    swp.shape,
+                    swp.absolute_left,
+                    swp.absolute_top,
+                    slide,
+                )
+
+    overflow_errors, warnings = find_replacement_issues(
+        _batch_state["original_overflow"], measure_replaced_shapes(replaced)
+    )
+    if overflow_errors or warnings:
+        return {
+            "output": output_file,
+            "status": "error",
+            "errors": overflow_errors + warnings,
+        }
+
+    Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+    prs.save(output_file)
+
+    shapes_replaced = sum(len(shapes) for shapes in replaced.values())
+    return {"output": output_file, "status": "ok", "shapes_replaced": shapes_replaced}
+
+
+def read_batch_records(jsonl_file: str):
+    """Yield (record, error) for each non-empty line of a JSON Lines file.
+
+    error is None for a usable replacement set, otherwise a message and
+    record is whatever could be parsed (possibly None).
+    """
+    with open(jsonl_file, "r") as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line, object_pairs_hook=check_duplicate_keys)
+            except ValueError as e:
+                yield None, f"Line {line_num}: {e}"
+                continue
+            if not isinstance(record, dict) or "output" not in record:
+                yield None, f"Line {line_num}: missing 'output' path"
+                continue
+            yield record, None
+
+
+def apply_replacements_batch(
+    pptx_file: str, jsonl_file: str, workers: int = DEFAULT_BATCH_WORKERS
+) -> int:
+    """Write one output presentation per replacement set in a JSON Lines file.
+
+    Each line is an object with an "output" path and a "replacements" object
+    in the same format accepted by apply_replacements. The template is loaded,
+    inventoried and checked for baseline overflow once; outputs are then
+    written by parallel worker processes, each working from an in-memory copy
+    of the template package.
+
+    Prints one JSON result line per output and returns the number of failures.
+    """
+    template_bytes = Path(pptx_file).read_bytes()
+    prs = Presentation(io.BytesIO(template_bytes))
+    inventory = extract_text_inventory(Path(pptx_file), prs, keep_shapes=True)
+    original_overflow = detect_frame_overflow(inventory)
+    init_args = (template_bytes, shape_locators(inventory), original_overflow)
+
+    failures = 0
+
+    def report(result: Dict[str, Any]):
+        nonlocal failures
+        if result["status"] != "ok":
+            failures += 1
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+
+    def valid_records():
+        # Validate in the parent, where the inventory is available
+        for record, error in read_batch_records(jsonl_file):
+            if error:
+                report({"output": None, "status": "error", "errors": [error]})
+                continue
+            try:
+                errors = validate_replacements(inventory, record.get("replacements", {}))
+            except Exception as e:
+                report(batch_error(record["output"], e))
+                continue
+            if errors:
+                report({"output": record["output"], "status": "error", "errors": errors})
+            else:
+                yield record
+
+    if workers <= 1:
+        init_batch_worker(*init_args)
+        for record in valid_records():
+            report(render_batch_record(record))
+        return failures
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=init_batch_worker, initargs=init_args
+    ) as executor:
+        # Bound the number of queued records so huge inputs are streamed
+        pending = deque()
+
+        def report_next():
+            record, future = pending.popleft()
+            try:
+                report(future.result())
+            except Exception as e:  # e.g. a worker process died
+                report(batch_error(record["output"], e))
+
+        for record in valid_records():
+            pending.append((record, executor.submit(render_batch_record, record)))
+            if len(pending) >= workers * 4:
+                report_next()
+        while pending:
+            report_next()
+
+    return failures
+
+
 def main():
     """Main entry point for command-line usage."""
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        batch_main(sys.argv[2:])
+        return
+
     if len(sys.argv) != 4:
         print(__doc__)
         sys.exit(1)
@@ -381,5 +645,35 @@ def main():
         sys.exit(1)
 
 
+def batch_main(args: List[str]):
+    """Command-line entry point for --batch mode."""
+    if len(args) not in (2, 3):
+        print(__doc__)
+        sys.exit(1)
+
+    input_pptx = Path(args[0])
+    replacement_sets = Path(args[1])
+    workers = int(args[2]) if len(args) == 3 else DEFAULT_BATCH_WORKERS
+
+    for path in (input_pptx, replacement_sets):
+        if not path.exists():
+            print(f"Error: File '{path}' not found")
+            sys.exit(1)
+
+    try:
+        failures = apply_replacements_batch(
+            str(input_pptx), str(replacement_sets), workers
+        )
+    except Exception as e:
+        print(f"Error applying batch replacements: {e}")
+        import traceback
+
+        traceback.print_exc()
+        sys.exit(1)
+
+    if failures:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     main()
@@ -20,6 +20,7 @@ Grid limits by column count:
 
 Usage:
     python thumbnail.py input.pptx [output_prefix] [--cols N] [--outline-placeholders]
+                        [--cache-dir DIR] [--cache-size MB]
 
 Examples:
     python thumbnail.py presentation.pptx
@@ -38,17 +39,25 @@ Examples:
 
     python thumbnail.py template.pptx analysis --outline-placeholders
     # Creates thumbnail grids with red outlines around text placeholders
+
+    python thumbnail.py working.pptx --cache-dir ~/.cache/pptx-thumbnails
+    # Reuses cached slide renders; only slides that changed since the last
+    # run (slide XML, layout, master or media) are rendered again
 """
 
 import argparse
 import subprocess
 import sys
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 from inventory import extract_text_inventory
 from PIL import Image, ImageDraw, ImageFont
 from pptx import Presentation
+from rasterize import rasterize_pdf
+from render_cache import DEFAULT_CACHE_SIZE_MB, SlideRenderCache, slide_cache_keys
 
 # Constants
 THUMBNAIL_WIDTH = 300  # Fixed thumbnail width in pixels
@@ -86,6 +95,16 @@ def main():
         action="store_true",
         help="Outline text placeholders with a colored border",
     )
+    parser.add_argument(
+        "--cache-dir",
+        help="Directory for cached slide renders; only changed slides are re-rendered",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Maximum render cache size in MB (default: {DEFAULT_CACHE_SIZE_MB})",
+    )
 
     args = parser.parse_args()
 
@@ -105,6 +124,10 @@ def main():
 
     print(f"Processing: {args.input}")
 
+    cache = None
+    if args.cache_dir:
+        cache = SlideRenderCache(Path(args.cache_dir), args.cache_size)
+
     try:
         with tempfile.TemporaryDirectory() as temp_dir:
             # Get placeholder regions if outlining is enabled
@@ -119,7 +142,9 @@ def main():
                     print(f"Found placeholders on {len(placeholder_regions)} slides")
 
             # Convert slides to images
-            slide_images = convert_to_images(input_path, Path(temp_dir), CONVERSION_DPI)
+            slide_images = convert_to_images(
+                input_path, Path(temp_dir), CONVERSION_DPI, cache
+            )
             if not slide_images:
                 print("Error: No slides found")
                 sys.exit(1)
@@ -146,8 +171,13 @@ def main():
         sys.exit(1)
 
 
+@lru_cache(maxsize=None)
 def create_hidden_slide_placeholder(size):
-    """Create placeholder image for hidden slides."""
+    """Create placeholder image for hidden slides.
+
+    Cached per size: every hidden slide of a deck shares the same in-memory
+    image, which callers must not modify.
+    """
     img = Image.new("RGB", size, color="#F0F0F0")
     draw = ImageDraw.Draw(img)
     line_width = max(5, min(size) // 100)
@@ -194,24 +224,113 @@ def get_placeholder_regions(pptx_path):
     return placeholder_regions, (slide_width_inches, slide_height_inches)
 
 
-def convert_to_images(pptx_path, temp_dir, dpi):
-    """Convert PowerPoint to images via PDF, handling hidden slides."""
-    # Detect hidden slides
+def convert_to_images(pptx_path, temp_dir, dpi, cache=None):
+    """Convert PowerPoint to images via PDF, handling hidden slides.
+
+    When a SlideRenderCache is given, slides whose rendered image is already
+    cached are reused and only the remaining (dirty) slides are rendered.
+    """
     print("Analyzing presentation...")
     prs = Presentation(str(pptx_path))
-    total_slides = len(prs.slides)
+    total_slides, hidden_slides, rendered, dirty_slides, cache_keys = plan_renders(
+        prs, dpi, cache
+    )
+    visible_slides = [
+        num for num in range(1, total_slides + 1) if num not in hidden_slides
+    ]
+    if dirty_slides:
+        render_path = pptx_path
+        if len(dirty_slides) < len(visible_slides):
+            # Hide clean slides so only dirty ones are exported. Hiding instead
+            # of deleting keeps slide numbering fields unchanged.
+            dirty_set = set(dirty_slides)
+            for idx, slide in enumerate(prs.slides):
+                if idx + 1 not in dirty_set:
+                    slide.element.set("show", "0")
+            render_path = temp_dir / pptx_path.name
+            prs.save(str(render_path))
+
+        print(f"Rendering {len(dirty_slides)} slide(s)...")
+        for slide_num, image_path in zip(
+            dirty_slides, render_slides(render_path, temp_dir, dpi)
+        ):
+            if cache:
+                image_path = cache.put(cache_keys[slide_num - 1], image_path)
+            rendered[slide_num] = image_path
+
+    if cache:
+        evicted = cache.prune(keep=cache_keys)
+        if evicted:
+            print(f"Evicted {evicted} image(s) from render cache")
+
+    # Create full list with placeholders for hidden slides
+    all_images = []
 
+    # Get placeholder dimensions from first visible slide
+    placeholder_img = None
+    if hidden_slides:
+        if rendered:
+            with Image.open(rendered[min(rendered)]) as img:
+                placeholder_size = img.size
+        else:
+            placeholder_size = (1920, 1080)
+        # One shared in-memory image for all hidden slides
+        placeholder_img = create_hidden_slide_placeholder(placeholder_size)
+
+    for slide_num in range(1, total_slides + 1):
+        if slide_num in hidden_slides:
+            all_images.append(placeholder_img)
+        elif slide_num in rendered:
+            # Use the actual visible slide image
+            all_images.append(rendered[slide_num])
+
+    return all_images
+
+
+def plan_renders(prs, dpi, cache=None):
+    """Work out which slides need rendering, reading each slide's show flag once.
+
+    Hidden slides (show="0") are never rendered; soffice leaves them out of
+    the PDF and they are drawn as placeholders instead. Visible slides with a
+    cached render are reused, and the rest are dirty.
+
+    Returns a tuple of (total_slides, hidden_slides, rendered, dirty_slides,
+    cache_keys) where slide numbers are 1-based, rendered maps slide numbers to
+    cached image paths and cache_keys is empty when no cache is used.
+    """
     # Find hidden slides (1-based indexing for display)
-    hidden_slides = {
-        idx + 1
-        for idx, slide in enumerate(prs.slides)
-        if slide.element.get("show") == "0"
-    }
+    hidden_slides = set()
+    total_slides = 0
+    for idx, slide in enumerate(prs.slides):
+        total_slides += 1
+        if slide.element.get("show") == "0":
+            hidden_slides.add(idx + 1)
 
     print(f"Total slides: {total_slides}")
     if hidden_slides:
         print(f"Hidden slides: {sorted(hidden_slides)}")
 
+    visible_slides = [
+        num for num in range(1, total_slides + 1) if num not in hidden_slides
+    ]
+
+    # Reuse cached renders; keys must be computed before any slide XML is
+    # modified for rendering
+    rendered = {}
+    cache_keys = slide_cache_keys(prs, dpi) if cache else []
+    if cache:
+        for slide_num in visible_slides:
+            cached_path = cache.get(cache_keys[slide_num - 1])
+            if cached_path:
+                rendered[slide_num] = cached_path
+        print(f"Reusing {len(rendered)} cached slide image(s)")
+
+    dirty_slides = [num for num in visible_slides if num not in rendered]
+    return total_slides, hidden_slides, rendered, dirty_slides, cache_keys
+
+
+def render_slides(pptx_path, temp_dir, dpi):
+    """Render the visible slides of a presentation to JPEG images via PDF."""
     pdf_path = temp_dir / f"{pptx_path.stem}.pdf"
 
     # Convert to PDF
@@ -232,43 +351,11 @@ def convert_to_images(pptx_path, temp_dir, dpi):
     if result.returncode != 0 or not pdf_path.exists():
         raise RuntimeError("PDF conversion failed")
 
-    # Convert PDF to images
+    # Convert PDF to images, rasterizing page ranges in parallel
     print(f"Converting to images at {dpi} DPI...")
-    result = subprocess.run(
-        ["pdftoppm", "-jpeg", "-r", str(dpi), str(pdf_path), str(temp_dir / "slide")],
-        capture_output=True,
-        text=True,
+    return rasterize_pdf(
+        pdf_path, temp_dir, fmt="jpeg", dpi=dpi, name="slide-{page:04d}"
     )
-    if result.returncode != 0:
-        raise RuntimeError("Image conversion failed")
-
-    visible_images = sorted(temp_dir.glob("slide-*.jpg"))
-
-    # Create full list with placeholders for hidden slides
-    all_images = []
-    visible_idx = 0
-
-    # Get placeholder dimensions from first visible slide
-    if visible_images:
-        with Image.open(visible_images[0]) as img:
-            placeholder_size = img.size
-    else:
-        placeholder_size = (1920, 1080)
-
-    for slide_num in range(1, total_slides + 1):
-        if slide_num in hidden_slides:
-            # Create placeholder image for hidden slide
-            placeholder_path = temp_dir / f"hidden-{slide_num:03d}.jpg"
-            placeholder_img = create_hidden_slide_placeholder(placeholder_size)
-            placeholder_img.save(placeholder_path, "JPEG")
-            all_images.append(placeholder_path)
-        else:
-            # Use the actual visible slide image
-            if visible_idx < len(visible_images):
-                all_images.append(visible_images[visible_idx])
-                visible_idx += 1
-
-    return all_images
 
 
 def create_grids(
@@ -288,32 +375,50 @@ def create_grids(
         f"Creating grids with {cols} columns (max {max_images_per_grid} images per grid)"
     )
 
-    # Split images into chunks
-    for chunk_idx, start_idx in enumerate(
-        range(0, len(image_paths), max_images_per_grid)
-    ):
-        end_idx = min(start_idx + max_images_per_grid, len(image_paths))
-        chunk_images = image_paths[start_idx:end_idx]
-
-        # Create grid for this chunk
-        grid = create_grid(
-            chunk_images, cols, width, start_idx, placeholder_regions, slide_dimensions
-        )
+    # Grids are JPEG-encoded on a background thread while the next chunk is
+    # decoded. Waiting on the previous save before submitting the next one
+    # keeps at most two grids in memory.
+    with ThreadPoolExecutor(max_workers=1) as encoder:
+        pending_save = None
+
+        # Split images into chunks
+        for chunk_idx, start_idx in enumerate(
+            range(0, len(image_paths), max_images_per_grid)
+        ):
+            end_idx = min(start_idx + max_images_per_grid, len(image_paths))
+            chunk_images = image_paths[start_idx:end_idx]
+
+            # Create grid for this chunk
+            grid = create_grid(
+                chunk_images,
+                cols,
+                width,
+                start_idx,
+                placeholder_regions,
+                slide_dimensions,
+            )
 
-        # Generate output filename
-        if len(image_paths) <= max_images_per_grid:
-            # Single grid - use base filename without suffix
-            grid_filename = output_path
-        else:
-            # Multiple grids - insert index before extension with dash
-            stem = output_path.stem
-            suffix = output_path.suffix
-            grid_filename = output_path.parent / f"{stem}-{chunk_idx + 1}{suffix}"
+            # Generate output filename
+            if len(image_paths) <= max_images_per_grid:
+                # Single grid - use base filename without suffix
+                grid_filename = output_path
+            else:
+                # Multiple grids - insert index before extension with dash
+                stem = output_path.stem
+                suffix = output_path.suffix
+                grid_filename = output_path.parent / f"{stem}-{chunk_idx + 1}{suffix}"
+
+            # Save grid
+            grid_filename.parent.mkdir(parents=True, exist_ok=True)
+            if pending_save:
+                pending_save.result()
+            pending_save = encoder.submit(
+                grid.save, str(grid_filename), quality=JPEG_QUALITY
+            )
+            grid_files.append(str(grid_filename))
 
-        # Save grid
-        grid_filename.parent.mkdir(parents=True, exist_ok=True)
-        grid.save(str(grid_filename), quality=JPEG_QUALITY)
-        grid_files.append(str(grid_filename))
+        if pending_save:
+            pending_save.result()
 
     return grid_files
 
@@ -331,8 +436,11 @@ def create_grid(
     label_padding = int(font_size * LABEL_PADDING_RATIO)
 
     # Get dimensions
-    with Image.open(image_paths[0]) as img:
-        aspect = img.height / img.width
+    if isinstance(image_paths[0], Image.Image):
+        aspect = image_paths[0].height / image_paths[0].width
+    else:
+        with Image.open(image_paths[0]) as img:
+            aspect = img.height / img.width
     height = int(width * aspect)
 
     # Calculate grid size
@@ -374,77 +482,90 @@ def create_grid(
         # Add thumbnail below label with proportional spacing
         y_thumbnail = y_base + label_padding + font_size + label_padding
 
-        with Image.open(img_path) as img:
-            # Get original dimensions before thumbnail
-            orig_w, orig_h = img.size
-
-            # Apply placeholder outlines if enabled
-            if placeholder_regions and (start_slide_num + i) in placeholder_regions:
-                # Convert to RGBA for transparency support
-                if img.mode != "RGBA":
-                    img = img.convert("RGBA")
-
-                # Get the regions for this slide
-                regions = placeholder_regions[start_slide_num + i]
-
-                # Calculate scale factors using actual slide dimensions
-                if slide_dimensions:
-                    slide_width_inches, slide_height_inches = slide_dimensions
-                else:
-                    # Fallback: estimate from image size at CONVERSION_DPI
-                    slide_width_inches = orig_w / CONVERSION_DPI
-                    slide_height_inches = orig_h / CONVERSION_DPI
-
-                x_scale = orig_w / slide_width_inches
-                y_scale = orig_h / slide_height_inches
-
-                # Create a highlight overlay
-                overlay = Image.new("RGBA", img.size, (255, 255, 255, 0))
-                overlay_draw = ImageDraw.Draw(overlay)
-
-                # Highlight each placeholder region
-                for region in regions:
-                    # Convert from inches to pixels in the original image
-                    px_left = int(region["left"] * x_scale)
-                    px_top = int(region["top"] * y_scale)
-                    px_width = int(region["width"] * x_scale)
-                    px_height = int(region["height"] * y_scale)
-
-                    # Draw highlight outline with red color and thick stroke
-                    # Using a bright red outline instead of fill
-                    stroke_width = max(
-                        5, min(orig_w, orig_h) // 150
-                    )  # Thicker proportional stroke width
-                    overlay_draw.rectangle(
-                        [(px_left, px_top), (px_left + px_width, px_top + px_height)],
-                        outline=(255, 0, 0, 255),  # Bright red, fully opaque
-                        width=stroke_width,
-                    )
-
-                # Composite the overlay onto the image using alpha blending
-                img = Image.alpha_composite(img, overlay)
-                # Convert back to RGB for JPEG saving
-                img = img.convert("RGB")
-
-            img.thumbnail((width, height), Image.Resampling.LANCZOS)
-            w, h = img.size
-            tx = x + (width - w) // 2
-            ty = y_thumbnail + (height - h) // 2
-            grid.paste(img, (tx, ty))
-
-            # Add border
-            if BORDER_WIDTH > 0:
-                draw.rectangle(
-                    [
-                        (tx - BORDER_WIDTH, ty - BORDER_WIDTH),
-                        (tx + w + BORDER_WIDTH - 1, ty + h + BORDER_WIDTH - 1),
-                    ],
-                    outline="gray",
-                    width=BORDER_WIDTH,
-                )
+        regions = None
+        if placeholder_regions:
+            regions = placeholder_regions.get(start_slide_num + i)
+        img = load_thumbnail(img_path, width, height, regions, slide_dimensions)
+        w, h = img.size
+        tx = x + (width - w) // 2
+        ty = y_thumbnail + (height - h) // 2
+        grid.paste(img, (tx, ty))
+
+        # Add border
+        if BORDER_WIDTH > 0:
+            draw.rectangle(
+                [
+                    (tx - BORDER_WIDTH, ty - BORDER_WIDTH),
+                    (tx + w + BORDER_WIDTH - 1, ty + h + BORDER_WIDTH - 1),
+                ],
+                outline="gray",
+                width=BORDER_WIDTH,
+            )
 
     return grid
 
 
+def load_thumbnail(img_path, width, height, regions=None, slide_dimensions=None):
+    """Decode a slide image at reduced scale and fit it within width×height.
+
+    JPEGs are decoded with draft() so only the DCT scale needed for the
+    thumbnail is decoded rather than the full-resolution image. Placeholder
+    regions are outlined on the reduced image before the final resize.
+    In-memory images (such as the shared hidden-slide placeholder) are
+    copied rather than modified.
+    """
+    if isinstance(img_path, Image.Image):
+        orig_size = img_path.size
+        img = img_path.copy()
+    else:
+        with Image.open(img_path) as img:
+            # Get original dimensions before draft decoding
+            orig_size = img.size
+            img.draft("RGB", (width, height))
+            img = img.convert("RGB")
+
+    if regions:
+        draw_placeholder_outlines(img, regions, orig_size, slide_dimensions)
+
+    img.thumbnail((width, height), Image.Resampling.LANCZOS)
+    return img
+
+
+def draw_placeholder_outlines(img, regions, orig_size, slide_dimensions=None):
+    """Outline placeholder regions (in inches) in red directly on an RGB image."""
+    orig_w, orig_h = orig_size
+
+    # Calculate scale factors using actual slide dimensions
+    if slide_dimensions:
+        slide_width_inches, slide_height_inches = slide_dimensions
+    else:
+        # Fallback: estimate from original image size at CONVERSION_DPI
+        slide_width_inches = orig_w / CONVERSION_DPI
+        slide_height_inches = orig_h / CONVERSION_DPI
+
+    x_scale = img.width / slide_width_inches
+    y_scale = img.height / slide_height_inches
+
+    # Thick proportional stroke, sized for the original image and scaled down
+    # to the decoded size so outlines look the same in the thumbnail
+    stroke_width = max(
+        1, round(max(5, min(orig_w, orig_h) // 150) * img.width / orig_w)
+    )
+
+    # Convert all regions from inches to pixels in one pass, then draw them
+    boxes = [
+        (
+            int(region["left"] * x_scale),
+            int(region["top"] * y_scale),
+            int(region["left"] * x_scale) + int(region["width"] * x_scale),
+            int(region["top"] * y_scale) + int(region["height"] * y_scale),
+        )
+        for region in regions
+    ]
+    draw = ImageDraw.Draw(img)
+    for box in boxes:
+        draw.rectangle(box, outline=(255, 0, 0), width=stroke_width)
+
+
 if __name__ == "__main__":
     main()
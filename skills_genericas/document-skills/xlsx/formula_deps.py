@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Formula Dependency Analyzer
+Builds a cell dependency graph from the formulas in an .xlsx file and checks
+only the formulas downstream of edited cells for #REF! and #DIV/0! errors
+
+Formulas are read straight from the sheet XML (shared formulas are expanded
+by offsetting the master formula's relative references). A formula is
+reported as an error when its text contains #REF! (e.g. after deleting the
+row it pointed to), when it refers to a sheet that no longer exists, or when
+its cached value in the file is one of the checked errors. Cached values are
+only current after recalculation, so run this after recalc.py to see
+#DIV/0! results, or straight after an edit for the static #REF! checks.
+
+With --cache, parsed sheets are stored keyed by the CRC of their XML in the
+zip, so re-checking after a small edit only re-parses the sheets that changed.
+"""
+
+import argparse
+import json
+import os
+import pickle
+import re
+import zipfile
+from collections import deque
+from xml.etree.ElementTree import iterparse
+
+from workbook_scan import (
+    CELL, FORMULA, MAIN_NS, MAX_LOCATIONS, ROW, SHEET_DATA, VALUE,
+    column_index, column_letter, list_worksheets,
+)
+
+CHECKED_ERRORS = ['#REF!', '#DIV/0!']
+MAX_ROW = 1048576
+MAX_COLUMN = 16384
+RANGE_BUCKET_MAX_WIDTH = 64  # Wider ranges are checked linearly instead of per column
+CACHE_VERSION = 1
+
+STRING_LITERAL = re.compile(r'"(?:[^"]|"")*"')
+REFERENCE = re.compile(
+    r"(?<![\w.!'\]$])"
+    r"(?:(?P<sheet>'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?"
+    r"(?:(?P<c1>\$?[A-Za-z]{1,3})(?P<r1>\$?\d+)(?::(?P<c2>\$?[A-Za-z]{1,3})(?P<r2>\$?\d+))?"
+    r"|(?P<cc1>\$?[A-Za-z]{1,3}):(?P<cc2>\$?[A-Za-z]{1,3})"
+    r"|(?P<rr1>\$?\d+):(?P<rr2>\$?\d+))"
+    r"(?![\w(.!])"
+)
+NAME = re.compile(r"(?<![\w.!'\]$])([A-Za-z_\\][\w.]*)(?![\w(!])")
+CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+# Parsed data is kept in plain tuples, which pickle and unpickle much faster
+# than named tuples for the parse cache:
+#   reference:    (sheet, c1, r1, c2, r2, absolute) where sheet is the
+#                 upper-cased sheet name or None for the formula's own sheet,
+#                 and absolute holds the $ flags of (c1, r1, c2, r2)
+#   formula cell: (formula text without '=', [reference], cached value,
+#                 cached value type)
+
+
+def _part(text, parse):
+    """Split a $-prefixed reference part into (value, is_absolute)"""
+    if text.startswith('$'):
+        return parse(text[1:]), True
+    return parse(text), False
+
+
+def _match_reference(match):
+    """Build a reference tuple from a REFERENCE match, or None if out of range"""
+    sheet = match.group('sheet')
+    if sheet:
+        sheet = sheet[1:-1].replace("''", "'") if sheet.startswith("'") else sheet
+        sheet = sheet.upper()
+
+    if match.group('c1'):
+        c1, c1_abs = _part(match.group('c1'), lambda s: column_index(s.upper()))
+        r1, r1_abs = _part(match.group('r1'), int)
+        if match.group('c2'):
+            c2, c2_abs = _part(match.group('c2'), lambda s: column_index(s.upper()))
+            r2, r2_abs = _part(match.group('r2'), int)
+        else:
+            c2, r2, c2_abs, r2_abs = c1, r1, c1_abs, r1_abs
+    elif match.group('cc1'):
+        c1, c1_abs = _part(match.group('cc1'), lambda s: column_index(s.upper()))
+        c2, c2_abs = _part(match.group('cc2'), lambda s: column_index(s.upper()))
+        r1, r2, r1_abs, r2_abs = 1, MAX_ROW, True, True
+    else:
+        r1, r1_abs = _part(match.group('rr1'), int)
+        r2, r2_abs = _part(match.group('rr2'), int)
+        c1, c2, c1_abs, c2_abs = 1, MAX_COLUMN, True, True
+
+    if not (0 < c1 <= MAX_COLUMN and 0 < c2 <= MAX_COLUMN and 0 < r1 <= MAX_ROW and 0 < r2 <= MAX_ROW):
+        return None  # Looks like a reference but is out of range, e.g. a name
+    # Normalize B2:A1 to A1:B2, keeping each part's $ flag with it
+    if c1 > c2:
+        c1, c2, c1_abs, c2_abs = c2, c1, c2_abs, c1_abs
+    if r1 > r2:
+        r1, r2, r1_abs, r2_abs = r2, r1, r2_abs, r1_abs
+    return (sheet, c1, r1, c2, r2, (c1_abs, r1_abs, c2_abs, r2_abs))
+
+
+def parse_references(formula):
+    """
+    Extract cell and range references from formula text
+
+    Returns:
+        List of reference tuples, with string literals ignored
+    """
+    refs = []
+    for match in REFERENCE.finditer(STRING_LITERAL.sub('""', formula)):
+        ref = _match_reference(match)
+        if ref:
+            refs.append(ref)
+    return refs
+
+
+def parse_reference(text):
+    """Parse text that is exactly one reference, e.g. a formula operand, or return None"""
+    match = REFERENCE.fullmatch(text)
+    return _match_reference(match) if match else None
+
+
+def offset_reference(ref, dcol, drow):
+    """Shift the relative parts of a reference, as when a formula is copied"""
+    sheet, c1, r1, c2, r2, absolute = ref
+    c1_abs, r1_abs, c2_abs, r2_abs = absolute
+    return (
+        sheet,
+        c1 if c1_abs else c1 + dcol,
+        r1 if r1_abs else r1 + drow,
+        c2 if c2_abs else c2 + dcol,
+        r2 if r2_abs else r2 + drow,
+        absolute,
+    )
+
+
+def parse_sheet_formulas(zf, member):
+    """
+    Parse the formula cells of one worksheet
+
+    Returns:
+        dict of (column, row) -> formula cell tuple
+    """
+    formulas = {}
+    shared = {}  # si -> (master column, master row, master text, master refs)
+    sheet_data = None
+    row_index = 0
+    col_index = 0
+
+    with zf.open(member) as f:
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == SHEET_DATA:
+                    sheet_data = elem
+                elif tag == ROW:
+                    r = elem.get('r')
+                    row_index = int(r) if r else row_index + 1
+                    col_index = 0
+                continue
+
+            if tag != CELL:
+                if tag == ROW and sheet_data is not None:
+                    sheet_data.clear()
+                continue
+
+            ref = elem.get('r')
+            if ref:
+                col_index = column_index(CELL_REF.match(ref).group(1))
+            else:
+                col_index += 1
+
+            formula = elem.find(FORMULA)
+            if formula is not None:
+                value = elem.find(VALUE)
+                value_text = value.text if value is not None else None
+                value_type = elem.get('t', 'n')
+                text = formula.text or ''
+                if formula.get('t') == 'shared':
+                    si = formula.get('si')
+                    if text:
+                        refs = parse_references(text)
+                        shared[si] = (col_index, row_index, text, refs)
+                    elif si in shared:
+                        master_col, master_row, text, master_refs = shared[si]
+                        dcol, drow = col_index - master_col, row_index - master_row
+                        refs = [offset_reference(r, dcol, drow) for r in master_refs]
+                    else:
+                        refs = []
+                else:
+                    refs = parse_references(text)
+                formulas[(col_index, row_index)] = (text, refs, value_text, value_type)
+
+            elem.clear()
+    return formulas
+
+
+def parse_defined_names(zf):
+    """Return {NAME: [reference]} for workbook-level defined names"""
+    names = {}
+    with zf.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{MAIN_NS}definedName' and elem.get('localSheetId') is None:
+                refs = [r for r in parse_references(elem.text or '') if r[0]]
+                if refs:
+                    names[elem.get('name').upper()] = refs
+    return names
+
+
+def load_cache(cache_path):
+    """Load a parse cache, ignoring missing, unreadable or outdated files"""
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+    return cache if cache.get('version') == CACHE_VERSION else {}
+
+
+class FormulaGraph:
+    """Cell dependency graph of every formula in a workbook"""
+
+    def __init__(self, sheets, sheet_formulas, names):
+        """
+        Args:
+            sheets: Worksheet names in workbook order
+            sheet_formulas: {sheet name: {(column, row): formula cell tuple}}
+            names: {NAME: [reference]} of defined names
+        """
+        self.sheets = sheets
+        self.sheet_lookup = {name.upper(): name for name in sheets}
+        self.formulas = {}  # (sheet, column, row) -> formula cell tuple
+        self.missing_sheet = set()  # Formula keys that refer to a missing sheet
+
+        # Reverse index: single cells, and ranges bucketed by column
+        self.cell_dependents = {}  # (sheet, column, row) -> [formula key]
+        self.range_buckets = {}  # (sheet, column) -> [(r1, r2, formula key)]
+        self.wide_ranges = {}  # sheet -> [(c1, r1, c2, r2, formula key)]
+
+        for sheet, formulas in sheet_formulas.items():
+            for (col, row), cell in formulas.items():
+                key = (sheet, col, row)
+                self.formulas[key] = cell
+                formula, refs = cell[0], cell[1]
+                if names:
+                    refs = list(refs)
+                    stripped = STRING_LITERAL.sub('""', formula)
+                    for name in NAME.findall(stripped):
+                        refs.extend(names.get(name.upper(), ()))
+                for ref in refs:
+                    self._index(key, sheet, ref)
+
+    def _index(self, key, sheet, ref):
+        ref_sheet, c1, r1, c2, r2, _ = ref
+        if ref_sheet is not None:
+            target = self.sheet_lookup.get(ref_sheet)
+            if target is None:
+                self.missing_sheet.add(key)
+                return
+        else:
+            target = sheet
+
+        if c1 == c2 and r1 == r2:
+            self.cell_dependents.setdefault((target, c1, r1), []).append(key)
+        elif c2 - c1 < RANGE_BUCKET_MAX_WIDTH:
+            for col in range(c1, c2 + 1):
+                self.range_buckets.setdefault((target, col), []).append((r1, r2, key))
+        else:
+            self.wide_ranges.setdefault(target, []).append((c1, r1, c2, r2, key))
+
+    @classmethod
+    def from_workbook(cls, filename, cache_path=None):
+        """
+        Build the graph for an .xlsx file
+
+        Args:
+            filename: Path to Excel file
+            cache_path: Optional pickle file caching parsed sheets by XML CRC
+        """
+        cache = load_cache(cache_path) if cache_path else {}
+        sheet_cache = cache.get('sheets', {})
+        new_cache = {}
+        cache_hits = 0
+
+        with zipfile.ZipFile(filename) as zf:
+            worksheets = list_worksheets(zf)
+            names = parse_defined_names(zf)
+            sheet_formulas = {}
+            for name, member in worksheets:
+                info = zf.getinfo(member)
+                stamp = (info.CRC, info.file_size)
+                cached = sheet_cache.get(member)
+                if cached and cached[0] == stamp:
+                    formulas = cached[1]
+                    cache_hits += 1
+                else:
+                    formulas = parse_sheet_formulas(zf, member)
+                sheet_formulas[name] = formulas
+                new_cache[member] = (stamp, formulas)
+
+        # Rewrite the cache only when a sheet was parsed or removed
+        if cache_path and not (cache_hits == len(worksheets) == len(sheet_cache)):
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({'version': CACHE_VERSION, 'sheets': new_cache}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+
+        return cls([name for name, _ in worksheets], sheet_formulas, names)
+
+    def dependents(self, sheet, c1, r1, c2, r2):
+        """Formula keys that directly reference any cell in the rectangle"""
+        found = set()
+        if (c2 - c1 + 1) * (r2 - r1 + 1) <= 4096:
+            for col in range(c1, c2 + 1):
+                for row in range(r1, r2 + 1):
+                    found.update(self.cell_dependents.get((sheet, col, row), ()))
+        else:
+            for (s, col, row), keys in self.cell_dependents.items():
+                if s == sheet and c1 <= col <= c2 and r1 <= row <= r2:
+                    found.update(keys)
+
+        for col in range(c1, c2 + 1):
+            for start, end, key in self.range_buckets.get((sheet, col), ()):
+                if start <= r2 and end >= r1:
+                    found.add(key)
+        for rc1, rr1, rc2, rr2, key in self.wide_ranges.get(sheet, ()):
+            if rc1 <= c2 and rc2 >= c1 and rr1 <= r2 and rr2 >= r1:
+                found.add(key)
+        return found
+
+    def downstream(self, edited):
+        """
+        Find every formula affected by the edited cells
+
+        Args:
+            edited: Iterable of (sheet, c1, r1, c2, r2) rectangles
+
+        Returns:
+            Set of affected formula keys (sheet, column, row), including
+            edited cells that are formulas themselves
+        """
+        affected = set()
+        queue = deque()
+        for sheet, c1, r1, c2, r2 in edited:
+            for key in self.dependents(sheet, c1, r1, c2, r2):
+                queue.append(key)
+            # An edited formula cell is itself affected
+            if (c2 - c1 + 1) * (r2 - r1 + 1) <= 4096:
+                for col in range(c1, c2 + 1):
+                    for row in range(r1, r2 + 1):
+                        if (sheet, col, row) in self.formulas:
+                            queue.append((sheet, col, row))
+            else:
+                for key in self.formulas:
+                    s, col, row = key
+                    if s == sheet and c1 <= col <= c2 and r1 <= row <= r2:
+                        queue.append(key)
+
+        while queue:
+            key = queue.popleft()
+            if key in affected:
+                continue
+            affected.add(key)
+            sheet, col, row = key
+            queue.extend(self.dependents(sheet, col, row, col, row))
+        return affected
+
+    def cell_errors(self, key, errors=CHECKED_ERRORS):
+        """Return the first checked error a formula has, or None"""
+        formula, _, value, value_type = self.formulas[key]
+        if '#REF!' in errors and (
+            key in self.missing_sheet or '#REF!' in STRING_LITERAL.sub('""', formula)
+        ):
+            return '#REF!'
+        if value_type in ('e', 'str') and value:
+            for err in errors:
+                if err in value:
+                    return err
+        return None
+
+    def location(self, key):
+        sheet, col, row = key
+        return f"{sheet}!{column_letter(col)}{row}"
+
+    def sort_key(self, key):
+        sheet, col, row = key
+        return (self.sheets.index(sheet), row, col)
+
+
+def parse_cell_range(text, sheets):
+    """
+    Parse an edited cell or range like "Sheet1!B5" or "'My Sheet'!C1:C10"
+
+    Returns:
+        (sheet, c1, r1, c2, r2); a bare "B5" refers to the first sheet
+    """
+    refs = parse_references(text)
+    if len(refs) != 1:
+        raise ValueError(f'Not a cell or range: {text}')
+    ref_sheet, c1, r1, c2, r2, _ = refs[0]
+    lookup = {name.upper(): name for name in sheets}
+    sheet = lookup.get(ref_sheet) if ref_sheet else sheets[0]
+    if sheet is None:
+        raise ValueError(f'Sheet not found: {text}')
+    return (sheet, c1, r1, c2, r2)
+
+
+def check_edits(filename, edited_ranges, errors=CHECKED_ERRORS, cache_path=None):
+    """
+    Check the formulas downstream of edited cells for errors
+
+    Args:
+        filename: Path to Excel file
+        edited_ranges: Cells or ranges like "Sheet1!B5" or "'My Sheet'!C1:C10"
+        errors: Error values to check for
+        cache_path: Optional parse cache (see FormulaGraph.from_workbook)
+
+    Returns:
+        dict with affected formulas and error locations, in the style of recalc.py
+    """
+    graph = FormulaGraph.from_workbook(filename, cache_path)
+    edited = [parse_cell_range(text, graph.sheets) for text in edited_ranges]
+    affected = sorted(graph.downstream(edited), key=graph.sort_key)
+
+    error_details = {err: [] for err in errors}
+    for key in affected:
+        err = graph.cell_errors(key, errors)
+        if err:
+            error_details[err].append(graph.location(key))
+    total_errors = sum(len(locations) for locations in error_details.values())
+
+    result = {
+        'status': 'success' if total_errors == 0 else 'errors_found',
+        'total_errors': total_errors,
+        'error_summary': {},
+        'affected_formulas': len(affected),
+        'affected_locations': [graph.location(key) for key in affected[:MAX_LOCATIONS]],
+        'total_formulas': len(graph.formulas),
+    }
+    for err_type, locations in error_details.items():
+        if locations:
+            result['error_summary'][err_type] = {
+                'count': len(locations),
+                'locations': locations[:MAX_LOCATIONS]
+            }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check only the formulas affected by edited cells for errors'
+    )
+    parser.add_argument('excel_file')
+    parser.add_argument('cells', nargs='+',
+                        help="Edited cells or ranges, e.g. Sheet1!B5 \"'My Sheet'!C1:C10\"")
+    parser.add_argument('--errors', nargs='+', default=CHECKED_ERRORS,
+                        help='Error values to check (default: #REF! #DIV/0!)')
+    parser.add_argument('--cache', help='Cache parsed sheets in this file between runs')
+    args = parser.parse_args()
+
+    try:
+        result = check_edits(args.excel_file, args.cells, args.errors, args.cache)
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        result = {'error': str(e)}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
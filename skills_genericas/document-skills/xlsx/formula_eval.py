@@ -0,0 +1,884 @@
+#!/usr/bin/env python3
+"""
+Pure-Python Formula Evaluator
+Computes formula values in-process for workbooks that use only a small subset
+of Excel, so recalc.py can skip starting LibreOffice for them
+
+Supported:
+- Numbers, text, TRUE/FALSE and error literals
+- Operators + - * / ^ & % = <> < > <= >=
+- Cell and range references, including other sheets and whole columns/rows
+- SUM, AVERAGE, MIN, MAX, COUNT, COUNTA, IF, IFERROR, AND, OR, NOT, ROUND,
+  ABS and VLOOKUP
+
+Anything else raises UnsupportedFormula before the file is changed, and the
+caller falls back to LibreOffice. That includes other functions, defined
+names, array formulas, external links, circular references, implicit
+intersection, wildcard or unsorted approximate VLOOKUPs.
+
+Formulas are read with openpyxl and evaluated in dependency order. Each
+distinct range is read once, with its numbers and totals, and VLOOKUP tables
+are indexed once, however many formulas use them. The computed values are
+written back as the cached values of the formula cells, leaving everything
+else in the file untouched.
+"""
+
+import math
+import operator
+import os
+import re
+import shutil
+import zipfile
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import date, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from xml.sax.saxutils import escape
+
+from openpyxl import load_workbook
+from openpyxl.formula.tokenizer import Token, Tokenizer, TokenizerError
+from openpyxl.utils.datetime import to_excel
+from openpyxl.utils.exceptions import InvalidFileException
+
+from formula_deps import REFERENCE, STRING_LITERAL, parse_reference
+from workbook_scan import CELL_REF, column_index, list_worksheets
+
+# Sheet XML rewriting: each formula cell gets a new <v> and t attribute
+CELL_XML = re.compile(r'<c\b([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+CELL_XML_REF = re.compile(r'\sr="([^"]*)"')
+CELL_XML_TYPE = re.compile(r'\st="[^"]*"')
+FORMULA_XML = re.compile(r'<f\b[^>]*?(?:/>|>.*?</f>)', re.S)
+VALUE_XML = re.compile(r'<v\b[^>]*?(?:/>|>.*?</v>)', re.S)
+
+# Template texts: string literals are kept, references made relative
+TEMPLATE_PART = re.compile(f'{STRING_LITERAL.pattern}|{REFERENCE.pattern}')
+REFERENCE_PART = re.compile(r'(\$?)([A-Za-z]{1,3}|\d+)')
+
+BINARY_PRECEDENCE = {
+    '=': 1, '<>': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&': 2,
+    '+': 3, '-': 3,
+    '*': 4, '/': 4,
+    '^': 5,
+}
+# Text that Excel arithmetic converts to a number
+NUMERIC_TEXT = re.compile(r'\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*')
+
+COMPARISONS = {
+    '=': operator.eq, '<>': operator.ne,
+    '<': operator.lt, '>': operator.gt,
+    '<=': operator.le, '>=': operator.ge,
+}
+
+
+class UnsupportedFormula(Exception):
+    """The workbook uses something the evaluator does not implement"""
+
+
+class ExcelError(Exception):
+    """An Excel error value: raised to propagate, stored as a cell's value"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class Reference:
+    """A rectangle of cells on one sheet, as passed to functions"""
+
+    __slots__ = ('sheet', 'c1', 'r1', 'c2', 'r2')
+
+    def __init__(self, sheet, c1, r1, c2, r2):
+        self.sheet = sheet
+        self.c1 = c1
+        self.r1 = r1
+        self.c2 = c2
+        self.r2 = r2
+
+
+class RangeData:
+    """Values of a range, read once and shared by every formula using it"""
+
+    __slots__ = ('rows', 'numbers', 'error', 'total')
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.numbers = []
+        self.error = None  # First error value in row-major order
+        for row in rows:
+            for value in row:
+                if isinstance(value, bool) or value is None or isinstance(value, str):
+                    continue
+                if isinstance(value, ExcelError):
+                    if self.error is None:
+                        self.error = value
+                else:
+                    self.numbers.append(value)
+        self.total = sum(self.numbers)
+
+
+def to_number(value):
+    """Coerce a value to a number as Excel arithmetic does"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        if not NUMERIC_TEXT.fullmatch(value):
+            raise ExcelError('#VALUE!')
+        return finite(float(value))
+    return finite(value)
+
+
+def finite(number):
+    """Return a number, or raise #NUM! if it overflowed to infinity or NaN"""
+    if isinstance(number, float) and not math.isfinite(number):
+        raise ExcelError('#NUM!')
+    return number
+
+
+def to_text(value):
+    """Coerce a value to text as the & operator does"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, str):
+        return value
+    return format_number(finite(value))
+
+
+def to_bool(value):
+    """Coerce a value to a logical as IF, AND, OR and NOT do"""
+    if isinstance(value, ExcelError):
+        raise value
+    if value is None:
+        return False
+    if isinstance(value, str):
+        if value.upper() in ('TRUE', 'FALSE'):
+            return value.upper() == 'TRUE'
+        raise ExcelError('#VALUE!')
+    return bool(value)
+
+
+def format_number(value):
+    """Format a number like Excel's General format, without thousands separators"""
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    text = format(value, '.15g')
+    if 'e' in text and 1e-9 <= abs(value) < 1e15:
+        # Excel writes small numbers out in full, e.g. 0.00001 rather than 1E-05
+        return format(Decimal(text), 'f')
+    return text.upper()
+
+
+def _comparable(value, other):
+    """Sort key for comparisons: numbers < text < logicals, text case-insensitive"""
+    if value is None:
+        # A blank compares as the empty value of the other side's type
+        if isinstance(other, str):
+            return (1, '')
+        if isinstance(other, bool):
+            return (2, False)
+        return (0, 0)
+    if isinstance(value, bool):
+        return (2, value)
+    if isinstance(value, str):
+        return (1, value.lower())
+    return (0, value)
+
+
+def _lookup_key(value):
+    """Key for exact VLOOKUP matches: text case-insensitive, never equal to numbers"""
+    if isinstance(value, bool):
+        return ('b', value)
+    if isinstance(value, str):
+        return ('s', value.lower())
+    return ('n', value)
+
+
+def _divide(a, b):
+    if b == 0:
+        raise ExcelError('#DIV/0!')
+    return a / b
+
+
+def _power(a, b):
+    try:
+        result = float(a) ** b
+    except ZeroDivisionError:
+        raise ExcelError('#DIV/0!')
+    except OverflowError:
+        raise ExcelError('#NUM!')
+    if isinstance(result, complex):
+        raise ExcelError('#NUM!')
+    return result
+
+
+ARITHMETIC = {
+    '+': operator.add, '-': operator.sub,
+    '*': operator.mul, '/': _divide, '^': _power,
+}
+
+
+def _missing(origin):
+    """An empty function argument, e.g. the last one in IF(A1,1,)"""
+    return None
+
+
+def template_text(formula, col, row):
+    """
+    Rewrite a formula's relative references as offsets from its cell
+
+    Formulas copied across a range share one template text, so they are
+    parsed and compiled once.
+
+    Returns:
+        (template text, number of references)
+    """
+    count = 0
+
+    def relative_part(match):
+        dollar, part = match.groups()
+        if dollar:
+            return match.group(0)
+        if part.isdigit():
+            return f'R{int(part) - row}'
+        return f'C{column_index(part.upper()) - col}'
+
+    def relative(match):
+        nonlocal count
+        text = match.group(0)
+        if text.startswith('"'):
+            return text
+        count += 1
+        split = text.rfind('!') + 1
+        return text[:split] + REFERENCE_PART.sub(relative_part, text[split:])
+
+    return TEMPLATE_PART.sub(relative, formula), count
+
+
+def place(template_ref, origin):
+    """Resolve a template reference for the formula cell at origin (column, row)"""
+    sheet, c1, r1, c2, r2, kc1, kr1, kc2, kr2 = template_ref
+    col, row = origin
+    return Reference(sheet, c1 + col * kc1, r1 + row * kr1, c2 + col * kc2, r2 + row * kr2)
+
+
+class FormulaParser:
+    """
+    Compiles one formula into a thunk taking the (column, row) of the cell it
+    runs for, so every cell sharing the formula's template can reuse it
+    """
+
+    def __init__(self, evaluator, sheet, formula, origin):
+        try:
+            items = Tokenizer(formula).items
+        except TokenizerError as e:
+            raise UnsupportedFormula(f'cannot parse {formula}: {e}')
+        self.tokens = [t for t in items if t.type != Token.WSPACE]
+        self.pos = 0
+        self.evaluator = evaluator
+        self.sheet = sheet
+        self.formula = formula
+        self.origin = origin
+        self.refs = []  # Template references, see place()
+
+    def compile(self):
+        thunk = self.expression()
+        if self.pos != len(self.tokens):
+            raise UnsupportedFormula(f'cannot parse {self.formula}')
+        return thunk
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedFormula(f'cannot parse {self.formula}')
+        self.pos += 1
+        return token
+
+    def expression(self, min_precedence=1):
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token is None or token.type != Token.OP_IN:
+                return left
+            precedence = BINARY_PRECEDENCE.get(token.value)
+            if precedence is None:
+                raise UnsupportedFormula(f'operator {token.value!r} in {self.formula}')
+            if precedence < min_precedence:
+                return left
+            self.pos += 1
+            # Excel operators are all left-associative, including ^
+            right = self.expression(precedence + 1)
+            left = self.binary(token.value, left, right)
+
+    def unary(self):
+        # Negation binds tighter than ^ in Excel: -2^2 is 4
+        token = self.peek()
+        if token is not None and token.type == Token.OP_PRE:
+            self.pos += 1
+            operand = self.unary()
+            if token.value == '+':
+                return operand
+            value = self.evaluator.value
+            return lambda o: -to_number(value(operand(o)))
+
+        operand = self.primary()
+        while True:
+            token = self.peek()
+            if token is None or token.type != Token.OP_POST:
+                return operand
+            self.pos += 1
+            operand = self.percent(operand)
+
+    def percent(self, operand):
+        value = self.evaluator.value
+        return lambda o: to_number(value(operand(o))) / 100
+
+    def binary(self, op, left, right):
+        value = self.evaluator.value
+        if op == '&':
+            return lambda o: to_text(value(left(o))) + to_text(value(right(o)))
+        if op in COMPARISONS:
+            compare = COMPARISONS[op]
+
+            def run(o):
+                a = value(left(o))
+                b = value(right(o))
+                return compare(_comparable(a, b), _comparable(b, a))
+            return run
+
+        arithmetic = ARITHMETIC[op]
+        return lambda o: finite(arithmetic(to_number(value(left(o))), to_number(value(right(o)))))
+
+    def primary(self):
+        token = self.next()
+        if token.type == Token.OPERAND:
+            return self.operand(token)
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self.function(token.value[:-1].upper())
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            thunk = self.expression()
+            closing = self.next()
+            if closing.type != Token.PAREN:
+                raise UnsupportedFormula(f'cannot parse {self.formula}')
+            return thunk
+        raise UnsupportedFormula(f'{token.value!r} in {self.formula}')
+
+    def operand(self, token):
+        text = token.value
+        if token.subtype == Token.NUMBER:
+            number = float(text)
+            constant = int(number) if number.is_integer() and abs(number) < 1e15 else number
+        elif token.subtype == Token.TEXT:
+            constant = text[1:-1].replace('""', '"')
+        elif token.subtype == Token.LOGICAL:
+            constant = text.upper() == 'TRUE'
+        elif token.subtype == Token.ERROR:
+            constant = ExcelError(text.upper())
+        elif '#REF!' in text:
+            constant = ExcelError('#REF!')
+        else:
+            return self.reference(text)
+        return lambda o: constant
+
+    def reference(self, text):
+        ref = parse_reference(text)
+        if ref is None:
+            # Defined names, external links and 3D references
+            raise UnsupportedFormula(f'reference {text}')
+        ref_sheet, c1, r1, c2, r2, absolute = ref
+        sheet = self.sheet if ref_sheet is None else self.evaluator.sheet_lookup.get(ref_sheet)
+        if sheet is None:
+            raise UnsupportedFormula(f'reference to a missing sheet: {text}')
+
+        # Relative parts are stored as offsets from the origin cell
+        kc1, kr1, kc2, kr2 = (0 if flag else 1 for flag in absolute)
+        col, row = self.origin
+        template_ref = (
+            sheet, c1 - col * kc1, r1 - row * kr1, c2 - col * kc2, r2 - row * kr2,
+            kc1, kr1, kc2, kr2,
+        )
+        self.refs.append(template_ref)
+        if not (kc1 or kr1 or kc2 or kr2):
+            reference = Reference(sheet, c1, r1, c2, r2)
+            return lambda o: reference
+        return lambda o: place(template_ref, o)
+
+    def function(self, name):
+        spec = FUNCTIONS.get(name)
+        if spec is None:
+            raise UnsupportedFormula(f'function {name}')
+        method, min_args, max_args, lazy = spec
+
+        args = []
+        token = self.peek()
+        if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE:
+            self.pos += 1
+        else:
+            while True:
+                token = self.peek()
+                if token is not None and (token.type == Token.SEP or token.type == Token.FUNC and token.subtype == Token.CLOSE):
+                    args.append(_missing)
+                else:
+                    args.append(self.expression())
+                token = self.next()
+                if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                    break
+                if token.type != Token.SEP or token.subtype != Token.ARG:
+                    raise UnsupportedFormula(f'{token.value!r} in {self.formula}')
+
+        if len(args) < min_args or (max_args is not None and len(args) > max_args):
+            raise UnsupportedFormula(f'{name} with {len(args)} arguments')
+
+        impl = getattr(self.evaluator, method)
+        if lazy:
+            return lambda o: impl(o, *args)
+        argument = self.evaluator.argument
+        return lambda o: impl(*[argument(arg, o) for arg in args])
+
+
+class WorkbookEvaluator:
+    """Cell values of a workbook, and the supported functions over them"""
+
+    def __init__(self, filename):
+        try:
+            wb = load_workbook(filename, read_only=True)
+        except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as e:
+            raise UnsupportedFormula(f'openpyxl cannot read the file: {e}')
+
+        self.sheet_lookup = {ws.title.upper(): ws.title for ws in wb.worksheets}
+        self.values = {}  # (sheet, column, row) -> value
+        self.formulas = {}  # (sheet, column, row) -> formula text
+        self.bounds = {}  # sheet -> (max column, max row)
+        self.ranges = {}  # (sheet, c1, r1, c2, r2) -> RangeData
+        self.lookup_tables = {}  # (kind, sheet, c1, r1, c2, r2) -> VLOOKUP index
+
+        try:
+            for ws in wb.worksheets:
+                sheet = ws.title
+                max_col = max_row = 0
+                for row in ws.iter_rows():
+                    for cell in row:
+                        value = cell.value
+                        if value is None:
+                            continue
+                        key = (sheet, cell.column, cell.row)
+                        max_col = max(max_col, cell.column)
+                        max_row = cell.row
+                        if cell.data_type == 'f':
+                            if not isinstance(value, str):
+                                raise UnsupportedFormula(f'array or data table formula in {sheet}!{cell.coordinate}')
+                            self.formulas[key] = value
+                        elif cell.data_type == 'e':
+                            self.values[key] = ExcelError(value)
+                        elif isinstance(value, (date, time, timedelta)):
+                            self.values[key] = to_excel(value, wb.epoch)
+                        else:
+                            self.values[key] = value
+                self.bounds[sheet] = (max_col, max_row)
+        finally:
+            wb.close()
+
+    # Values
+
+    def value(self, arg):
+        """Resolve an operand to a single value, raising if it is an error"""
+        if isinstance(arg, Reference):
+            if arg.c1 != arg.c2 or arg.r1 != arg.r2:
+                raise UnsupportedFormula('range used as a single value (implicit intersection)')
+            arg = self.values.get((arg.sheet, arg.c1, arg.r1))
+        if isinstance(arg, ExcelError):
+            raise arg
+        return arg
+
+    def argument(self, thunk, origin):
+        """Evaluate a function argument, keeping an error as a value"""
+        try:
+            return thunk(origin)
+        except ExcelError as e:
+            return e
+
+    def range_data(self, ref):
+        """Read a range once; formulas run in dependency order, so it never changes"""
+        max_col, max_row = self.bounds[ref.sheet]
+        c2 = min(ref.c2, max_col)
+        r2 = min(ref.r2, max_row)
+        key = (ref.sheet, ref.c1, ref.r1, c2, r2)
+        data = self.ranges.get(key)
+        if data is None:
+            get = self.values.get
+            sheet = ref.sheet
+            cols = range(ref.c1, c2 + 1)
+            data = RangeData([[get((sheet, c, r)) for c in cols] for r in range(ref.r1, r2 + 1)])
+            self.ranges[key] = data
+        return data
+
+    def numbers(self, args):
+        """Numbers of SUM-style arguments: ranges skip text, logicals and blanks"""
+        numbers = []
+        for arg in args:
+            if isinstance(arg, Reference):
+                data = self.range_data(arg)
+                if data.error:
+                    raise data.error
+                numbers.extend(data.numbers)
+            elif arg is not None:
+                numbers.append(to_number(arg))
+        return numbers
+
+    def logicals(self, args):
+        """Logicals of AND/OR arguments: ranges skip text and blanks"""
+        logicals = []
+        for arg in args:
+            if isinstance(arg, Reference):
+                data = self.range_data(arg)
+                for row in data.rows:
+                    for value in row:
+                        if isinstance(value, ExcelError):
+                            raise value
+                        if value is not None and not isinstance(value, str):
+                            logicals.append(bool(value))
+            else:
+                logicals.append(to_bool(arg))
+        if not logicals:
+            raise ExcelError('#VALUE!')
+        return logicals
+
+    # Functions (see FUNCTIONS)
+
+    def fn_sum(self, *args):
+        if len(args) == 1 and isinstance(args[0], Reference):
+            data = self.range_data(args[0])
+            if data.error:
+                raise data.error
+            return finite(data.total)
+        return finite(sum(self.numbers(args)))
+
+    def fn_average(self, *args):
+        numbers = self.numbers(args)
+        if not numbers:
+            raise ExcelError('#DIV/0!')
+        return finite(sum(numbers) / len(numbers))
+
+    def fn_min(self, *args):
+        return min(self.numbers(args), default=0)
+
+    def fn_max(self, *args):
+        return max(self.numbers(args), default=0)
+
+    def fn_count(self, *args):
+        count = 0
+        for arg in args:
+            if isinstance(arg, Reference):
+                count += len(self.range_data(arg).numbers)
+            elif arg is not None and not isinstance(arg, ExcelError):
+                try:
+                    to_number(arg)
+                    count += 1
+                except ExcelError:
+                    pass
+        return count
+
+    def fn_counta(self, *args):
+        count = 0
+        for arg in args:
+            if isinstance(arg, Reference):
+                count += sum(value is not None for row in self.range_data(arg).rows for value in row)
+            elif arg is not None:
+                count += 1
+        return count
+
+    def fn_if(self, origin, condition, then, otherwise=None):
+        if to_bool(self.value(condition(origin))):
+            return then(origin)
+        return otherwise(origin) if otherwise else False
+
+    def fn_iferror(self, origin, thunk, fallback):
+        try:
+            return self.value(thunk(origin))
+        except ExcelError:
+            return fallback(origin)
+
+    def fn_and(self, *args):
+        return all(self.logicals(args))
+
+    def fn_or(self, *args):
+        return any(self.logicals(args))
+
+    def fn_not(self, value):
+        return not to_bool(self.value(value))
+
+    def fn_abs(self, value):
+        return abs(to_number(self.value(value)))
+
+    def fn_round(self, value, digits):
+        number = to_number(self.value(value))
+        digits = math.trunc(to_number(self.value(digits)))
+        try:
+            # Excel rounds halves away from zero, on the decimal representation
+            rounded = Decimal(repr(number)).quantize(Decimal(1).scaleb(-digits), ROUND_HALF_UP)
+        except InvalidOperation:
+            return number
+        return float(rounded)
+
+    def fn_vlookup(self, lookup, table, column, approximate=True):
+        lookup = self.value(lookup)
+        if not isinstance(table, Reference):
+            raise UnsupportedFormula('VLOOKUP on an array')
+        column = math.trunc(to_number(self.value(column)))
+        # An empty fourth argument means FALSE, an omitted one TRUE
+        approximate = to_bool(self.value(approximate)) if approximate is not True else True
+        if column < 1:
+            raise ExcelError('#VALUE!')
+        if column > table.c2 - table.c1 + 1:
+            raise ExcelError('#REF!')
+        if lookup is None:
+            raise ExcelError('#N/A')
+
+        rows = self.range_data(table).rows
+        if approximate:
+            index = self.sorted_index(table, rows)
+            key = _comparable(lookup, lookup)
+            pos = bisect_right(index[0], key) - 1
+            if pos < 0 or index[0][pos][0] != key[0]:
+                raise ExcelError('#N/A')
+            row = rows[index[1][pos]]
+        else:
+            if isinstance(lookup, str) and any(ch in lookup for ch in '*?~'):
+                raise UnsupportedFormula('VLOOKUP with wildcards')
+            row_index = self.exact_index(table, rows).get(_lookup_key(lookup))
+            if row_index is None:
+                raise ExcelError('#N/A')
+            row = rows[row_index]
+        return row[column - 1] if column - 1 < len(row) else None
+
+    def exact_index(self, table, rows):
+        """First row index of each first-column value, built once per table"""
+        key = ('exact', table.sheet, table.c1, table.r1, table.c2, table.r2)
+        index = self.lookup_tables.get(key)
+        if index is None:
+            index = {}
+            for i, row in enumerate(rows):
+                if row and row[0] is not None and not isinstance(row[0], ExcelError):
+                    index.setdefault(_lookup_key(row[0]), i)
+            self.lookup_tables[key] = index
+        return index
+
+    def sorted_index(self, table, rows):
+        """First-column keys and row indexes for approximate matches, built once per table"""
+        key = ('sorted', table.sheet, table.c1, table.r1, table.c2, table.r2)
+        index = self.lookup_tables.get(key)
+        if index is None:
+            keys = []
+            positions = []
+            for i, row in enumerate(rows):
+                if row and row[0] is not None and not isinstance(row[0], ExcelError):
+                    keys.append(_comparable(row[0], row[0]))
+                    positions.append(i)
+            if any(a > b for a, b in zip(keys, keys[1:])):
+                # Excel's binary search gives implementation-specific results here
+                raise UnsupportedFormula('approximate VLOOKUP on an unsorted table')
+            index = (keys, positions)
+            self.lookup_tables[key] = index
+        return index
+
+    # Evaluation
+
+    def evaluate(self):
+        """
+        Evaluate every formula in dependency order
+
+        Returns:
+            {(sheet, column, row): value} for the formula cells
+
+        Raises:
+            UnsupportedFormula: also for any unexpected failure, so callers
+                fall back to LibreOffice instead of crashing
+        """
+        try:
+            return self._evaluate()
+        except UnsupportedFormula:
+            raise
+        except Exception as e:
+            raise UnsupportedFormula(f'evaluation failed: {e!r}') from e
+
+    def _evaluate(self):
+        compiled = {}  # (sheet, column, row) -> (thunk, template references)
+        templates = {}  # (sheet, template text) -> (thunk, template references)
+        for key, formula in self.formulas.items():
+            sheet, col, row = key
+            text, ref_count = template_text(formula, col, row)
+            template = templates.get((sheet, text))
+            if template is None:
+                parser = FormulaParser(self, sheet, formula, (col, row))
+                template = (parser.compile(), parser.refs)
+                # Only share the template if both parsers saw the same references
+                if len(parser.refs) == ref_count:
+                    templates[(sheet, text)] = template
+            compiled[key] = template
+
+        results = {}
+        for key in self.evaluation_order(compiled):
+            try:
+                value = self.value(compiled[key][0](key[1:]))
+                if value is None:
+                    value = 0
+                elif isinstance(value, float) and not math.isfinite(value):
+                    value = ExcelError('#NUM!')
+            except ExcelError as e:
+                value = e
+            self.values[key] = value
+            results[key] = value
+        return results
+
+    def evaluation_order(self, compiled):
+        """Topologically sort formulas so each runs after the formulas it reads"""
+        formula_rows = {}  # (sheet, column) -> sorted rows holding formulas
+        for sheet, col, row in compiled:
+            formula_rows.setdefault((sheet, col), []).append(row)
+        for rows in formula_rows.values():
+            rows.sort()
+
+        dependents = {key: [] for key in compiled}
+        pending = {}
+        for key, (_, template_refs) in compiled.items():
+            precedents = set()
+            for template_ref in template_refs:
+                ref = place(template_ref, key[1:])
+                max_col = self.bounds[ref.sheet][0]
+                for col in range(ref.c1, min(ref.c2, max_col) + 1):
+                    rows = formula_rows.get((ref.sheet, col))
+                    if rows:
+                        start = bisect_left(rows, ref.r1)
+                        end = bisect_right(rows, ref.r2)
+                        precedents.update((ref.sheet, col, row) for row in rows[start:end])
+            pending[key] = len(precedents)
+            for precedent in precedents:
+                dependents[precedent].append(key)
+
+        ready = deque(key for key, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            key = ready.popleft()
+            order.append(key)
+            for dependent in dependents[key]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        if len(order) < len(compiled):
+            raise UnsupportedFormula('circular reference')
+        return order
+
+
+FUNCTIONS = {
+    # name: (method, min args, max args, lazy); lazy functions get unevaluated thunks
+    'SUM': ('fn_sum', 1, None, False),
+    'AVERAGE': ('fn_average', 1, None, False),
+    'MIN': ('fn_min', 1, None, False),
+    'MAX': ('fn_max', 1, None, False),
+    'COUNT': ('fn_count', 1, None, False),
+    'COUNTA': ('fn_counta', 1, None, False),
+    'IF': ('fn_if', 2, 3, True),
+    'IFERROR': ('fn_iferror', 2, 2, True),
+    'AND': ('fn_and', 1, None, False),
+    'OR': ('fn_or', 1, None, False),
+    'NOT': ('fn_not', 1, 1, False),
+    'ABS': ('fn_abs', 1, 1, False),
+    'ROUND': ('fn_round', 2, 2, False),
+    'VLOOKUP': ('fn_vlookup', 3, 4, False),
+}
+
+
+def _serialize(value):
+    """Return (cell type attribute or None, <v> text) for a computed value"""
+    if isinstance(value, ExcelError):
+        return 'e', value.code
+    if isinstance(value, bool):
+        return 'b', '1' if value else '0'
+    if isinstance(value, str):
+        return 'str', escape(value)
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return None, str(int(value))
+    return None, repr(value)
+
+
+def _rewrite_sheet(xml, sheet_results):
+    """Set the cached values of a sheet's formula cells in its XML"""
+    written = 0
+
+    def replace(match):
+        nonlocal written
+        attrs, body = match.group(1), match.group(2)
+        if body is None or '<f' not in body:
+            return match.group(0)
+        ref = CELL_XML_REF.search(attrs)
+        ref = ref and CELL_REF.fullmatch(ref.group(1))
+        if not ref:
+            return match.group(0)
+        key = (column_index(ref.group(1)), int(ref.group(2)))
+        if key not in sheet_results:
+            return match.group(0)
+
+        written += 1
+        cell_type, text = _serialize(sheet_results[key])
+        attrs = CELL_XML_TYPE.sub('', attrs)
+        if cell_type:
+            attrs += f' t="{cell_type}"'
+        body = VALUE_XML.sub('', body)
+        formula = FORMULA_XML.search(body)
+        end = formula.end() if formula else 0
+        return f'<c{attrs}>{body[:end]}<v>{text}</v>{body[end:]}</c>'
+
+    xml = CELL_XML.sub(replace, xml)
+    return xml, written
+
+
+def evaluate_workbook(filename):
+    """
+    Recalculate an .xlsx file in place without LibreOffice
+
+    Args:
+        filename: Path to Excel file
+
+    Raises:
+        UnsupportedFormula: the workbook needs LibreOffice; the file is unchanged
+    """
+    results = WorkbookEvaluator(filename).evaluate()
+    by_sheet = {}
+    for (sheet, col, row), value in results.items():
+        by_sheet.setdefault(sheet, {})[(col, row)] = value
+
+    # Build every rewritten sheet before touching the file
+    new_members = {}
+    with zipfile.ZipFile(filename) as zf:
+        for name, member in list_worksheets(zf):
+            sheet_results = by_sheet.get(name)
+            if not sheet_results:
+                continue
+            try:
+                xml = zf.read(member).decode('utf-8')
+            except UnicodeDecodeError:
+                raise UnsupportedFormula(f'{member} is not UTF-8')
+            xml, written = _rewrite_sheet(xml, sheet_results)
+            if written != len(sheet_results):
+                raise UnsupportedFormula(f'unexpected cell markup in {member}')
+            new_members[member] = xml.encode('utf-8')
+
+        tmp_path = f'{filename}.{os.getpid()}.tmp'
+        with zipfile.ZipFile(tmp_path, 'w') as out:
+            for info in zf.infolist():
+                data = new_members.get(info.filename)
+                out.writestr(info, data if data is not None else zf.read(info))
+    shutil.copymode(filename, tmp_path)
+    os.replace(tmp_path, filename)
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import unittest
+
+from openpyxl import Workbook, load_workbook
+
+from formula_eval import ExcelError, UnsupportedFormula, _rewrite_sheet, evaluate_workbook
+
+
+# Currently this is not run automatically in CI; it's just for documentation and manual checking.
+class TestEvaluateWorkbook(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'book.xlsx')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def evaluate(self, cells, sheets=()):
+        """Write cells ({'A1': value}) to a sheet named S, recalculate, return the cached values"""
+        wb = Workbook()
+        ws = wb.active
+        ws.title = 'S'
+        for ref, value in cells.items():
+            ws[ref] = value
+        for name, sheet_cells in sheets:
+            other = wb.create_sheet(name)
+            for ref, value in sheet_cells.items():
+                other[ref] = value
+        wb.save(self.path)
+        evaluate_workbook(self.path)
+        ws = load_workbook(self.path, data_only=True)['S']
+        return {ref: ws[ref].value for ref in cells}
+
+    def value(self, formula, **cells):
+        return self.evaluate({'Z1': formula, **cells})['Z1']
+
+    def test_operators(self):
+        """Test arithmetic, precedence, percent, concatenation and comparisons"""
+        self.assertEqual(self.value('=1+2*3'), 7)
+        self.assertEqual(self.value('=-2^2'), 4)
+        self.assertEqual(self.value('=2^3^2'), 64)
+        self.assertEqual(self.value('=50%*4'), 2)
+        self.assertEqual(self.value('=7/2'), 3.5)
+        self.assertEqual(self.value('="a"&1&TRUE'), 'a1TRUE')
+        self.assertIs(self.value('="B">"a"'), True)
+        self.assertIs(self.value('="a"=1'), False)
+        self.assertIs(self.value('=1<"a"'), True)
+        self.assertIs(self.value('=A1=0', A1=None), True)
+        self.assertEqual(self.value('=1/0'), '#DIV/0!')
+
+    def test_coercion(self):
+        """Test how text, logicals and blanks convert to numbers and text"""
+        self.assertEqual(self.value('=" 2 "+1'), 3)
+        self.assertEqual(self.value('="1e3"+1'), 1001)
+        self.assertEqual(self.value('=TRUE+A1', A1=None), 1)
+        self.assertEqual(self.value('="1_000"+1'), '#VALUE!')
+        self.assertEqual(self.value('="inf"+1'), '#VALUE!')
+        self.assertEqual(self.value('="abc"*1'), '#VALUE!')
+        self.assertEqual(self.value('=0.00001&""'), '0.00001')
+        self.assertEqual(self.value('=1/3&""'), '0.333333333333333')
+        self.assertEqual(self.value('=1E+20&""'), '1E+20')
+        self.assertEqual(self.value('=SUM(A1:A3)', A1=1, A2='5', A3=True), 1)
+
+    def test_overflow(self):
+        """Test that infinite intermediate results are #NUM! errors"""
+        self.assertEqual(self.value('=ROUND(A1,A1*1E308*10)', A1=5), '#NUM!')
+        self.assertEqual(self.value('=VLOOKUP(1,A1:A1,A1*1E308*10)', A1=5), '#NUM!')
+        self.assertEqual(self.value('=1E308*10&""'), '#NUM!')
+        self.assertEqual(self.value('=ROUND(2.5,0)'), 3)
+
+    def test_vlookup_exact(self):
+        """Test exact matches: case-insensitive text, text never equal to numbers"""
+        table = {'A1': 'apple', 'B1': 1, 'A2': 2, 'B2': 'two', 'A3': 'APPLE', 'B3': 3}
+        self.assertEqual(self.value('=VLOOKUP("Apple",A1:B3,2,FALSE)', **table), 1)
+        self.assertEqual(self.value('=VLOOKUP(2,A1:B3,2,FALSE)', **table), 'two')
+        self.assertEqual(self.value('=VLOOKUP("2",A1:B3,2,FALSE)', **table), '#N/A')
+        self.assertEqual(self.value('=VLOOKUP(2,A1:B3,3,FALSE)', **table), '#REF!')
+        with self.assertRaises(UnsupportedFormula):
+            self.value('=VLOOKUP("a*",A1:B3,2,FALSE)', **table)
+
+    def test_vlookup_approximate(self):
+        """Test approximate matches on a sorted table, and the fallback on unsorted ones"""
+        table = {'A1': 1, 'B1': 'low', 'A2': 10, 'B2': 'mid', 'A3': 20, 'B3': 'high'}
+        self.assertEqual(self.value('=VLOOKUP(15,A1:B3,2)', **table), 'mid')
+        self.assertEqual(self.value('=VLOOKUP(20,A1:B3,2,TRUE)', **table), 'high')
+        self.assertEqual(self.value('=VLOOKUP(0,A1:B3,2)', **table), '#N/A')
+        with self.assertRaises(UnsupportedFormula):
+            self.value('=VLOOKUP(15,A1:B3,2)', **{**table, 'A3': 5})
+
+    def test_lazy_functions(self):
+        """Test that IF and IFERROR only evaluate the branch they use"""
+        self.assertEqual(self.value('=IF(TRUE,1,1/0)'), 1)
+        self.assertEqual(self.value('=IF(TRUE,1,VLOOKUP("a*",A1:B1,2,FALSE))'), 1)
+        self.assertIs(self.value('=IF(FALSE,1)'), False)
+        self.assertEqual(self.value('=IFERROR(1/0,"none")'), 'none')
+        self.assertEqual(self.value('=IFERROR(2,1/0)'), 2)
+
+    def test_dependency_order(self):
+        """Test that formulas run after the formulas they read, across sheets"""
+        values = self.evaluate(
+            {'A1': '=A3*2', 'A2': 3, 'A3': '=A2+Other!A1', 'B1': '=SUM(A1:A3)'},
+            sheets=[('Other', {'A1': '=10'})],
+        )
+        self.assertEqual(values, {'A1': 26, 'A2': 3, 'A3': 13, 'B1': 42})
+
+    def test_shared_templates(self):
+        """Test that copied formulas resolve their relative references per cell"""
+        cells = {f'A{r}': r for r in range(1, 4)}
+        cells.update({f'B{r}': f'=A{r}*$A$1*10' for r in range(1, 4)})
+        values = self.evaluate(cells)
+        self.assertEqual([values[f'B{r}'] for r in range(1, 4)], [10, 20, 30])
+
+    def test_fallbacks_leave_file_unchanged(self):
+        """Test circular references and unsupported functions raise before the file is written"""
+        for cells in ({'A1': '=B1', 'B1': '=A1+1'}, {'A1': 1, 'B1': '=SUMPRODUCT(A1:A2)'}, {'A1': '=Missing'}):
+            with self.subTest(cells=cells):
+                wb = Workbook()
+                for ref, value in cells.items():
+                    wb.active[ref] = value
+                wb.save(self.path)
+                with open(self.path, 'rb') as f:
+                    before = f.read()
+                with self.assertRaises(UnsupportedFormula):
+                    evaluate_workbook(self.path)
+                with open(self.path, 'rb') as f:
+                    self.assertEqual(f.read(), before)
+
+
+class TestRewriteSheet(unittest.TestCase):
+
+    def test_rewrites_formula_cells_only(self):
+        """Test that cached values and types are replaced and other cells kept"""
+        xml = (
+            '<sheetData><row r="1">'
+            '<c r="A1" t="s"><v>0</v></c>'
+            '<c r="B1" t="str"><f>A1&amp;"x"</f><v>old</v></c>'
+            '<c r="C1"><f>1/0</f></c>'
+            '<c r="D1" s="2"><f>B1="a"</f><v>0</v></c>'
+            '<c r="E1" t="e"><f>1+1</f><v>#N/A</v></c>'
+            '</row></sheetData>'
+        )
+        results = {(2, 1): 'a<b', (3, 1): ExcelError('#DIV/0!'), (4, 1): True, (5, 1): 2.0}
+        new_xml, written = _rewrite_sheet(xml, results)
+        self.assertEqual(written, 4)
+        self.assertIn('<c r="A1" t="s"><v>0</v></c>', new_xml)
+        self.assertIn('<c r="B1" t="str"><f>A1&amp;"x"</f><v>a&lt;b</v></c>', new_xml)
+        self.assertIn('<c r="C1" t="e"><f>1/0</f><v>#DIV/0!</v></c>', new_xml)
+        self.assertIn('<c r="D1" s="2" t="b"><f>B1="a"</f><v>1</v></c>', new_xml)
+        self.assertIn('<c r="E1"><f>1+1</f><v>2</v></c>', new_xml)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,35 +4,29 @@ Excel Formula Recalculation Script
 Recalculates all formulas in an Excel file using LibreOffice
 """
 
+import getpass
+import hashlib
 import json
 import sys
+import shutil
 import subprocess
 import os
 import platform
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from openpyxl import load_workbook
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from formula_eval import UnsupportedFormula, evaluate_workbook
+from workbook_scan import scan_workbook
 
-def setup_libreoffice_macro():
-    """Setup LibreOffice macro for recalculation if not already configured"""
-    if platform.system() == 'Darwin':
-        macro_dir = os.path.expanduser('~/Library/Application Support/LibreOffice/4/user/basic/Standard')
-    else:
-        macro_dir = os.path.expanduser('~/.config/libreoffice/4/user/basic/Standard')
-    
-    macro_file = os.path.join(macro_dir, 'Module1.xba')
-    
-    if os.path.exists(macro_file):
-        with open(macro_file, 'r') as f:
-            if 'RecalculateAndSave' in f.read():
-                return True
-    
-    if not os.path.exists(macro_dir):
-        subprocess.run(['soffice', '--headless', '--terminate_after_init'], 
-                      capture_output=True, timeout=10)
-        os.makedirs(macro_dir, exist_ok=True)
-    
-    macro_content = '''<?xml version="1.0" encoding="UTF-8"?>
+ENGINES = ('auto', 'python', 'libreoffice')
+
+MACRO_CONTENT = '''<?xml version="1.0" encoding="UTF-8"?>
 <!DOCTYPE script:module PUBLIC "-//OpenOffice.org//DTD OfficeDocument 1.0//EN" "module.dtd">
 <script:module xmlns:script="http://openoffice.org/2000/script" script:name="Module1" script:language="StarBasic">
     Sub RecalculateAndSave()
@@ -41,22 +35,157 @@ def setup_libreoffice_macro():
       ThisComponent.close(True)
     End Sub
 </script:module>'''
-    
+# Stamp written once a profile is provisioned; changes whenever the macro does
+PROFILE_STAMP = hashlib.sha1(MACRO_CONTENT.encode()).hexdigest()[:12]
+STAMP_FILE = '.recalc-provisioned'
+PROFILE_INIT_TIMEOUT = 10
+
+_provisioned = set()  # Profiles already confirmed by this process
+
+
+def default_profile_dir():
+    """The user's own LibreOffice profile, used by recalc()"""
+    if platform.system() == 'Darwin':
+        return os.path.expanduser('~/Library/Application Support/LibreOffice/4')
+    return os.path.expanduser('~/.config/libreoffice/4')
+
+
+def user_tag():
+    """Name of the current user, for per-user temp paths"""
     try:
-        with open(macro_file, 'w') as f:
-            f.write(macro_content)
-        return True
-    except Exception:
+        return getpass.getuser()
+    except Exception:  # No login name or environment variables to go by
+        return 'user'
+
+
+def profile_template_dir():
+    """Provisioned profile that fresh worker profiles are copied from"""
+    return os.environ.get('RECALC_PROFILE_TEMPLATE') or os.path.join(
+        tempfile.gettempdir(), f'recalc-profile-{user_tag()}'
+    )
+
+
+def is_provisioned(profile_dir):
+    """True if the profile's stamp matches the current macro"""
+    try:
+        with open(os.path.join(profile_dir, STAMP_FILE)) as f:
+            return f.read().strip() == PROFILE_STAMP
+    except OSError:
         return False
 
 
-def recalc(filename, timeout=30):
+@contextmanager
+def _profile_lock(profile_dir):
+    """Exclusive lock on a profile, held in a file next to it"""
+    os.makedirs(os.path.dirname(profile_dir), exist_ok=True)
+    with open(f'{profile_dir}.lock', 'w') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # Locks the first byte; LK_LOCK gives up after ~10 seconds
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_atomic(path, content):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _provision(profile_dir, template_dir):
+    if template_dir and is_provisioned(template_dir):
+        shutil.copytree(template_dir, profile_dir, dirs_exist_ok=True)
+        return True
+
+    macro_dir = os.path.join(profile_dir, 'user', 'basic', 'Standard')
+    if not os.path.exists(macro_dir):
+        cmd = ['soffice', '--headless', '--terminate_after_init']
+        if profile_dir != default_profile_dir():
+            cmd.append(f'-env:UserInstallation={Path(profile_dir).as_uri()}')
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=PROFILE_INIT_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired):
+            return False  # No soffice, or it hung: leave unstamped to retry later
+        if result.returncode != 0 or not os.path.isdir(os.path.join(profile_dir, 'user')):
+            return False
+        os.makedirs(macro_dir, exist_ok=True)
+
+    macro_file = os.path.join(macro_dir, 'Module1.xba')
+    if os.path.exists(macro_file):
+        with open(macro_file, 'r') as f:
+            has_macro = 'RecalculateAndSave' in f.read()
+    else:
+        has_macro = False
+    if not has_macro:
+        _write_atomic(macro_file, MACRO_CONTENT)
+    _write_atomic(os.path.join(profile_dir, STAMP_FILE), PROFILE_STAMP)
+    return True
+
+
+def provision_profile(profile_dir=None, template_dir=None):
+    """
+    Make sure a LibreOffice profile exists and has the recalculation macro
+
+    Idempotent and safe to run from several processes at once: the work is
+    done once under an exclusive file lock and recorded in a stamp file, so
+    later calls only read the stamp (and calls in the same process not even
+    that).
+
+    Args:
+        profile_dir: LibreOffice UserInstallation directory
+            (default: the user's own profile)
+        template_dir: Provisioned profile to copy instead of initializing
+            a new one with soffice
+
+    Returns:
+        True if the profile is ready; False if it could not be provisioned
+        (e.g. soffice is missing or failed), in which case it is left
+        unstamped and the next call tries again
+    """
+    profile_dir = profile_dir or default_profile_dir()
+    if profile_dir in _provisioned:
+        return True
+    if not is_provisioned(profile_dir):
+        try:
+            with _profile_lock(profile_dir):
+                # Another process may have provisioned it while we waited
+                if not is_provisioned(profile_dir) and not _provision(profile_dir, template_dir):
+                    return False
+        except OSError:
+            return False
+    _provisioned.add(profile_dir)
+    return True
+
+
+def setup_libreoffice_macro():
+    """Setup LibreOffice macro for recalculation if not already configured"""
+    return provision_profile()
+
+
+def recalc(filename, timeout=30, engine='auto'):
     """
     Recalculate formulas in Excel file and report any errors
     
     Args:
         filename: Path to Excel file
         timeout: Maximum time to wait for recalculation (seconds)
+        engine: 'auto' evaluates in Python when every formula is supported
+            (see formula_eval.py) and uses LibreOffice otherwise; 'python'
+            or 'libreoffice' force one engine
     
     Returns:
         dict with error locations and counts
@@ -66,6 +195,14 @@ def recalc(filename, timeout=30):
     
     abs_path = str(Path(filename).absolute())
     
+    if engine != 'libreoffice':
+        try:
+            evaluate_workbook(abs_path)
+            return check_errors(filename)
+        except UnsupportedFormula as e:
+            if engine == 'python':
+                return {'error': f'Not supported by the Python evaluator: {e}'}
+    
     if not setup_libreoffice_macro():
         return {'error': 'Failed to setup LibreOffice macro'}
     
@@ -98,67 +235,41 @@ def recalc(filename, timeout=30):
         else:
             return {'error': error_msg}
     
-    # Check for Excel errors in the recalculated file - scan ALL cells
+    return check_errors(filename)
+
+
+def check_errors(filename, workers=None):
+    """
+    Scan a recalculated Excel file for formula errors
+    
+    Args:
+        filename: Path to Excel file
+        workers: Processes scanning sheets in parallel (see scan_workbook);
+            pass 1 from threads, e.g. the server and batch sessions
+    
+    Returns:
+        dict with error locations and counts
+    """
+    # Stream ALL cells of every sheet straight from the file, large ones in parallel
     try:
-        wb = load_workbook(filename, data_only=True)
-        
-        excel_errors = ['#VALUE!', '#DIV/0!', '#REF!', '#NAME?', '#NULL!', '#NUM!', '#N/A']
-        error_details = {err: [] for err in excel_errors}
-        total_errors = 0
-        
-        for sheet_name in wb.sheetnames:
-            ws = wb[sheet_name]
-            # Check ALL rows and columns - no limits
-            for row in ws.iter_rows():
-                for cell in row:
-                    if cell.value is not None and isinstance(cell.value, str):
-                        for err in excel_errors:
-                            if err in cell.value:
-                                location = f"{sheet_name}!{cell.coordinate}"
-                                error_details[err].append(location)
-                                total_errors += 1
-                                break
-        
-        wb.close()
-        
-        # Build result summary
-        result = {
-            'status': 'success' if total_errors == 0 else 'errors_found',
-            'total_errors': total_errors,
-            'error_summary': {}
-        }
-        
-        # Add non-empty error categories
-        for err_type, locations in error_details.items():
-            if locations:
-                result['error_summary'][err_type] = {
-                    'count': len(locations),
-                    'locations': locations[:20]  # Show up to 20 locations
-                }
-        
-        # Add formula count for context - also check ALL cells
-        wb_formulas = load_workbook(filename, data_only=False)
-        formula_count = 0
-        for sheet_name in wb_formulas.sheetnames:
-            ws = wb_formulas[sheet_name]
-            for row in ws.iter_rows():
-                for cell in row:
-                    if cell.value and isinstance(cell.value, str) and cell.value.startswith('='):
-                        formula_count += 1
-        wb_formulas.close()
-        
-        result['total_formulas'] = formula_count
-        
-        return result
-        
+        return scan_workbook(filename, workers)
     except Exception as e:
         return {'error': str(e)}
 
 
 def main():
+    if sys.argv[1:] == ['--setup']:
+        # Explicit provisioning, e.g. in an image build, so no recalc pays for it
+        ready = provision_profile() and provision_profile(profile_template_dir())
+        print(json.dumps({'status': 'ready' if ready else 'failed'}))
+        sys.exit(0 if ready else 1)
+    
     if len(sys.argv) < 2:
-        print("Usage: python recalc.py <excel_file> [timeout_seconds]")
-        print("\nRecalculates all formulas in an Excel file using LibreOffice")
+        print("Usage: python recalc.py <excel_file> [timeout_seconds] [--engine auto|python|libreoffice]")
+        print("       python recalc.py --setup")
+        print("\nRecalculates all formulas in an Excel file, in Python when every formula")
+        print("is supported (see formula_eval.py) and otherwise using LibreOffice")
+        print("--setup provisions the LibreOffice profiles ahead of time (done automatically on first use)")
         print("\nReturns JSON with error details:")
         print("  - status: 'success' or 'errors_found'")
         print("  - total_errors: Total number of Excel errors found")
@@ -167,10 +278,20 @@ def main():
         print("    - #VALUE!, #DIV/0!, #REF!, #NAME?, #NULL!, #NUM!, #N/A")
         sys.exit(1)
     
-    filename = sys.argv[1]
-    timeout = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    args = sys.argv[1:]
+    engine = 'auto'
+    if '--engine' in args:
+        i = args.index('--engine')
+        engine = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+        if engine not in ENGINES:
+            print(f"--engine must be one of: {', '.join(ENGINES)}")
+            sys.exit(1)
+    
+    filename = args[0]
+    timeout = int(args[1]) if len(args) > 1 else 30
     
-    result = recalc(filename, timeout)
+    result = recalc(filename, timeout, engine)
     print(json.dumps(result, indent=2))
 
 
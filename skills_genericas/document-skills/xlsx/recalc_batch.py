@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Excel Formula Batch Recalculation
+Recalculates many Excel files in a small pool of LibreOffice sessions and
+prints one JSON line per file as each finishes
+
+Each session opens its files one after another, so LibreOffice starts once
+per session rather than once per file. A file that exceeds the timeout has
+only its own session killed; that session restarts for its next file while
+the rest of the batch keeps going. Requires LibreOffice's Python bindings
+(python3-uno), like recalc_server.py.
+
+Usage: python recalc_batch.py <files or globs...> [--list FILE] [--workers N] [--timeout S]
+"""
+
+import argparse
+import glob
+import json
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+from recalc import check_errors
+from recalc_server import start_workers
+
+DEFAULT_BATCH_WORKERS = 2
+
+
+def expand_inputs(patterns, list_file=None):
+    """Expand paths and glob patterns into a de-duplicated, ordered file list"""
+    if list_file:
+        with open(list_file) as f:
+            patterns = list(patterns) + [line.strip() for line in f if line.strip()]
+
+    files = []
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for match in matches:
+            path = str(Path(match).absolute())
+            if path not in seen:
+                seen.add(path)
+                files.append(path)
+    return files
+
+
+def recalc_batch(files, workers=DEFAULT_BATCH_WORKERS, timeout=30, on_result=None):
+    """
+    Recalculate files across a pool of LibreOffice sessions
+
+    Args:
+        files: Absolute paths of Excel files
+        workers: Number of LibreOffice sessions
+        timeout: Per-file timeout in seconds
+        on_result: Called with each result dict as soon as it is ready
+
+    Returns:
+        List of result dicts, each recalc()'s result plus a 'file' key,
+        in completion order
+    """
+    pending = queue.Queue()
+    for path in files:
+        pending.put(path)
+
+    results = []
+    lock = threading.Lock()
+    base_dir = tempfile.mkdtemp(prefix='recalc-batch-')
+    sessions = start_workers(min(workers, len(files)) or 1, base_dir)
+
+    def run(session):
+        while True:
+            try:
+                path = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not Path(path).exists():
+                result = {'error': f'File {path} does not exist'}
+            else:
+                try:
+                    error = session.recalculate(path, timeout)
+                    result = {'error': error} if error else check_errors(path, workers=1)
+                except Exception as e:
+                    # e.g. the session could not restart; it retries on the next file
+                    result = {'error': f'Recalculation failed: {e}'}
+            result = {'file': path, **result}
+            with lock:
+                results.append(result)
+                if on_result:
+                    on_result(result)
+
+    threads = [threading.Thread(target=run, args=(s,)) for s in sessions]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for session in sessions:
+            session.stop()
+        shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Recalculate many Excel files in a pool of LibreOffice sessions'
+    )
+    parser.add_argument('inputs', nargs='*', help='Excel files or glob patterns (quote globs)')
+    parser.add_argument('--list', help='File with one Excel path or glob per line')
+    parser.add_argument('--workers', type=int, default=DEFAULT_BATCH_WORKERS,
+                        help=f'LibreOffice sessions (default: {DEFAULT_BATCH_WORKERS})')
+    parser.add_argument('--timeout', type=int, default=30,
+                        help='Per-file timeout in seconds (default: 30)')
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs, args.list)
+    if not files:
+        parser.error('no input files')
+
+    def emit(result):
+        print(json.dumps(result), flush=True)
+
+    results = recalc_batch(files, args.workers, args.timeout, on_result=emit)
+
+    # Files without a result (e.g. a session thread died) count as failed
+    failed = sum(1 for r in results if 'error' in r) + len(files) - len(results)
+    with_errors = sum(1 for r in results if r.get('status') == 'errors_found')
+    print(f"Recalculated {len(files) - failed}/{len(files)} files, "
+          f"{with_errors} with formula errors", file=sys.stderr)
+    sys.exit(1 if failed or with_errors else 0)
+
+
+if __name__ == '__main__':
+    main()
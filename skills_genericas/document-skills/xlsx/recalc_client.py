@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Excel Formula Recalculation Client
+Drop-in replacement for recalc.py that sends the file to a running
+recalc_server.py, falling back to recalc.py when no server is running
+"""
+
+import json
+import os
+import socket
+import sys
+import tempfile
+
+from recalc import recalc, user_tag
+
+
+def default_socket_path():
+    """Socket path shared by recalc_server.py and this client"""
+    return os.environ.get('RECALC_SOCKET') or os.path.join(
+        tempfile.gettempdir(), f'recalc-{user_tag()}.sock'
+    )
+
+
+def recalc_via_server(filename, timeout=30, socket_path=None):
+    """
+    Recalculate formulas using a running recalc server
+
+    Args:
+        filename: Path to Excel file
+        timeout: Maximum time to wait for recalculation (seconds)
+        socket_path: Server socket, defaults to default_socket_path()
+
+    Returns:
+        dict with error locations and counts, as returned by recalc()
+
+    Raises:
+        OSError: if no server is listening on the socket, or the platform
+            has no Unix sockets (e.g. older Windows)
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError('Unix sockets are not available on this platform')
+    request = {'file': os.path.abspath(filename), 'timeout': timeout}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as response:
+            line = response.readline()
+    if not line:
+        return {'error': 'Recalculation server closed the connection'}
+    return json.loads(line)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python recalc_client.py <excel_file> [timeout_seconds]")
+        print("\nRecalculates all formulas using a running recalc_server.py")
+        print("(or LibreOffice directly if no server is running)")
+        print("\nReturns the same JSON as recalc.py")
+        sys.exit(1)
+
+    filename = sys.argv[1]
+    timeout = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    try:
+        result = recalc_via_server(filename, timeout)
+    except OSError:
+        print("No recalc server running, starting LibreOffice directly", file=sys.stderr)
+        result = recalc(filename, timeout)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
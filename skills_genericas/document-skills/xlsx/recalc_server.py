@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Excel Formula Recalculation Server
+Keeps warm headless LibreOffice instances and recalculates Excel files sent
+over a local socket, so each recalculation skips LibreOffice start-up
+
+Each instance runs with its own user profile (-env:UserInstallation), so
+concurrent recalculations never share profile state. Instances are driven
+over UNO, which requires LibreOffice's Python bindings (python3-uno).
+
+Protocol: clients send one JSON line {"file": <absolute path>, "timeout": <seconds>}
+and receive one JSON line with the same result recalc.py prints.
+Use recalc_client.py as a drop-in replacement for recalc.py.
+"""
+
+import argparse
+import errno
+import json
+import os
+import queue
+import shutil
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+from recalc import check_errors, profile_template_dir, provision_profile
+from recalc_client import default_socket_path
+
+DEFAULT_WORKERS = 2
+STARTUP_TIMEOUT = 60  # Seconds to wait for a LibreOffice instance to accept connections
+
+
+class LibreOfficeWorker:
+    """One warm headless LibreOffice instance with its own user profile"""
+
+    def __init__(self, index, base_dir, template_dir=None):
+        self.profile_dir = os.path.join(base_dir, f'profile-{index}')
+        self.template_dir = template_dir
+        self.pipe_name = f'recalc-{os.getpid()}-{index}'
+        self.process = None
+        self.desktop = None
+
+    def start(self):
+        """Launch soffice and connect to it over a named pipe"""
+        if self.template_dir and not os.path.exists(self.profile_dir):
+            # A ready-made profile skips LibreOffice's slow first-start setup
+            shutil.copytree(self.template_dir, self.profile_dir)
+        cmd = [
+            'soffice', '--headless', '--invisible', '--nologo', '--norestore',
+            '--nodefault', '--nolockcheck',
+            f'-env:UserInstallation={Path(self.profile_dir).as_uri()}',
+            f'--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext',
+        ]
+        # New session so the whole soffice process group can be killed on hang
+        self.process = subprocess.Popen(
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+        local = uno.getComponentContext()
+        resolver = local.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f'uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+                )
+                break
+            except Exception:  # NoConnectException until soffice is listening
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError('LibreOffice instance failed to start')
+                time.sleep(0.2)
+        self.desktop = ctx.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', ctx
+        )
+
+    def kill(self):
+        """Kill the soffice process group without waiting for it"""
+        if self.process and self.process.poll() is None:
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def stop(self):
+        """Kill the instance and forget its connection"""
+        self.desktop = None
+        if self.process:
+            self.kill()
+            self.process.wait()
+        self.process = None
+
+    def recalculate(self, path, timeout):
+        """
+        Recalculate and save a workbook in this instance
+
+        Args:
+            path: Absolute path to Excel file
+            timeout: Seconds before the instance is killed and restarted
+
+        Returns:
+            Error message, or None on success
+        """
+        if self.process is None or self.process.poll() is not None:
+            self.stop()
+            self.start()
+
+        # A hung instance is killed, which makes the pending UNO call fail
+        timer = threading.Timer(timeout, self.kill)
+        timer.start()
+        try:
+            props = (PropertyValue(Name='Hidden', Value=True),)
+            doc = self.desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(path), '_blank', 0, props
+            )
+            if doc is None:
+                return f'LibreOffice could not open {path}'
+            try:
+                doc.calculateAll()
+                doc.store()
+            finally:
+                doc.close(True)
+            return None
+        except Exception as e:
+            if not timer.is_alive():
+                self.stop()
+                return f'Recalculation timed out after {timeout} seconds'
+            # Connection state is unknown after a UNO failure, start fresh next time
+            self.stop()
+            return f'LibreOffice recalculation failed: {e}'
+        finally:
+            timer.cancel()
+
+
+def start_workers(count, base_dir):
+    """Start LibreOffice instances concurrently; start-up is the slow part"""
+    def start(worker):
+        try:
+            worker.start()
+        except (RuntimeError, OSError) as e:
+            print(f"Warning: {e}, retrying on first use", file=sys.stderr)
+
+    # Provisioned once per machine (see recalc.py --setup), then copied per worker
+    template_dir = profile_template_dir()
+    if not provision_profile(template_dir):
+        print("Warning: could not provision a profile template, workers start cold", file=sys.stderr)
+        template_dir = None
+
+    workers = [LibreOfficeWorker(i, base_dir, template_dir) for i in range(count)]
+    threads = [threading.Thread(target=start, args=(w,)) for w in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return workers
+
+
+class RecalcHandler(socketserver.StreamRequestHandler):
+    """Handles one JSON request per connection"""
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            result = self.server.recalc(request['file'], request.get('timeout', 30))
+        except (ValueError, KeyError, TypeError):
+            result = {'error': 'Invalid request, expected {"file": ..., "timeout": ...}'}
+        except (RuntimeError, OSError) as e:
+            # e.g. the instance failed to restart; it is retried on the next request
+            result = {'error': str(e)}
+        self.wfile.write(json.dumps(result).encode() + b'\n')
+
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a socket file left behind by a server that is no longer running
+
+    Raises:
+        OSError: if a server is still listening on the socket
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise OSError(errno.EADDRINUSE, 'A recalc server is already listening', socket_path)
+
+
+class RecalcServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server sharing a pool of warm LibreOffice instances"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, workers=DEFAULT_WORKERS):
+        remove_stale_socket(socket_path)
+        self.base_dir = tempfile.mkdtemp(prefix='recalc-server-')
+        self.workers = start_workers(workers, self.base_dir)
+        self.pool = queue.Queue()
+        for worker in self.workers:
+            self.pool.put(worker)
+
+        super().__init__(socket_path, RecalcHandler)
+
+    def recalc(self, filename, timeout):
+        """Recalculate a file on the next free instance and scan it for errors"""
+        if not Path(filename).exists():
+            return {'error': f'File {filename} does not exist'}
+
+        worker = self.pool.get()
+        try:
+            error = worker.recalculate(str(Path(filename).absolute()), timeout)
+        finally:
+            self.pool.put(worker)
+        if error:
+            return {'error': error}
+        return check_errors(filename, workers=1)
+
+    def server_close(self):
+        super().server_close()
+        for worker in self.workers:
+            worker.stop()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Serve Excel formula recalculation from warm LibreOffice instances'
+    )
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'LibreOffice instances to keep running (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--socket', default=default_socket_path(),
+                        help='Unix socket path (default: $RECALC_SOCKET or a per-user temp path)')
+    args = parser.parse_args()
+
+    # Turn SIGTERM into a normal exit so instances and profiles are cleaned up
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    server = RecalcServer(args.socket, args.workers)
+    print(f"Recalc server listening on {args.socket} with {args.workers} LibreOffice instance(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+Streaming Workbook Error Scanner
+Finds Excel error values and counts formulas in a single pass over the sheet
+XML inside the .xlsx zip, without loading the workbook into openpyxl
+
+Each worksheet is parsed incrementally with iterparse (elements are cleared
+as soon as they are read), and large workbooks have their worksheets
+scanned in parallel worker processes. Results match the openpyxl-based scan previously done by recalc.py:
+a cell is an error if its cached value is a string containing one of
+EXCEL_ERRORS, and a formula if its value would load as a string starting
+with '=' (array and data table formulas load as objects and are not counted).
+"""
+
+import json
+import os
+import posixpath
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.etree.ElementTree import iterparse
+
+EXCEL_ERRORS = ['#VALUE!', '#DIV/0!', '#REF!', '#NAME?', '#NULL!', '#NUM!', '#N/A']
+ERROR_PATTERN = re.compile('|'.join(re.escape(err) for err in EXCEL_ERRORS))
+MAX_LOCATIONS = 20  # Locations reported per error type
+# Below this much sheet XML, starting worker processes costs more than it saves
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+WORKSHEET_RELTYPE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+
+SHEET_DATA = f'{MAIN_NS}sheetData'
+ROW = f'{MAIN_NS}row'
+CELL = f'{MAIN_NS}c'
+FORMULA = f'{MAIN_NS}f'
+VALUE = f'{MAIN_NS}v'
+INLINE_STRING = f'{MAIN_NS}is'
+TEXT = f'{MAIN_NS}t'
+SHARED_STRING = f'{MAIN_NS}si'
+
+CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+
+
+def classify_error(value):
+    """Return the first of EXCEL_ERRORS contained in value, or None"""
+    if not ERROR_PATTERN.search(value):
+        return None
+    # Report the first error in EXCEL_ERRORS order, not position in the text
+    for err in EXCEL_ERRORS:
+        if err in value:
+            return err
+
+
+def column_letter(index):
+    """Convert a 1-based column index to letters (1 -> A, 27 -> AA)"""
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Convert column letters to a 1-based index (A -> 1, AA -> 27)"""
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def list_worksheets(zf):
+    """Return [(sheet name, zip member)] for worksheets in workbook order"""
+    targets = {}
+    with zf.open('xl/_rels/workbook.xml.rels') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{PKG_REL_NS}Relationship' and elem.get('Type') == WORKSHEET_RELTYPE:
+                target = elem.get('Target')
+                if target.startswith('/'):
+                    targets[elem.get('Id')] = target.lstrip('/')
+                else:
+                    targets[elem.get('Id')] = posixpath.normpath(posixpath.join('xl', target))
+
+    sheets = []
+    with zf.open('xl/workbook.xml') as f:
+        for _, elem in iterparse(f):
+            if elem.tag == f'{MAIN_NS}sheet':
+                member = targets.get(elem.get(f'{REL_NS}id'))
+                if member:  # Chartsheets have no cells to scan
+                    sheets.append((elem.get('name'), member))
+    return sheets
+
+
+def scan_shared_strings(zf):
+    """
+    Classify shared strings by index
+
+    Returns:
+        (errors, formula_like): dict of index -> error type for strings that
+        contain an error, and set of indices of strings starting with '='
+    """
+    errors = {}
+    formula_like = set()
+    try:
+        f = zf.open('xl/sharedStrings.xml')
+    except KeyError:
+        return errors, formula_like
+
+    index = 0
+    parts = []
+    in_phonetic = False
+    with f:
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if tag == f'{MAIN_NS}rPh':
+                in_phonetic = event == 'start'  # Phonetic runs are not cell text
+            elif event == 'end' and tag == TEXT and not in_phonetic:
+                parts.append(elem.text or '')
+            elif event == 'end' and tag == SHARED_STRING:
+                text = ''.join(parts)
+                err = classify_error(text)
+                if err:
+                    errors[index] = err
+                if text.startswith('='):
+                    formula_like.add(index)
+                index += 1
+                parts = []
+                elem.clear()
+    return errors, formula_like
+
+
+def scan_sheet(filename, sheet_name, member, shared_errors, shared_formula_like):
+    """
+    Scan one worksheet for error values and formulas
+
+    Returns:
+        (errors, formula_count) where errors is a list of (error type,
+        location) in row-major order
+    """
+    errors = []
+    formula_count = 0
+    row_index = 0
+    sheet_data = None
+
+    with zipfile.ZipFile(filename) as zf, zf.open(member) as f:
+        col_index = 0
+        prev_ref = None
+        for event, elem in iterparse(f, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                if tag == SHEET_DATA:
+                    sheet_data = elem
+                elif tag == ROW:
+                    r = elem.get('r')
+                    row_index = int(r) if r else row_index + 1
+                    col_index = 0
+                continue
+
+            if tag != CELL:
+                if tag == ROW and sheet_data is not None:
+                    # Drop the finished row so memory stays flat on huge sheets
+                    sheet_data.clear()
+                continue
+
+            # Cells may omit r, meaning the column after the previous cell.
+            # Only then is the previous reference parsed.
+            ref = elem.get('r')
+            if ref:
+                prev_ref = ref
+                col_index = None
+            else:
+                if col_index is None:
+                    col_index = column_index(CELL_REF.match(prev_ref).group(1))
+                col_index += 1
+
+            cell_type = elem.get('t', 'n')
+            formula = None
+            value_text = None
+            inline = None
+            for child in elem:
+                child_tag = child.tag
+                if child_tag == VALUE:
+                    value_text = child.text
+                elif child_tag == FORMULA:
+                    formula = child
+                elif child_tag == INLINE_STRING:
+                    inline = child
+
+            err = None
+            text_is_formula = False
+            if cell_type in ('e', 'str') and value_text:
+                err = classify_error(value_text)
+                text_is_formula = value_text.startswith('=')
+            elif cell_type == 's' and value_text:
+                idx = int(value_text)
+                err = shared_errors.get(idx)
+                text_is_formula = idx in shared_formula_like
+            elif cell_type == 'inlineStr' and inline is not None:
+                text = ''.join(t.text or '' for t in inline.iter(TEXT))
+                err = classify_error(text)
+                text_is_formula = text.startswith('=')
+
+            if err:
+                errors.append((err, f"{sheet_name}!{ref or column_letter(col_index) + str(row_index)}"))
+
+            if formula is not None:
+                if formula.get('t', 'normal') in ('normal', 'shared'):
+                    formula_count += 1
+            elif text_is_formula:
+                formula_count += 1
+
+            elem.clear()
+
+    return errors, formula_count
+
+
+def scan_workbook(filename, workers=None):
+    """
+    Scan an Excel file for formula errors and count formulas
+
+    Args:
+        filename: Path to Excel file
+        workers: Worker processes for scanning sheets in parallel
+            (default: one per sheet, up to the CPU count, once the sheets
+            hold PARALLEL_MIN_BYTES of XML). Pass 1 from multi-threaded
+            processes, where forking worker processes can deadlock
+
+    Returns:
+        dict with error locations and counts, in the format recalc.py prints
+    """
+    with zipfile.ZipFile(filename) as zf:
+        sheets = list_worksheets(zf)
+        shared_errors, shared_formula_like = scan_shared_strings(zf)
+        sheet_bytes = sum(zf.getinfo(member).file_size for _, member in sheets)
+
+    args = [
+        (filename, name, member, shared_errors, shared_formula_like)
+        for name, member in sheets
+    ]
+    if workers is None:
+        workers = (os.cpu_count() or 1) if sheet_bytes >= PARALLEL_MIN_BYTES else 1
+    workers = min(workers, len(sheets))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sheet_results = list(executor.map(scan_sheet, *zip(*args)))
+    else:
+        sheet_results = [scan_sheet(*a) for a in args]
+
+    error_details = {err: [] for err in EXCEL_ERRORS}
+    total_errors = 0
+    formula_count = 0
+    for errors, count in sheet_results:
+        for err, location in errors:
+            error_details[err].append(location)
+        total_errors += len(errors)
+        formula_count += count
+
+    result = {
+        'status': 'success' if total_errors == 0 else 'errors_found',
+        'total_errors': total_errors,
+        'error_summary': {}
+    }
+    for err_type, locations in error_details.items():
+        if locations:
+            result['error_summary'][err_type] = {
+                'count': len(locations),
+                'locations': locations[:MAX_LOCATIONS]
+            }
+    result['total_formulas'] = formula_count
+    return result
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python workbook_scan.py <excel_file> [workers]")
+        print("\nScans an Excel file for error values without recalculating it")
+        print("\nReturns the same JSON as recalc.py")
+        sys.exit(1)
+
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    print(json.dumps(scan_workbook(sys.argv[1], workers), indent=2))
+
+
+if __name__ == '__main__':
+    main()